@@ -9,134 +9,129 @@ Routines to apply geometric and thickness imperfections into the finite
 element model.
 
 """
+import os
+import sys
 from random import sample
 
 import numpy as np
 from numpy import cos, sin, tan, arctan2, deg2rad
 
-from desicos.logger import log
+from desicos.logger import log, warn
 from desicos.constants import FLOAT
 from desicos.conecylDB.measured_imp_ms import calc_nodal_translations
 from desicos.conecylDB.measured_imp_t import calc_elems_t
 from desicos.conecylDB.read_write import read_theta_z_imp
-from desicos.conecylDB.interpolate import inv_weighted
-from desicos.abaqus.utils import vec_calc_elem_cg, index_within_linspace
+from desicos.conecylDB.interpolate import inv_weighted, apply_inv_weights
+from desicos.conecylDB.interp_cache import plan_key, cached_inv_weights
+from desicos.abaqus.utils import vec_calc_elem_cg
+from desicos.abaqus.utils.thickness_bins import bin_thicknesses, \
+    level_report, group_by_level
 
 
-def calc_translations_ABAQUS(imperfection_file_name,
-                             model_name,
-                             part_name,
-                             H_model,
-                             H_measured,
-                             R_model,
-                             R_best_fit=None,
-                             semi_angle=0.,
-                             stretch_H=False,
-                             z_offset_bot=None,
-                             rotatedeg=0.,
-                             scaling_factor=1.,
-                             r_TOL=1.,
-                             num_closest_points=5,
-                             power_parameter=2,
-                             num_sec_z=50,
-                             use_theta_z_format=True,
-                             ignore_bot_h=None,
-                             ignore_top_h=None,
-                             sample_size=None,
-                             T=None):
-    r"""Reads an imperfection file and calculates the nodal translations
+def read_nodes_ABAQUS(model_name, part_name, H_model, T=None,
+                      ignore_bot_h=None, ignore_top_h=None):
+    r"""Reads the nodes of a part where the imperfections will be applied
+
+    .. note:: Must be called from Abaqus.
 
     Parameters
     ----------
-    imperfection_file_name : str
-        Full path to the imperfection file.
     model_name : str
         Model name.
     part_name : str
         Part name.
     H_model : float
-        Total height of the model where the imperfections will be applied to,
-        considering also eventual resin rings.
-    H_measured : float
-        The total height of the measured test specimen, including eventual
-        resin rings at the edges.
-    R_model : float
-        Radius **at the bottom edge** of the model where the imperfections
-        will be applied to.
-    R_best_fit : float, optional
-        Best fit radius obtained with functions :func:`.best_fit_cylinder`
-        or :func:`.best_fit_cone`.
-    semi_angle : float, optional
-        Cone semi-vertex angle in degrees, when applicable.
-    stretch_H : bool, optional
-        If the measured imperfection data should be stretched to the current
-        model (which may happen when ``H_model!=H_measured``.
-    z_offset_bot : float, optional
-        It is common to have the measured data not covering the whole test
-        specimen, and therefore it will be centralized, if a non-centralized
-        position is desired this parameter can be used for the adjustment.
-    rotatedeg : float, optional
-        Rotation angle in degrees telling how much the imperfection pattern
-        should be rotated about the `X_3` (or `Z`) axis.
-    scaling_factor : float, optional
-        A scaling factor that can be used to study the imperfection
-        sensitivity.
-    r_TOL : float, optional
-        Percentage tolerance to ignore noisy data from the measurements.
-    num_closest_points : int, optional
-        See :func:`the inverse-weighted interpolation algorithm
-        <.inv_weighted>`.
-    power_parameter : float, optional
-        See :func:`the inverse-weighted interpolation algorithm
-        <.inv_weighted>`.
-    num_sec_z : int, optional
-        Number of spatial sections used to classify the measured data in order
-        to accelerate the searching algorithms
-    use_theta_z_format : bool, optional
-        If the new format `\theta, Z, imp` should be used instead of the old
-        `X, Y, Z`.
+        Total height of the model, used with ``ignore_top_h``.
+    T : None or np.ndarray, optional
+        A transformation matrix (cf. :func:`.transf_matrix`) required when the
+        mesh is not in the :ref:`default coordinate system <figure_conecyl>`.
     ignore_bot_h : None or float, optional
         Used to ignore nodes from the bottom resin ring.
     ignore_top_h : None or float, optional
         Used to ignore nodes from the top resin ring.
-    sample_size : int, optional
-        If the input file containing the measured data is too large it may be
-        required to limit the sample size in order to avoid memory errors.
-    T : None or np.ndarray, optional
-        A transformation matrix (cf. :func:`.transf_matrix`) required when the
-        mesh is not in the :ref:`default coordinate system <figure_conecyl>`.
 
-    """
-    import abaqus
+    Returns
+    -------
+    part_nodes : np.ndarray
+        The Abaqus ``MeshNode`` objects that were not ignored.
+    coords : np.ndarray
+        The coordinates of ``part_nodes``, transformed by ``T``.
+    nodes : np.ndarray
+        A 2-D array with the original ``x, y, z`` coordinates and the label
+        of ``part_nodes`` in each row.
 
-    import desicos.abaqus.abaqus_functions as abaqus_functions
+    """
+    from abaqus import mdb
 
-    mod = abaqus.mdb.models[model_name]
-    part = mod.parts[part_name]
+    part = mdb.models[model_name].parts[part_name]
     part_nodes = np.array(part.nodes)
-    coords = np.array([n.coordinates for n in part_nodes], dtype=FLOAT)
+    nodes = np.array([tuple(n.coordinates) + (n.label,) for n in part_nodes],
+                     dtype=FLOAT).reshape(-1, 4)
+    coords = nodes[:, :3]
 
     if T is not None:
         tmp = np.vstack((coords.T, np.ones((1, coords.shape[0]))))
         coords = np.dot(T, tmp).T
         del tmp
 
-    if ignore_bot_h is not None:
-        if ignore_bot_h <= 0:
-            ignore_bot_h = None
-        else:
-            mask = coords[:, 2] > ignore_bot_h
-            coords = coords[mask]
-            part_nodes = part_nodes[mask]
+    mask = np.ones(coords.shape[0], dtype=bool)
+    if ignore_bot_h is not None and ignore_bot_h > 0:
+        log('Applying ignore_bot_h: ignoring nodes with z <= {0}'.format(
+            ignore_bot_h))
+        mask &= coords[:, 2] > ignore_bot_h
+    if ignore_top_h is not None and ignore_top_h > 0:
+        log('Applying ignore_top_h: ignoring nodes with z >= {0}'.format(
+            H_model - ignore_top_h))
+        mask &= coords[:, 2] < (H_model - ignore_top_h)
+
+    return part_nodes[mask], coords[mask], nodes[mask]
+
+
+def calc_translations(coords,
+                      imperfection_file_name,
+                      H_model,
+                      H_measured,
+                      R_model,
+                      R_best_fit=None,
+                      semi_angle=0.,
+                      stretch_H=False,
+                      z_offset_bot=None,
+                      rotatedeg=0.,
+                      r_TOL=1.,
+                      num_closest_points=5,
+                      power_parameter=2,
+                      num_sec_z=50,
+                      use_theta_z_format=True,
+                      sample_size=None,
+                      nodes=None,
+                      use_cache=True,
+                      method='kdtree'):
+    r"""Calculates the nodal translations for given node coordinates
+
+    This function does not need Abaqus and can therefore be executed in
+    worker processes (see :func:`.calc_imperfections`). The parameters are
+    described in :func:`.calc_translations_ABAQUS`.
 
-    if ignore_top_h is not None:
-        if ignore_top_h <= 0:
-            ignore_top_h = None
-        else:
-            mask = coords[:, 2] < (H_model - ignore_top_h)
-            coords = coords[mask]
-            part_nodes = part_nodes[mask]
+    Parameters
+    ----------
+    coords : np.ndarray
+        A 2-D array with the ``x, y, z`` coordinates of each node, as
+        returned by :func:`.read_nodes_ABAQUS`.
+    nodes : np.ndarray, optional
+        The original coordinates and the labels of each node, as returned by
+        :func:`.read_nodes_ABAQUS`. Only used when
+        ``use_theta_z_format=False``.
+    method : str, optional
+        The algorithm used to find the closest points, ``'kdtree'`` or
+        ``'slabs'`` (see :func:`.calc_inv_weights`). Part of the key of the
+        cached interpolation plans.
 
+    Returns
+    -------
+    trans : np.ndarray
+        A 2-D array with the translations ``x, y, z`` of each node.
+
+    """
     if use_theta_z_format:
         d, d, data = read_theta_z_imp(path=imperfection_file_name,
                                       H_measured=H_measured,
@@ -147,6 +142,8 @@ def calc_translations_ABAQUS(imperfection_file_name,
             if sample_size < num:
                 log('Using sample_size={0}'.format(sample_size), level=1)
                 data = data[sample(range(num), int(sample_size)), :]
+                # a random sample never matches a cached plan
+                use_cache = False
 
         if r_TOL:
             max_imp = R_model * r_TOL / 100.
@@ -170,11 +167,26 @@ def calc_translations_ABAQUS(imperfection_file_name,
         data3D[:, 2] = z
         data3D[:, 3] = data[:, 2]
 
-        w0 = inv_weighted(data3D, coords,
-                          num_sub = num_sec_z,
-                          col = 2,
-                          ncp = num_closest_points,
-                          power_parameter = power_parameter)
+        if use_cache:
+            key = plan_key(coords, data3D[:, :3],
+                           ncp = num_closest_points,
+                           power_parameter = power_parameter,
+                           num_sec_z = num_sec_z,
+                           method = method)
+            indices, weights = cached_inv_weights(key, data3D[:, :3], coords,
+                                   ncp = num_closest_points,
+                                   power_parameter = power_parameter,
+                                   num_sub = num_sec_z,
+                                   col = 2,
+                                   method = method)
+            w0 = apply_inv_weights(indices, weights, data3D[:, 3])
+        else:
+            w0 = inv_weighted(data3D, coords,
+                              num_sub = num_sec_z,
+                              col = 2,
+                              ncp = num_closest_points,
+                              power_parameter = power_parameter,
+                              method = method)
 
         thetas = arctan2(coords[:, 1], coords[:, 0])
 
@@ -186,10 +198,10 @@ def calc_translations_ABAQUS(imperfection_file_name,
     else:
         #NOTE perhaps remove this in the future, when the imperfection files
         #     are stored as theta, z, amplitude only
-        nodes = np.array([[n.coordinates[0],
-                           n.coordinates[1],
-                           n.coordinates[2],
-                           n.label] for n in part_nodes], dtype=FLOAT)
+        if nodes is None:
+            nodes = np.zeros((coords.shape[0], 4), dtype=FLOAT)
+            nodes[:, :3] = coords
+            nodes[:, 3] = np.arange(1, coords.shape[0]+1)
 
         # calling translate_nodes function
         trans = calc_nodal_translations(
@@ -213,6 +225,124 @@ def calc_translations_ABAQUS(imperfection_file_name,
     return trans
 
 
+
+
+def calc_translations_ABAQUS(imperfection_file_name,
+                             model_name,
+                             part_name,
+                             H_model,
+                             H_measured,
+                             R_model,
+                             R_best_fit=None,
+                             semi_angle=0.,
+                             stretch_H=False,
+                             z_offset_bot=None,
+                             rotatedeg=0.,
+                             scaling_factor=1.,
+                             r_TOL=1.,
+                             num_closest_points=5,
+                             power_parameter=2,
+                             num_sec_z=50,
+                             use_theta_z_format=True,
+                             ignore_bot_h=None,
+                             ignore_top_h=None,
+                             sample_size=None,
+                             T=None,
+                             use_cache=True):
+    r"""Reads an imperfection file and calculates the nodal translations
+
+    Parameters
+    ----------
+    imperfection_file_name : str
+        Full path to the imperfection file.
+    model_name : str
+        Model name.
+    part_name : str
+        Part name.
+    H_model : float
+        Total height of the model where the imperfections will be applied to,
+        considering also eventual resin rings.
+    H_measured : float
+        The total height of the measured test specimen, including eventual
+        resin rings at the edges.
+    R_model : float
+        Radius **at the bottom edge** of the model where the imperfections
+        will be applied to.
+    R_best_fit : float, optional
+        Best fit radius obtained with functions :func:`.best_fit_cylinder`
+        or :func:`.best_fit_cone`.
+    semi_angle : float, optional
+        Cone semi-vertex angle in degrees, when applicable.
+    stretch_H : bool, optional
+        If the measured imperfection data should be stretched to the current
+        model (which may happen when ``H_model!=H_measured``.
+    z_offset_bot : float, optional
+        It is common to have the measured data not covering the whole test
+        specimen, and therefore it will be centralized, if a non-centralized
+        position is desired this parameter can be used for the adjustment.
+    rotatedeg : float, optional
+        Rotation angle in degrees telling how much the imperfection pattern
+        should be rotated about the `X_3` (or `Z`) axis.
+    scaling_factor : float, optional
+        A scaling factor that can be used to study the imperfection
+        sensitivity.
+    r_TOL : float, optional
+        Percentage tolerance to ignore noisy data from the measurements.
+    num_closest_points : int, optional
+        See :func:`the inverse-weighted interpolation algorithm
+        <.inv_weighted>`.
+    power_parameter : float, optional
+        See :func:`the inverse-weighted interpolation algorithm
+        <.inv_weighted>`.
+    num_sec_z : int, optional
+        Number of spatial sections used to classify the measured data in order
+        to accelerate the searching algorithms
+    use_theta_z_format : bool, optional
+        If the new format `\theta, Z, imp` should be used instead of the old
+        `X, Y, Z`.
+    ignore_bot_h : None or float, optional
+        Used to ignore nodes from the bottom resin ring.
+    ignore_top_h : None or float, optional
+        Used to ignore nodes from the top resin ring.
+    sample_size : int, optional
+        If the input file containing the measured data is too large it may be
+        required to limit the sample size in order to avoid memory errors.
+        The points are sampled at random, such that the interpolation cache
+        is not used when the file has more than ``sample_size`` points.
+    T : None or np.ndarray, optional
+        A transformation matrix (cf. :func:`.transf_matrix`) required when the
+        mesh is not in the :ref:`default coordinate system <figure_conecyl>`.
+    use_cache : bool, optional
+        If the closest points and weights of the inverse-weighted
+        interpolation should be stored in and reused from the
+        :mod:`interpolation cache <desicos.conecylDB.interp_cache>`. Only
+        used when ``use_theta_z_format=True`` and when the measured data is
+        not reduced to ``sample_size`` points.
+
+    """
+    part_nodes, coords, nodes = read_nodes_ABAQUS(model_name, part_name,
+            H_model, T=T, ignore_bot_h=ignore_bot_h, ignore_top_h=ignore_top_h)
+
+    return calc_translations(coords,
+                             imperfection_file_name = imperfection_file_name,
+                             H_model = H_model,
+                             H_measured = H_measured,
+                             R_model = R_model,
+                             R_best_fit = R_best_fit,
+                             semi_angle = semi_angle,
+                             stretch_H = stretch_H,
+                             z_offset_bot = z_offset_bot,
+                             rotatedeg = rotatedeg,
+                             r_TOL = r_TOL,
+                             num_closest_points = num_closest_points,
+                             power_parameter = power_parameter,
+                             num_sec_z = num_sec_z,
+                             use_theta_z_format = use_theta_z_format,
+                             sample_size = sample_size,
+                             nodes = nodes,
+                             use_cache = use_cache)
+
+
 def translate_nodes_ABAQUS(imperfection_file_name,
                            model_name,
                            part_name,
@@ -234,7 +364,8 @@ def translate_nodes_ABAQUS(imperfection_file_name,
                            ignore_bot_h=None,
                            ignore_top_h=None,
                            sample_size=None,
-                           T=None):
+                           T=None,
+                           use_cache=True):
     r"""Translates the nodes in Abaqus based on imperfection data
 
     The imperfection amplitude for each node is calculated using an inversed
@@ -315,6 +446,8 @@ def translate_nodes_ABAQUS(imperfection_file_name,
     T : None or np.ndarray, optional
         A transformation matrix (cf. :func:`.transf_matrix`) required when the
         mesh is not in the :ref:`default coordinate system <figure_conecyl>`.
+    use_cache : bool, optional
+        See :func:`.calc_translations_ABAQUS`.
 
     Returns
     -------
@@ -332,40 +465,14 @@ def translate_nodes_ABAQUS(imperfection_file_name,
     mod = mdb.models[model_name]
     part = mod.parts[part_name]
 
-    part_nodes = np.array(part.nodes)
-    coords = np.array([n.coordinates for n in part_nodes])
-
-    if T is not None:
-        tmp = np.vstack((coords.T, np.ones((1, coords.shape[0]))))
-        coords = np.dot(T, tmp).T
-        del tmp
-
-    if ignore_bot_h is not None:
-        if ignore_bot_h <= 0:
-            ignore_bot_h = None
-        else:
-            log('Applying ignore_bot_h: ignoring nodes with z <= {0}'.format(
-                ignore_bot_h))
-            mask = coords[:, 2] > ignore_bot_h
-            coords = coords[mask]
-            part_nodes = part_nodes[mask]
-
-    if ignore_top_h is not None:
-        if ignore_top_h <= 0:
-            ignore_top_h = None
-        else:
-            log('Applying ignore_top_h: ignoring nodes with z >= {0}'.format(
-                H_model - ignore_top_h))
-            mask = coords[:, 2] < (H_model - ignore_top_h)
-            coords = coords[mask]
-            part_nodes = part_nodes[mask]
+    part_nodes, coords, nodes = read_nodes_ABAQUS(model_name, part_name,
+            H_model, T=T, ignore_bot_h=ignore_bot_h, ignore_top_h=ignore_top_h)
 
     if use_theta_z_format:
         if nodal_translations is None:
-            trans = calc_translations_ABAQUS(
+            trans = calc_translations(
+                        coords,
                         imperfection_file_name = imperfection_file_name,
-                        model_name = model_name,
-                        part_name = part_name,
                         H_model = H_model,
                         H_measured = H_measured,
                         R_model = R_model,
@@ -374,16 +481,14 @@ def translate_nodes_ABAQUS(imperfection_file_name,
                         stretch_H = stretch_H,
                         z_offset_bot = z_offset_bot,
                         rotatedeg = rotatedeg,
-                        scaling_factor = scaling_factor,
                         r_TOL = r_TOL,
                         num_closest_points = num_closest_points,
                         power_parameter = power_parameter,
                         num_sec_z = num_sec_z,
                         use_theta_z_format = use_theta_z_format,
-                        ignore_bot_h = ignore_bot_h,
-                        ignore_top_h = ignore_top_h,
                         sample_size = sample_size,
-                        T = T)
+                        nodes = nodes,
+                        use_cache = use_cache)
 
         else:
             trans = nodal_translations
@@ -418,35 +523,27 @@ def translate_nodes_ABAQUS(imperfection_file_name,
         return trans
 
     else:
-        nodes = np.array([[n.coordinates[0],
-                           n.coordinates[1],
-                           n.coordinates[2],
-                           n.label] for n in part_nodes], dtype=FLOAT)
-
         # calling translate_nodes function
         if nodal_translations is None:
-            nodal_translations = calc_translations_ABAQUS(
-                         imperfection_file_name = imperfection_file_name,
-                         model_name = model_name,
-                         part_name = part_name,
-                         H_model = H_model,
-                         H_measured = H_measured,
-                         R_model = R_model,
-                         R_best_fit = R_best_fit,
-                         semi_angle = semi_angle,
-                         stretch_H = stretch_H,
-                         z_offset_bot = z_offset_bot,
-                         rotatedeg = rotatedeg,
-                         scaling_factor = scaling_factor,
-                         r_TOL = r_TOL,
-                         num_closest_points = num_closest_points,
-                         power_parameter = power_parameter,
-                         num_sec_z = num_sec_z,
-                         use_theta_z_format = use_theta_z_format,
-                         ignore_bot_h = ignore_bot_h,
-                         ignore_top_h = ignore_top_h,
-                         sample_size = sample_size,
-                         T = T)
+            nodal_translations = calc_translations(
+                        coords,
+                        imperfection_file_name = imperfection_file_name,
+                        H_model = H_model,
+                        H_measured = H_measured,
+                        R_model = R_model,
+                        R_best_fit = R_best_fit,
+                        semi_angle = semi_angle,
+                        stretch_H = stretch_H,
+                        z_offset_bot = z_offset_bot,
+                        rotatedeg = rotatedeg,
+                        r_TOL = r_TOL,
+                        num_closest_points = num_closest_points,
+                        power_parameter = power_parameter,
+                        num_sec_z = num_sec_z,
+                        use_theta_z_format = use_theta_z_format,
+                        sample_size = sample_size,
+                        nodes = nodes,
+                        use_cache = use_cache)
 
         # applying translations
         viewport = session.viewports[session.currentViewportName]
@@ -634,6 +731,181 @@ def translate_nodes_ABAQUS_c0(m0, n0, c0, funcnum,
     return nodal_translations
 
 
+def calc_thicknesses(elements,
+                     imperfection_file_name,
+                     t_model,
+                     t_measured,
+                     H_model,
+                     H_measured,
+                     R_model,
+                     R_best_fit = None,
+                     semi_angle = 0.,
+                     stretch_H = False,
+                     z_offset_bot = None,
+                     num_closest_points = 5,
+                     power_parameter = 2,
+                     num_sec_z = 100,
+                     use_theta_z_format = False):
+    r"""Calculates the thickness of each element
+
+    This function does not need Abaqus and can therefore be executed in
+    worker processes (see :func:`.calc_imperfections`). The parameters are
+    described in :func:`.change_thickness_ABAQUS`.
+
+    Parameters
+    ----------
+    elements : np.ndarray
+        A 2-D array with the ``x, y, z`` coordinates of the centroid and the
+        label of each element, as returned by :func:`.vec_calc_elem_cg`.
+
+    Returns
+    -------
+    elems_t : np.ndarray
+        A 2-D array with the label and the interpolated thickness of each
+        element.
+    t_set : set
+        The unique thicknesses.
+
+    """
+    if use_theta_z_format:
+        d, d, data = read_theta_z_imp(path = imperfection_file_name,
+                                      H_measured = H_measured,
+                                      stretch_H = stretch_H,
+                                      z_offset_bot = z_offset_bot)
+
+        data3D = np.zeros((data.shape[0], 4), dtype=FLOAT)
+        z = data[:, 1]
+        z *= H_model
+
+        alpharad = deg2rad(semi_angle)
+        tana = tan(alpharad)
+        def r_local(z):
+            return R_model - z*tana
+        data3D[:, 0] = r_local(z)*cos(data[:, 0])
+        data3D[:, 1] = r_local(z)*sin(data[:, 0])
+        data3D[:, 2] = z
+        data3D[:, 3] = data[:, 2]
+
+        ans = inv_weighted(data3D, elements[:, :3],
+                           num_sub = num_sec_z,
+                           col = 2,
+                           ncp = num_closest_points,
+                           power_parameter = power_parameter)
+
+        t_set = set(ans)
+        t_set.discard(0.) #TODO why inv_weighted returns an array with 0.
+        elems_t = np.zeros((elements.shape[0], 2), dtype=FLOAT)
+        elems_t[:, 0] = elements[:, 3]
+        elems_t[:, 1] = ans
+
+    else:
+        elems_t, t_set = calc_elems_t(
+                            imperfection_file_name,
+                            nodes = elements,
+                            t_model = t_model,
+                            t_measured = t_measured,
+                            H_model = H_model,
+                            H_measured = H_measured,
+                            R_model = R_model,
+                            R_best_fit = R_best_fit,
+                            semi_angle = semi_angle,
+                            stretch_H = stretch_H,
+                            z_offset_bot = z_offset_bot,
+                            num_closest_points = num_closest_points,
+                            power_parameter = power_parameter,
+                            num_sec_z = num_sec_z)
+
+    return elems_t, t_set
+
+
+def _calc_job(job):
+    kind, kwargs = job
+    if kind == 'msi':
+        return calc_translations(**kwargs)
+    elif kind == 'ti':
+        return calc_thicknesses(**kwargs)
+    raise ValueError('Invalid job kind: {0}'.format(kind))
+
+
+def _job_key(job):
+    kind, kwargs = job
+    if kind == 'msi':
+        mesh = kwargs['coords']
+        data = kwargs.get('nodes')
+    else:
+        mesh = kwargs['elements']
+        data = None
+    if data is None:
+        data = np.zeros((0, 4))
+    params = dict((k, v) for k, v in kwargs.items()
+                  if not isinstance(v, np.ndarray))
+    return plan_key(mesh, data, kind=kind, **params)
+
+
+def calc_imperfections(jobs, processes=1):
+    r"""Calculates many nodal translations and element thicknesses
+
+    The calculations do not need Abaqus and can be distributed among worker
+    processes. Jobs with the same mesh and the same parameters, common when
+    a study contains many models that differ only by the scaling factor, are
+    calculated only once.
+
+    Parameters
+    ----------
+    jobs : list
+        A list of tuples ``(kind, kwargs)`` where ``kind`` is ``'msi'`` for
+        :func:`.calc_translations` or ``'ti'`` for
+        :func:`.calc_thicknesses` and ``kwargs`` are the keyword arguments
+        passed to these functions.
+    processes : int or None, optional
+        The number of worker processes. By default the calculations are
+        performed in this process. All the CPUs are used if ``None``. The
+        calculations are also performed in this process when the worker
+        processes cannot be started, or when running inside Abaqus/CAE on
+        Windows, where the worker processes would start new instances of the
+        Abaqus/CAE executable.
+
+    Returns
+    -------
+    results : list
+        The result of each job, in the same order as ``jobs``.
+
+    """
+    keys = [_job_key(job) for job in jobs]
+    unique = []
+    positions = {}
+    for key, job in zip(keys, jobs):
+        if not key in positions:
+            positions[key] = len(unique)
+            unique.append(job)
+    log('Calculating {0} imperfections ({1} unique)...'.format(
+        len(jobs), len(unique)))
+
+    pool = None
+    if processes != 1 and os.name == 'nt' and 'abaqus' in sys.modules:
+        warn('Worker processes are not supported inside Abaqus/CAE on '
+             'Windows, calculating sequentially', level=1)
+        processes = 1
+    if processes != 1 and len(unique) > 1:
+        from multiprocessing import Pool
+        try:
+            pool = Pool(processes)
+        except (OSError, ImportError, NotImplementedError) as e:
+            warn('Worker processes could not be started ({0}), '.format(e)
+                 + 'calculating sequentially', level=1)
+    if pool is None:
+        results = [_calc_job(job) for job in unique]
+    else:
+        try:
+            results = pool.map(_calc_job, unique)
+        finally:
+            pool.close()
+            pool.join()
+    log('Imperfections calculated!')
+
+    return [results[positions[key]] for key in keys]
+
+
 def change_thickness_ABAQUS(imperfection_file_name,
                             model_name,
                             part_name,
@@ -654,7 +926,9 @@ def change_thickness_ABAQUS(imperfection_file_name,
                             num_sec_z = 100,
                             elems_t = None,
                             t_set = None,
-                            use_theta_z_format = False):
+                            use_theta_z_format = False,
+                            binning = None,
+                            t_tol = None):
     r"""Applies a given thickness imperfection to the finite element model
 
     Assumes that a percentage variation of the laminate thickness can be
@@ -724,6 +998,14 @@ def change_thickness_ABAQUS(imperfection_file_name,
     use_theta_z_format : bool, optional
         If the new format `\theta, Z, imp` should be used instead of the old
         `X, Y, Z`.
+    binning : str or None, optional
+        The method used to group the element thicknesses into
+        ``number_of_sets`` layups, see :mod:`.thickness_bins`. If ``None``
+        the behavior described for ``number_of_sets`` is kept.
+    t_tol : float or None, optional
+        The maximum thickness error allowed for each element when grouping
+        the thicknesses. The fewest layups satisfying this tolerance are
+        searched for. Not used when ``binning=None``.
 
     """
     from abaqus import mdb
@@ -735,92 +1017,53 @@ def change_thickness_ABAQUS(imperfection_file_name,
     part_cyl_csys = part.features['part_cyl_csys']
     part_cyl_csys = part.datums[part_cyl_csys.id]
 
-    if use_theta_z_format:
-        if elems_t is None or t_set is None:
-            log('Reading coordinates for elements...')
-            elements = vec_calc_elem_cg(part.elements)
-
-            log('Coordinates for elements read!')
-            d, d, data = read_theta_z_imp(path = imperfection_file_name,
-                                          H_measured = H_measured,
-                                          stretch_H = stretch_H,
-                                          z_offset_bot = z_offset_bot)
-
-            data3D = np.zeros((data.shape[0], 4), dtype=FLOAT)
-            z = data[:, 1]
-            z *= H_model
-
-            alpharad = deg2rad(semi_angle)
-            tana = tan(alpharad)
-            def r_local(z):
-                return R_model - z*tana
-            data3D[:, 0] = r_local(z)*cos(data[:, 0])
-            data3D[:, 1] = r_local(z)*sin(data[:, 0])
-            data3D[:, 2] = z
-            data3D[:, 3] = data[:, 2]
-
-            ans = inv_weighted(data3D, elements[:, :3],
-                               num_sub = num_sec_z,
-                               col = 2,
-                               ncp = num_closest_points,
-                               power_parameter = power_parameter)
-
-            t_set = set(ans)
-            t_set.discard(0.) #TODO why inv_weighted returns an array with 0.
-            elems_t = np.zeros((elements.shape[0], 2), dtype=FLOAT)
-            elems_t[:, 0] = elements[:, 3]
-            elems_t[:, 1] = ans
-
-        else:
-            log('Thickness differences already calculated!')
-
+    if elems_t is None or t_set is None:
+        log('Reading coordinates for elements...')
+        elements = vec_calc_elem_cg(part.elements)
+        log('Coordinates for elements read!')
+        elems_t, t_set = calc_thicknesses(elements,
+                             imperfection_file_name = imperfection_file_name,
+                             t_model = t_model,
+                             t_measured = t_measured,
+                             H_model = H_model,
+                             H_measured = H_measured,
+                             R_model = R_model,
+                             R_best_fit = R_best_fit,
+                             semi_angle = semi_angle,
+                             stretch_H = stretch_H,
+                             z_offset_bot = z_offset_bot,
+                             num_closest_points = num_closest_points,
+                             power_parameter = power_parameter,
+                             num_sec_z = num_sec_z,
+                             use_theta_z_format = use_theta_z_format)
     else:
-        if elems_t is None or t_set is None:
-            # reading elements data
-            log('Reading coordinates for elements...')
-            elements = vec_calc_elem_cg(part.elements)
-            log('Coordinates for elements read!')
-            # calling translate_nodes function
-            elems_t, t_set = calc_elems_t(
-                                imperfection_file_name,
-                                nodes = elements,
-                                t_model = t_model,
-                                t_measured = t_measured,
-                                H_model = H_model,
-                                H_measured = H_measured,
-                                R_model = R_model,
-                                R_best_fit = R_best_fit,
-                                semi_angle = semi_angle,
-                                stretch_H = stretch_H,
-                                z_offset_bot = z_offset_bot,
-                                num_closest_points = num_closest_points,
-                                power_parameter = power_parameter,
-                                num_sec_z = num_sec_z)
-        else:
-            log('Thickness differences already calculated!')
+        log('Thickness differences already calculated!')
     # creating sets
-    t_list = []
+    elems = np.asarray(elems_t, dtype=FLOAT).reshape(-1, 2)
     max_len_t_set = 100
-    if len(t_set) >= max_len_t_set and number_of_sets in (None, 0):
-        number_of_sets = 10
-        log('More than {0:d} different thicknesses measured!'.format(
-            max_len_t_set))
-        log('Forcing a number_of_sets = {0:d}'.format(number_of_sets))
-    if number_of_sets is None or number_of_sets == 0:
-        number_of_sets = len(t_set)
-        t_list = list(t_set)
-        t_list.sort()
+    if binning is None:
+        if len(t_set) >= max_len_t_set and number_of_sets in (None, 0):
+            number_of_sets = 10
+            log('More than {0:d} different thicknesses measured!'.format(
+                max_len_t_set))
+            log('Forcing a number_of_sets = {0:d}'.format(number_of_sets))
+        # the levels are defined by the measured thicknesses
+        if number_of_sets is None or number_of_sets == 0:
+            t_list = np.array(sorted(t_set), dtype=FLOAT)
+        else:
+            t_list = np.linspace(min(t_set), max(t_set), number_of_sets+1)
+        indices, report = level_report(t_list, elems[:, 1],
+                                       ignore_zero=False)
     else:
-        t_min = min(t_set)
-        t_max = max(t_set)
-        t_list = list(np.linspace(t_min, t_max, number_of_sets+1))
+        t_list, indices, report = bin_thicknesses(elems[:, 1],
+                number_of_sets=number_of_sets, method=binning, tol=t_tol)
+    log('Thickness binning: {0} sets, max. error {1:g} ({2:1.2f}% of the '
+        'nominal thickness), RMS error {3:g}'.format(
+        report['number_of_sets'], report['max_error'],
+        100*report['max_error']/t_model, report['rms_error']))
 
     # grouping elements
-    sets_ids = [[] for i in range(len(t_list))]
-    for entry in elems_t:
-        elem_id, t = entry
-        index = index_within_linspace(t_list, t)
-        sets_ids[index].append(int(elem_id))
+    sets_ids = group_by_level(elems[:, 0], indices, len(t_list))
     # putting elements in sets
     original_layup = part.compositeLayups['CompositePlate']
     for i, set_ids in enumerate(sets_ids):
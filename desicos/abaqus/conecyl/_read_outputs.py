@@ -1,20 +1,20 @@
 import numpy as np
 
-import _read_outputs
+from desicos.constants import FLOAT
 
 
 def read_outputs(self, last_frame=False, last_cross_section=True,
         read_fieldOutputs=False):
 
     if not self.check_completed():
-        print 'ERROR! Output not found for model %s !' % self.model_name
+        print('ERROR! Output not found for model %s !' % self.model_name)
         return False
 
     # this is required to avoid an error for corrupted odbs
     try:
         odb = self.attach_results()
     except:
-        print 'ERROR - Probably %s.odb is corrupted' % self.model_name
+        print('ERROR - Probably %s.odb is corrupted' % self.model_name)
         return False
 
     if self.linear_buckling:
@@ -29,7 +29,7 @@ def read_outputs(self, last_frame=False, last_cross_section=True,
         self.detach_results(odb)
         return True
 
-    _read_outputs._read_axial_load_displ_history(self, odb)
+    _read_axial_load_displ_history(self, odb)
 
     return True
 
@@ -37,15 +37,56 @@ def read_outputs(self, last_frame=False, last_cross_section=True,
 def _read_outputs_cross_section(cc, odb, cross_section_index=-1,
         last_frame=False):
     cross_section = cc.cross_sections[cross_section_index]
-    _read_outputs._read_outputs_entity(cc, odb, cross_section, last_frame)
+    _read_outputs_entity(cc, odb, cross_section, last_frame)
 
 
 def _read_outputs_meridian(cc, odb, meridian_index=0, last_frame=False):
     meridian = cc.meridians[meridian_index]
-    _read_outputs._read_outputs_entity(cc, odb, meridian, last_frame)
+    _read_outputs_entity(cc, odb, meridian, last_frame)
+
+
+def _field_arrays(field_output):
+    """Returns the node labels and the data of a field output as arrays
+
+    The ``bulkDataBlocks`` are used when available, avoiding a loop over
+    each ``FieldValue`` object.
+
+    """
+    blocks = getattr(field_output, 'bulkDataBlocks', None)
+    if blocks:
+        labels = np.concatenate([np.asarray(b.nodeLabels).ravel()
+                                 for b in blocks])
+        data = np.concatenate([np.asarray(b.data, dtype=FLOAT).reshape(
+                               len(b.nodeLabels), -1) for b in blocks])
+    else:
+        values = field_output.values
+        labels = np.array([value.nodeLabel for value in values], dtype=int)
+        data = np.array([value.data for value in values], dtype=FLOAT)
+    return labels, data.reshape(labels.shape[0], -1)
+
+
+def _label_positions(sorted_labels, order, labels):
+    """Returns the positions of ``labels`` and a mask of the known ones"""
+    if sorted_labels.shape[0] == 0:
+        return (np.zeros(labels.shape[0], dtype=int),
+                np.zeros(labels.shape[0], dtype=bool))
+    pos = np.searchsorted(sorted_labels, labels)
+    pos = np.clip(pos, 0, sorted_labels.shape[0]-1)
+    found = sorted_labels[pos] == labels
+    return order[pos], found
 
 
 def _read_outputs_entity(cc, odb, entity, last_frame=False):
+    """Reads the displacements and forces of the nodes of an entity
+
+    For each step the results are stored in ``(frames x nodes)`` arrays in
+    ``entity.dx``, ``entity.dy``, ``entity.dz``, ``entity.dr`` and
+    ``entity.fz``, where the columns follow ``entity.node_ids``. Each node
+    receives the corresponding columns in ``node.dx``, ``node.dy``,
+    ``node.dz``, ``node.dr`` and ``node.fz``. The displacements of frames
+    that were not read are ``NaN``.
+
+    """
     setname = '%s_%03d' % (entity.prefix, entity.index)
     #TODO this if below is temporary... the meridians should not be even created
     #     if they have not nodes associated
@@ -54,32 +95,25 @@ def _read_outputs_entity(cc, odb, entity, last_frame=False):
     odb_mesh_node_array = odb.rootAssembly.instances['INSTANCECYLINDER'].\
                               nodeSets[setname]
     step_names = odb.steps.keys()
-    nodes = entity.nodes
-    # reseting values
-    nodes_dict = {}
-    for node in nodes:
-        if node is None:
-            continue
-        nodes_dict[node.id] = node
-        for step_name in step_names:
-            frmlen = len(odb.steps[step_name].frames)
-            node.dx[step_name] = [None for i in range(frmlen)]
-            node.dy[step_name] = [None for i in range(frmlen)]
-            node.dz[step_name] = [None for i in range(frmlen)]
-            node.dr[step_name] = [None for i in range(frmlen)]
-            # for NFORC outputs a starting float value is required
-            # because there are more then one nodeLabel value
-            #node.fx[step_name] = [0. for i in range(frmlen)]
-            #node.fy[step_name] = [0. for i in range(frmlen)]
-            node.fz[step_name] = [0.   for i in range(frmlen)]
-    # reading new values
+    nodes = [node for node in entity.nodes if node is not None]
+    node_ids = np.array([node.id for node in nodes], dtype=int)
+    order = np.argsort(node_ids)
+    sorted_ids = node_ids[order]
+    num_nodes = node_ids.shape[0]
+    entity.node_ids = node_ids
+    for name in ('dx', 'dy', 'dz', 'dr', 'fz'):
+        setattr(entity, name, {})
     for step_name in step_names:
         frames = odb.steps[step_name].frames
-        #
+        frmlen = len(frames)
+        disps = np.zeros((3, frmlen, num_nodes), dtype=FLOAT)
+        disps.fill(np.nan)
+        # NFORC3 is summed for all the elements sharing each node
+        fz = np.zeros((frmlen, num_nodes), dtype=FLOAT)
         if last_frame:
-            frm_list = [-1]
+            frm_list = [frmlen-1]
         else:
-            frm_list = range(len(frames))
+            frm_list = range(frmlen)
         for i in frm_list:
             frame = frames[i]
             #
@@ -88,46 +122,30 @@ def _read_outputs_entity(cc, odb, entity, last_frame=False):
             else:
                 fOut = frame.fieldOutputs['U']
             subfOut = fOut.getSubset(region=odb_mesh_node_array)
-            subfOutValues = subfOut.values
-            for value in subfOutValues:
-                node_id = value.nodeLabel
-                #if not node_id in nodes_dict.keys():
-                #    continue
-                node = nodes_dict[node_id]
-            #for value in frame.fieldOutputs['NFORC1'].values:
-            #    node_id = value.nodeLabel
-            #    tmp['NFORC1'][step_name][node_id] = value.data
-            #for value in frame.fieldOutputs['NFORC2'].values:
-            #    node_id = value.nodeLabel
-            #    tmp['NFORC2'][step_name][node_id] = value.data
-                data = value.data
-                dx = data[0]
-                dy = data[1]
-                dz = data[2]
-                # this set of operations below could be done in a array
-                thetarad = np.arctan2(dy, dx)
-                dr  = dx / np.cos(thetarad)
-                node.dx[step_name][i] = dx
-                node.dy[step_name][i] = dy
-                node.dz[step_name][i] = dz
-                node.dr[step_name][i] = dr
-                #
-                #fx = tmp['NFORC1'][step_name][node_id]
-                #
-                #fy = tmp['NFORC2'][step_name][node_id]
-                #
+            labels, data = _field_arrays(subfOut)
+            pos, found = _label_positions(sorted_ids, order, labels)
+            disps[:, i, pos[found]] = data[found, :3].T
+            #
             fOut = frame.fieldOutputs['NFORC3']
             subfOut = fOut.getSubset(region=odb_mesh_node_array)
-            subfOutValues = subfOut.values
-            for value in subfOutValues:
-                node_id = value.nodeLabel
-                #if not node_id in nodes_dict.keys():
-                #    continue
-                node = nodes_dict[node_id]
-                node.fz[step_name][i] += value.data
-                #
-                #node.fx[step_name] += fx
-                #node.fy[step_name] += fy
+            labels, data = _field_arrays(subfOut)
+            pos, found = _label_positions(sorted_ids, order, labels)
+            fz[i, :] = np.bincount(pos[found], weights=data[found, 0],
+                                   minlength=num_nodes)
+        dx, dy, dz = disps
+        thetarad = np.arctan2(dy, dx)
+        dr = dx / np.cos(thetarad)
+        entity.dx[step_name] = dx
+        entity.dy[step_name] = dy
+        entity.dz[step_name] = dz
+        entity.dr[step_name] = dr
+        entity.fz[step_name] = fz
+        for j, node in enumerate(nodes):
+            node.dx[step_name] = dx[:, j]
+            node.dy[step_name] = dy[:, j]
+            node.dz[step_name] = dz[:, j]
+            node.dr[step_name] = dr[:, j]
+            node.fz[step_name] = fz[:, j]
 
 
 def _read_axial_load_displ_history(cc, odb):
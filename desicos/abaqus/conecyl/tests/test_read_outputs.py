@@ -0,0 +1,169 @@
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+from desicos.abaqus.conecyl._read_outputs import _read_outputs_entity
+
+
+class Node(object):
+    def __init__(self, id):
+        self.id = id
+        self.dx = {}
+        self.dy = {}
+        self.dz = {}
+        self.dr = {}
+        self.fz = {}
+
+
+class Entity(object):
+    def __init__(self, node_ids):
+        self.prefix = 'MERIDIAN'
+        self.index = 1
+        self.nodes = [Node(i) if i is not None else None for i in node_ids]
+
+
+class Obj(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FieldOutput(object):
+    """A field output with the data of each label, as ``bulkDataBlocks``
+    split in two blocks or as a list of ``FieldValue`` objects"""
+    def __init__(self, labels, data, bulk):
+        labels = np.asarray(labels)
+        data = np.asarray(data, dtype=np.float32).reshape(labels.shape[0], -1)
+        if bulk:
+            half = labels.shape[0] // 2
+            self.bulkDataBlocks = [Obj(nodeLabels=labels[s], data=data[s])
+                                   for s in (slice(None, half),
+                                             slice(half, None))]
+        self.values = [Obj(nodeLabel=int(l), data=tuple(d))
+                       for l, d in zip(labels, data)]
+        self.regions = []
+
+    def getSubset(self, region):
+        self.regions.append(region)
+        return self
+
+
+def fake_odb(frames_data, bulk=True, displ='U'):
+    """Builds an ODB with one step ``'Step-1'``
+
+    Each item of ``frames_data`` is a tuple ``(labels, u, nforc_labels,
+    nforc3)`` giving one frame.
+
+    """
+    frames = []
+    for labels, u, nforc_labels, nforc3 in frames_data:
+        fieldOutputs = {displ: FieldOutput(labels, u, bulk),
+                        'NFORC3': FieldOutput(nforc_labels, nforc3, bulk)}
+        frames.append(Obj(fieldOutputs=fieldOutputs))
+    steps = OrderedDict([('Step-1', Obj(frames=frames))])
+    node_sets = {'MERIDIAN_001': 'region'}
+    instance = Obj(nodeSets=node_sets)
+    root = Obj(instances={'INSTANCECYLINDER': instance})
+    return Obj(steps=steps, rootAssembly=root)
+
+
+class TestReadOutputsEntity(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        self.node_ids = [12, 5, None, 40, 7]
+        self.ids = np.array([12, 5, 40, 7])
+        # the ODB returns the labels in another order and has labels that
+        # do not belong to the entity
+        labels = np.array([7, 99, 40, 5, 12, 3])
+        self.frames_data = []
+        self.u = []
+        self.fz = []
+        for i in range(3):
+            u = rng.uniform(-1, 1, (labels.shape[0], 3))
+            # each node shared by two elements
+            nforc_labels = np.concatenate((labels, labels[::-1]))
+            nforc3 = rng.uniform(-10, 10, nforc_labels.shape[0])
+            self.frames_data.append((labels, u, nforc_labels, nforc3))
+            pos = [list(labels).index(i) for i in self.ids]
+            self.u.append(u.astype(np.float32)[pos])
+            fz = [nforc3.astype(np.float32)[nforc_labels == i].sum()
+                  for i in self.ids]
+            self.fz.append(fz)
+        self.u = np.array(self.u)
+        self.fz = np.array(self.fz)
+
+    def check(self, entity, frames):
+        np.testing.assert_array_equal(entity.node_ids, self.ids)
+        for j, name in enumerate(('dx', 'dy', 'dz')):
+            values = getattr(entity, name)['Step-1']
+            self.assertEqual(values.shape, (3, 4))
+            np.testing.assert_allclose(values[frames], self.u[frames, :, j],
+                                       rtol=1e-6)
+        np.testing.assert_allclose(entity.fz['Step-1'][frames],
+                                   self.fz[frames], rtol=1e-5)
+        nodes = [node for node in entity.nodes if node is not None]
+        for j, node in enumerate(nodes):
+            np.testing.assert_array_equal(node.dz['Step-1'],
+                                          entity.dz['Step-1'][:, j])
+            np.testing.assert_array_equal(node.fz['Step-1'],
+                                          entity.fz['Step-1'][:, j])
+        dr = entity.dr['Step-1'][frames]
+        thetarad = np.arctan2(self.u[frames, :, 1], self.u[frames, :, 0])
+        np.testing.assert_allclose(dr, self.u[frames, :, 0]/np.cos(thetarad),
+                                   rtol=1e-6)
+
+    def test_bulk_data_blocks(self):
+        odb = fake_odb(self.frames_data, bulk=True)
+        # the values must not be used when bulkDataBlocks are available
+        for frame in odb.steps['Step-1'].frames:
+            for field in frame.fieldOutputs.values():
+                field.values = None
+        entity = Entity(self.node_ids)
+        _read_outputs_entity(None, odb, entity)
+        self.check(entity, [0, 1, 2])
+        field = odb.steps['Step-1'].frames[0].fieldOutputs['U']
+        self.assertEqual(field.regions, ['region'])
+
+    def test_values(self):
+        odb = fake_odb(self.frames_data, bulk=False)
+        entity = Entity(self.node_ids)
+        _read_outputs_entity(None, odb, entity)
+        self.check(entity, [0, 1, 2])
+
+    def test_UT(self):
+        odb = fake_odb(self.frames_data, displ='UT')
+        entity = Entity(self.node_ids)
+        _read_outputs_entity(None, odb, entity)
+        self.check(entity, [0, 1, 2])
+
+    def test_nforc3_sum(self):
+        odb = fake_odb(self.frames_data, bulk=False)
+        entity = Entity(self.node_ids)
+        _read_outputs_entity(None, odb, entity)
+        labels, u, nforc_labels, nforc3 = self.frames_data[1]
+        nforc3 = nforc3.astype(np.float32)
+        pos = list(labels).index(40)
+        expected = nforc3[pos] + nforc3[nforc_labels.shape[0] - 1 - pos]
+        self.assertAlmostEqual(entity.fz['Step-1'][1, 2], expected, 4)
+
+    def test_last_frame(self):
+        odb = fake_odb(self.frames_data)
+        entity = Entity(self.node_ids)
+        _read_outputs_entity(None, odb, entity, last_frame=True)
+        self.check(entity, [2])
+        for name in ('dx', 'dy', 'dz', 'dr'):
+            self.assertTrue(np.isnan(getattr(entity, name)['Step-1'][:2])
+                            .all())
+        np.testing.assert_array_equal(entity.fz['Step-1'][:2], 0.)
+        frames = odb.steps['Step-1'].frames
+        self.assertEqual(frames[0].fieldOutputs['U'].regions, [])
+
+    def test_no_nodes(self):
+        odb = fake_odb(self.frames_data)
+        entity = Entity([])
+        _read_outputs_entity(None, odb, entity)
+        self.assertFalse(hasattr(entity, 'dx'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -90,10 +90,15 @@ class MSI(object):
     ``scaling_factor``      ``float``, a scaling factor that is applied to
                             the imperfection amplitude
     ``sample_size``         Avoids a memory overflow during runtime for
-                            large imperfection files
+                            large imperfection files. The points are
+                            sampled at random, such that larger files
+                            do not use the interpolation cache
     ``rotatedeg``           ``float``, rotation angle in degrees telling
                             how much the imperfection pattern should be
                             rotated about the `X_3` (or `Z`) axis.
+    ``use_cache``           ``bool``, reuses the interpolation of previous
+                            models with the same mesh and imperfection
+                            file, see :mod:`.interp_cache`
     ======================  ==================================================
 
     The following attributes of the :class:`.MSI` object control the
@@ -162,6 +167,7 @@ class MSI(object):
         self.ignore_bot_h = True
         self.ignore_top_h = True
         self.sample_size = 2000000
+        self.use_cache = True
         #TODO: include z_offset_bottom to calculate ignore_bot_h and
         #      ignore_top_h
         # plotting options
@@ -178,6 +184,7 @@ class MSI(object):
         if attrs['xaxis'] == 'amplitude':
             attrs['xaxis'] = 'scaling_factor'
             attrs['xaxis_label'] = 'Scaling factor'
+        attrs.setdefault('use_cache', True)
         self.__dict__.update(attrs)
 
     def rebuild(self):
@@ -269,7 +276,8 @@ class MSI(object):
                               use_theta_z_format = self.use_theta_z_format,
                               ignore_bot_h = self.ignore_bot_h,
                               ignore_top_h = self.ignore_top_h,
-                              sample_size = self.sample_size)
+                              sample_size = self.sample_size,
+                              use_cache = self.use_cache)
         else:
             if self.rotatedeg:
                 warn('"rotatedeg != 0", be sure you included this effect ' +
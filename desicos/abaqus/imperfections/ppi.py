@@ -133,13 +133,13 @@ class PPI(Imperfection):
         for i, angle in enumerate(cc.stack):
             field_name = 'ply_%02d_field' % (i+1)
             values = self.fiber_orientation(i, coords)
-            if np.nan in values:
+            if np.isnan(values).any():
                 raise ValueError('Invalid PPI parameters: not all points are covered by ply pieces')
             field = mod.DiscreteField(
                         name=field_name,
                         defaultValues=(angle, ),
                         fieldType=SCALAR,
-                        data=[('', 1, el_ids, values)])
+                        data=[('', 1, el_ids, values.tolist())])
             fields.append(field)
         return fields
 
@@ -194,7 +194,7 @@ class PPI(Imperfection):
 
         """
         eta, zeta = self.gcs_to_unfolded(coords[:,0], coords[:,1], coords[:,2])
-        return [self.models[ply_index].local_orientation(e, z) for e, z in zip(eta, zeta)]
+        return self.models[ply_index].local_orientations(eta, zeta)
 
     def gcs_to_unfolded(self, x, y, z):
         """Convert global xyz coordinates to the unfolded (eta, zeta)-csys.
@@ -20,6 +20,8 @@ class TI(object):
         self.name = 'ti'
         self.imp_thick = ''
         self.number_of_sets = None
+        self.binning = None
+        self.t_tol = None
         self.stretch_H = False
         self.ncp = 5
         self.power_parameter = 2
@@ -49,6 +51,8 @@ class TI(object):
         if attrs['xaxis'] == 'amplitude':
             attrs['xaxis'] = 'scaling_factor'
             attrs['xaxis_label'] = 'Scaling factor'
+        attrs.setdefault('binning', None)
+        attrs.setdefault('t_tol', None)
         self.__dict__.update(attrs)
 
     def calc_amplitude(self):
@@ -80,6 +84,26 @@ class TI(object):
 
             return max_amp
 
+    def read_measured(self):
+        """Reads the measured data of ``imp_thick`` from the data-base
+
+        Returns
+        -------
+        imperfection_file_name, t_measured, R_best_fit, H_measured : tuple
+            The path to the imperfection file, the nominal thickness, the
+            best fit radius and the height of the measured specimen.
+
+        """
+        imps, imps_theta_z, t_measured, R_best_fit, H_measured = update_imps()
+
+        if self.use_theta_z_format:
+            imperfection_file_name = imps_theta_z[self.imp_thick]['ti']
+        else:
+            imperfection_file_name = imps[self.imp_thick]['ti']
+
+        return (imperfection_file_name, t_measured[self.imp_thick],
+                R_best_fit[self.imp_thick], H_measured[self.imp_thick])
+
     def create(self, force=False):
         """Creates the thickness imperfection
 
@@ -103,17 +127,8 @@ class TI(object):
                 cc.create_model()
             else:
                 return
-        cc = self.impconf.conecyl
-        imps, imps_theta_z, t_measured, R_best_fit, H_measured = update_imps()
-
-        if self.use_theta_z_format:
-            imperfection_file_name = imps_theta_z[self.imp_thick]['ti']
-        else:
-            imperfection_file_name = imps[self.imp_thick]['ti']
-
-        H_measured = H_measured[self.imp_thick]
-        R_best_fit = R_best_fit[self.imp_thick]
-        t_measured = t_measured[self.imp_thick]
+        (imperfection_file_name, t_measured, R_best_fit,
+         H_measured) = self.read_measured()
         cc = self.impconf.conecyl
         self.elems_t, self.t_set = change_thickness_ABAQUS(
                       imperfection_file_name = imperfection_file_name,
@@ -135,7 +150,9 @@ class TI(object):
                       num_sec_z = self.num_sec_z,
                       elems_t = self.elems_t,
                       t_set = self.t_set,
-                      use_theta_z_format = self.use_theta_z_format)
+                      use_theta_z_format = self.use_theta_z_format,
+                      binning = self.binning,
+                      t_tol = self.t_tol)
 
         from desicos.abaqus.abaqus_functions import set_colors_ti
         set_colors_ti(cc)
@@ -113,7 +113,22 @@ class Study(object):
         os.chdir(self.tmp_dir)
 
     def create_models(self, write_input_files=True,
-                      apply_msis=False, apply_tis=False):
+                      apply_msis=False, apply_tis=False, processes=1):
+        """Creates the models of this study
+
+        Parameters
+        ----------
+        write_input_files : bool, optional
+            If the input files should be written.
+        apply_msis : bool, optional
+            Applies the geometric imperfections, see :meth:`.apply_msis`.
+        apply_tis : bool, optional
+            Applies the thickness imperfections, see :meth:`.apply_tis`.
+        processes : int or None, optional
+            The number of worker processes used to calculate the
+            imperfections, see :meth:`.precompute_imperfections`.
+
+        """
         import desicos.abaqus.imperfections as imperfections
 
         self.rebuild()
@@ -130,48 +145,165 @@ class Study(object):
             self.ccs[0].impconf.conecyl = self.ccs[0]
         for cc in self.ccs:
             cc.create_model()
+        if apply_msis or apply_tis:
+            self.precompute_imperfections(msis=apply_msis, tis=apply_tis,
+                                          processes=processes)
         if apply_msis:
-            self.apply_msis()
+            self.apply_msis(precompute=False)
         if apply_tis:
-            self.apply_tis()
+            self.apply_tis(precompute=False)
         if write_input_files:
             for cc in self.ccs:
                 cc.write_job(submit = False)
         self.create_run_file()
         os.chdir(self.tmp_dir)
 
-    def apply_msis(self):
+    def precompute_imperfections(self, msis=True, tis=True, processes=1):
+        """Calculates the measured imperfections of all models at once
+
+        The node coordinates and the element centroids of each model are
+        read from Abaqus and the interpolation of the measured data, which
+        does not need Abaqus, can be distributed among worker processes by
+        :func:`.calc_imperfections`. The results are stored in
+        ``msi.nodal_translations``, ``ti.elems_t`` and ``ti.t_set``, such
+        that :meth:`.MSI.create` and :meth:`.TI.create` only have to edit the
+        models.
+
+        .. note:: Must be called from Abaqus, after the models are created.
+
+        Parameters
+        ----------
+        msis : bool, optional
+            If the nodal translations of the :class:`.MSI` objects should be
+            calculated.
+        tis : bool, optional
+            If the element thicknesses of the :class:`.TI` objects should be
+            calculated.
+        processes : int or None, optional
+            The number of worker processes. By default the calculations are
+            performed in this process. All the CPUs are used if ``None``.
+            Worker processes are not started from Abaqus/CAE on Windows,
+            see :func:`.calc_imperfections`.
+
+        """
+        from abaqus import mdb
+
+        from desicos.abaqus.apply_imperfections import (read_nodes_ABAQUS,
+                calc_imperfections)
+        from desicos.abaqus.utils import vec_calc_elem_cg
+
+        jobs = []
+        imps = []
+        for cc in self.ccs:
+            if msis:
+                for msi in cc.impconf.msis:
+                    if msi.created or msi.c0 is not None:
+                        continue
+                    part_nodes, coords, nodes = read_nodes_ABAQUS(
+                            cc.model_name, cc.part_name_shell, cc.H,
+                            ignore_bot_h = msi.ignore_bot_h,
+                            ignore_top_h = msi.ignore_top_h)
+                    jobs.append(('msi', dict(
+                            coords = coords,
+                            imperfection_file_name = msi.path,
+                            H_model = cc.H,
+                            H_measured = msi.H_measured,
+                            R_model = cc.rbot,
+                            R_best_fit = msi.R_best_fit,
+                            semi_angle = cc.alphadeg,
+                            stretch_H = msi.stretch_H,
+                            rotatedeg = msi.rotatedeg,
+                            r_TOL = msi.r_TOL,
+                            num_closest_points = msi.ncp,
+                            power_parameter = msi.power_parameter,
+                            num_sec_z = msi.num_sec_z,
+                            use_theta_z_format = msi.use_theta_z_format,
+                            sample_size = msi.sample_size,
+                            nodes = nodes,
+                            use_cache = msi.use_cache)))
+                    imps.append(msi)
+            if tis:
+                for ti in cc.impconf.tis:
+                    if ti.created:
+                        continue
+                    (imperfection_file_name, t_measured, R_best_fit,
+                     H_measured) = ti.read_measured()
+                    mod = mdb.models[cc.model_name]
+                    part = mod.parts[cc.part_name_shell]
+                    elements = vec_calc_elem_cg(part.elements)
+                    jobs.append(('ti', dict(
+                            elements = elements,
+                            imperfection_file_name = imperfection_file_name,
+                            t_model = sum(cc.plyts),
+                            t_measured = t_measured,
+                            H_model = cc.H,
+                            H_measured = H_measured,
+                            R_model = cc.rbot,
+                            R_best_fit = R_best_fit,
+                            semi_angle = cc.alphadeg,
+                            stretch_H = ti.stretch_H,
+                            num_closest_points = ti.ncp,
+                            power_parameter = ti.power_parameter,
+                            num_sec_z = ti.num_sec_z,
+                            use_theta_z_format = ti.use_theta_z_format)))
+                    imps.append(ti)
+        if not jobs:
+            return
+
+        results = calc_imperfections(jobs, processes=processes)
+        for (kind, kwargs), imp, result in zip(jobs, imps, results):
+            if kind == 'msi':
+                imp.nodal_translations = result
+            else:
+                imp.elems_t, imp.t_set = result
+
+    def apply_msis(self, precompute=True, processes=1):
         """Applies all geometric imperfections in this study
 
-        It assumes the same :class:`.MSI` for all the :class:`ConeCyl` objects
-        that are in the ``ccs`` container.
+        Parameters
+        ----------
+        precompute : bool, optional
+            If the nodal translations of all models should be calculated
+            first using :meth:`.precompute_imperfections`. If ``False`` the
+            translations already stored in each :class:`.MSI` are used.
+        processes : int or None, optional
+            See :meth:`.precompute_imperfections`.
 
         """
-        nodal_translations = None
+        if precompute:
+            self.precompute_imperfections(msis=True, tis=False,
+                                          processes=processes)
         for cc in self.ccs:
             for msi in cc.impconf.msis:
-                msi.nodal_translations = nodal_translations
-                nodal_translations = msi.create()
+                msi.create()
 
-    def apply_tis(self):
+    def apply_tis(self, precompute=True, processes=1):
         """Applies all thickness imperfections in this study
 
-        It assumes the same :class:`.TI` for all the :class:`ConeCyl` objects
-        that are in the ``ccs`` container.
+        Parameters
+        ----------
+        precompute : bool, optional
+            If the element thicknesses of all models should be calculated
+            first using :meth:`.precompute_imperfections`. If ``False`` the
+            thicknesses already stored in each :class:`.TI` are used.
+        processes : int or None, optional
+            See :meth:`.precompute_imperfections`.
 
         """
-        elems_t_dict = None
-        t_set = None
+        if precompute:
+            self.precompute_imperfections(msis=False, tis=True,
+                                          processes=processes)
         for cc in self.ccs:
             for ti in cc.impconf.tis:
-                ti.elems_t_dict = elems_t_dict
-                ti.t_set = t_set
-                elems_t_dict, t_set = ti.create()
+                ti.create()
 
     def create_run_file(self):
         """Creates the run file which can be called from any Python
 
-        The file is stored in the ``self.study_dir`` folder.
+        The file is stored in the ``self.study_dir`` folder, together with
+        copies of the :mod:`.scheduler` and ``job_stopper.py`` modules. The
+        jobs are run concurrently, e.g. ``python run_study.py max_jobs=4
+        cpus=2`` runs up to four jobs with two CPUs each.
 
         """
         import desicos.abaqus.utils.jobs as jobs
@@ -185,6 +317,8 @@ class Study(object):
         jobs.print_run_file(self.study_dir, self.runnames, tmpf)
         shutil.copy2(os.path.join(DAHOME, 'utils', 'job_stopper.py'),
                                   self.study_dir)
+        shutil.copy2(os.path.join(DAHOME, 'utils', 'scheduler.py'),
+                                  self.study_dir)
         tmpf.close()
 
     def open_excel(self):
@@ -13,6 +13,12 @@ Includes all utilities functions that can be executed without Abaqus.
 .. automodule:: desicos.abaqus.utils.geom
     :members:
 
+.. automodule:: desicos.abaqus.utils.scheduler
+    :members:
+
+.. automodule:: desicos.abaqus.utils.thickness_bins
+    :members:
+
 """
 from __future__ import absolute_import
 from .utils import *
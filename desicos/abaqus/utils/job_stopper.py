@@ -1,71 +1,166 @@
 import sys
 import os
 import time
+
+
+class DropDetector(object):
+    """Detects the buckling drops of a reaction force history
+
+    The values are given one at a time using :meth:`add`, such that each
+    new increment is processed in constant time.
+
+    """
+    def __init__(self, criterion1=0.01, criterion2=0.30):
+        self.criterion1 = criterion1 # % to consider a local  buckling drop
+        self.criterion2 = criterion2 # % to consider a global buckling drop
+        self.drops = 0
+        self.grow = True
+        self.peak = None
+        self.nadir = None
+        self.last = None
+        self.stop = False
+
+    def add(self, rf3):
+        """Adds a new value and returns ``True`` if the job should stop"""
+        # as in the original algorithm the last value is not evaluated
+        if self.last is not None:
+            self._evaluate(self.last)
+        self.last = abs(rf3)
+        return self.stop
+
+    def _evaluate(self, rf3):
+        c1 = self.criterion1
+        c2 = self.criterion2
+        if self.peak is None:
+            self.peak = rf3
+            self.nadir = rf3
+        if self.grow and rf3 < (1-c1)*self.peak:
+            self.grow  = False
+            self.nadir = self.peak
+            self.drops += 1
+        if not self.grow and rf3 < (1-c2)*self.peak:
+            self.stop = True # global buckling
+        if self.grow and rf3 > self.peak:
+            self.peak = rf3
+        if not self.grow and rf3 < self.nadir:
+            self.nadir = rf3
+        if not self.grow and rf3 > (1+c1)*self.nadir:
+            self.peak = self.nadir
+            self.grow = True
+        if self.drops > 1:
+            self.stop = True
+
+
 def check_stop(rf3s):
-    criterion1 = 0.01 # % to consider a local  buckling drop
-    criterion2 = 0.30 # % to consider a global buckling drop
-    if len(rf3s) < 2:
-        return False
-    rf3s = [abs(rf3) for rf3 in rf3s]
-    rf3_max = max(rf3s)
-    rf3s = [rf3/rf3_max for rf3 in rf3s] # normalizing 0. to 1.
-    drops = 0
-    grow = True
-    peak = rf3s[0]
-    nadir = rf3s[0]
-    for i,rf3 in enumerate(rf3s[1:]):
-        if grow and rf3s[i] < (1-criterion1)*peak:
-            grow  = False
-            nadir = peak
-            drops += 1
-        if not grow and rf3s[i] < (1-criterion2)*peak:
-            return True # global buckling
-        if grow and rf3s[i] > peak:
-            peak = rf3s[i]
-        if not grow and rf3s[i] < nadir:
-            nadir = rf3s[i]
-        if not grow and rf3s[i] > (1+criterion1)*nadir:
-            peak = nadir
-            grow = True
-    if drops > 1:
-        return True
-    else:
-        return False
+    detector = DropDetector()
+    for rf3 in rf3s:
+        detector.add(rf3)
+    return detector.stop
+
+
+class RF3Tail(object):
+    """Reads the RF3 values appended to a ``.dat`` file since the last read
+
+    The file offset and the parser state are kept between the calls, such
+    that only the new bytes are parsed.
+
+    """
+    def __init__(self, dat_path):
+        self.dat_path = dat_path
+        self.offset = 0
+        self.partial = ''
+        self.skip = None
+
+    def read(self):
+        try:
+            size = os.path.getsize(self.dat_path)
+        except OSError:
+            return []
+        if size < self.offset:
+            # the file was overwritten by a new run
+            self.offset = 0
+            self.partial = ''
+            self.skip = None
+        if size == self.offset:
+            return []
+        dat_file = open(self.dat_path, 'rb')
+        dat_file.seek(self.offset)
+        data = dat_file.read(size - self.offset)
+        dat_file.close()
+        self.offset += len(data)
+        lines = (self.partial + data.decode('latin-1')).split('\n')
+        self.partial = lines.pop()
+        rf3s = []
+        for line in lines:
+            if self.skip is not None:
+                if self.skip > 0:
+                    self.skip -= 1
+                else:
+                    self.skip = None
+                    rf3s.append(float(line.split()[2]))
+            elif line.find('NODE FOOT-') > -1:
+                # the values are in the third line after the header
+                self.skip = 2
+        return rf3s
+
+
+class JobStopper(object):
+    """Keeps the state of the job stopper for one job
+
+    Each call to :meth:`check` parses only the increments written to the
+    ``.dat`` file since the previous call.
+
+    """
+    def __init__(self, output_dir, jobname):
+        self.jobname = jobname
+        self.tail = RF3Tail(os.path.join(output_dir, jobname + '.dat'))
+        self.detector = DropDetector()
+
+    def check(self):
+        if self.jobname[-3:] == '_lb':
+            return False
+        for rf3 in self.tail.read():
+            self.detector.add(rf3)
+        return self.detector.stop
+
 
 def read_rf3( output_dir, jobname ):
     dat_path = os.path.join( output_dir, jobname + '.dat')
-    if not os.path.isfile( dat_path ):
-        return []
-    dat_file = open( dat_path, 'r' )
-    lines = iter(dat_file.readlines())
-    rf3s = []
-    while True:
-        try:
-            line = lines.next()
-        except StopIteration:
-            break
-        if line.find('NODE FOOT-') > -1:
-            lines.next()
-            lines.next()
-            line = lines.next()
-            rf3s.append( float(line.split()[2]) )
-    return rf3s
-
-def stopper( output_dir, jobname ):
-    if jobname[-3:] == '_lb':
-        return False
-    rf3s = read_rf3( output_dir, jobname )
-    if check_stop(rf3s):
-        os.system('abaqus terminate job=%s' % jobname)
-        time.sleep(30)
-        dat_path = os.path.join( output_dir, jobname + '.dat')
-        if os.name == 'nt':
-            os.system('del %s' % dat_path)
-        else:
-            os.system('rm %s' % dat_path)
+    return RF3Tail(dat_path).read()
 
-if __name__ == '__main__':
-    output_dir, jobname = sys.argv[1:]
-    stopper( output_dir, jobname )
+def remove_dat( output_dir, jobname ):
+    """Removes the ``.dat`` file of a terminated job"""
+    dat_path = os.path.join( output_dir, jobname + '.dat')
+    try:
+        os.remove(dat_path)
+    except OSError:
+        pass
+
+def terminate( output_dir, jobname ):
+    os.system('abaqus terminate job=%s' % jobname)
+    time.sleep(30)
+    remove_dat( output_dir, jobname )
+
+def stopper( output_dir, jobname, interval=None ):
+    """Stops the job after the buckling drops
 
+    If ``interval`` is given the ``.dat`` file is checked every ``interval``
+    seconds while the job is running (while its ``.lck`` file exists).
 
+    """
+    js = JobStopper(output_dir, jobname)
+    lck_path = os.path.join( output_dir, jobname + '.lck')
+    while True:
+        if js.check():
+            terminate( output_dir, jobname )
+            return True
+        if interval is None or not os.path.isfile(lck_path):
+            return False
+        time.sleep(interval)
+
+if __name__ == '__main__':
+    output_dir, jobname = sys.argv[1:3]
+    interval = None
+    if len(sys.argv) > 3:
+        interval = float(sys.argv[3])
+    stopper( output_dir, jobname, interval )
@@ -0,0 +1,443 @@
+r"""
+Job Scheduler (:mod:`desicos.abaqus.utils.scheduler`)
+=====================================================
+
+.. currentmodule:: desicos.abaqus.utils.scheduler
+
+Runs the input files of a study using many solver processes at once.
+
+This module does not depend on Abaqus nor on the other DESICOS modules, such
+that it can be copied to the study folder and executed from any Python
+interpreter by the run file created with :func:`.print_run_file`.
+
+The jobs are started with the ``interactive`` option, such that the end of
+each job is detected when its solver process exits. The ``.log`` file of
+each running job is read incrementally to report the completion status.
+Jobs whose ``.log`` file shows a completed analysis are skipped, such that
+an interrupted study can be resumed by calling the run file again. The
+linear buckling model, named with the ``_lb`` suffix, is always started
+first. The other jobs of the study may read its results (``*IMPERFECTION,
+FILE=...``), such that they are only started after it finished and are
+skipped if it fails.
+
+"""
+from __future__ import print_function
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+try:
+    from . import job_stopper
+except (ImportError, ValueError):
+    # copied to the study folder, next to job_stopper.py
+    import job_stopper
+
+
+COMPLETED = ('End Abaqus/Standard Analysis', 'End Abaqus/Explicit Analysis')
+ERRORS = ('Abaqus/Analysis exited with errors',)
+
+
+class LogTail(object):
+    """Reads only the lines added to a text file since the last read
+
+    Parameters
+    ----------
+    path : str
+        The path to the text file, which does not need to exist yet.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.partial = ''
+
+    def read(self):
+        """Returns the complete lines added since the last call
+
+        Returns
+        -------
+        lines : list
+            The new lines, without the line terminators. An incomplete last
+            line is kept until it is completed.
+
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size < self.offset:
+            # the file was overwritten by a new run
+            self.offset = 0
+            self.partial = ''
+        if size == self.offset:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        self.offset += len(data)
+        lines = (self.partial + data.decode('latin-1')).split('\n')
+        self.partial = lines.pop()
+        return [line.rstrip('\r') for line in lines]
+
+
+def log_status(lines):
+    """Checks the lines of a ``.log`` file for the end of the analysis
+
+    Parameters
+    ----------
+    lines : list
+        Lines of the ``.log`` file.
+
+    Returns
+    -------
+    status : str or None
+        ``'finished'``, ``'errors'`` or ``None`` if no line reports the end
+        of the analysis.
+
+    """
+    status = None
+    for line in lines:
+        if any(s in line for s in COMPLETED):
+            status = 'finished'
+        elif any(s in line for s in ERRORS):
+            status = 'errors'
+    return status
+
+
+class Job(object):
+    """A solver job of the scheduler
+
+    Parameters
+    ----------
+    name : str
+        The job name, which is also the name of the input file without the
+        ``.inp`` extension.
+    output_dir : str
+        The folder containing the input file, where the job will run.
+
+    """
+    def __init__(self, name, output_dir):
+        self.name = name
+        self.output_dir = output_dir
+        self.input_file = os.path.join(output_dir, name + '.inp')
+        self.tail = LogTail(os.path.join(output_dir, name + '.log'))
+        self.status = 'pending'
+        self.log_status = None
+        self.process = None
+        self.stopper = None
+        self.stopped = False
+        # the jobs whose results are required, see Scheduler.check_depends
+        self.depends = []
+        self.start_time = None
+        self.counter = None
+
+    @property
+    def priority(self):
+        return 0 if self.name.endswith('_lb') else 1
+
+    def update_status(self):
+        """Reads the new lines of the ``.log`` file
+
+        Returns
+        -------
+        status : str or None
+            See :func:`.log_status`.
+
+        """
+        status = log_status(self.tail.read())
+        if status is not None:
+            self.log_status = status
+        return self.log_status
+
+
+class Scheduler(object):
+    """Runs many solver jobs concurrently
+
+    Parameters
+    ----------
+    output_dir : str
+        The folder containing the input files.
+    model_names : list
+        The names of the jobs, in the desired execution order.
+    max_jobs : int, optional
+        The maximum number of jobs running at once, usually limited by the
+        number of solver licences.
+    max_cpus : int or None, optional
+        The maximum number of CPUs used by all running jobs. No limit is
+        applied if ``None``.
+    cpus : int, optional
+        The number of CPUs used by each job. It is passed to the solver when
+        greater than ``1``.
+    solver : str or list, optional
+        The solver command. A list can be given to call a script, for
+        example ``[sys.executable, 'stub_solver.py']``.
+    solver_args : list, optional
+        Additional arguments passed to the solver.
+    interval : float, optional
+        Time in seconds between two checks of the running jobs.
+    use_stopper : bool, optional
+        If the running jobs should be terminated after the buckling drops,
+        see ``job_stopper.py``.
+    out : file, optional
+        Where the progress messages are written.
+
+    """
+    def __init__(self, output_dir, model_names, max_jobs=1, max_cpus=None,
+                 cpus=1, solver='abaqus', solver_args=(), interval=2.,
+                 use_stopper=False, out=None):
+        self.output_dir = output_dir
+        self.jobs = [Job(name, output_dir) for name in model_names]
+        # stable sort, keeping the given order within the same priority
+        self.jobs.sort(key=lambda job: job.priority)
+        lb_jobs = [job for job in self.jobs if job.priority == 0]
+        for job in self.jobs:
+            if job.priority != 0:
+                job.depends = lb_jobs
+        self.max_jobs = max(1, int(max_jobs))
+        self.max_cpus = max_cpus
+        self.cpus = max(1, int(cpus))
+        if isinstance(solver, str):
+            solver = [solver]
+        self.solver = list(solver)
+        self.solver_args = list(solver_args)
+        self.interval = interval
+        self.use_stopper = use_stopper
+        self.out = out if out is not None else sys.stdout
+        self.counter = 0
+        self.total = 0
+
+    def message(self, msg, job=None):
+        if job is not None:
+            msg = '{0}: {1} at {2}'.format(msg, job.name, time.ctime())
+        print(msg, file=self.out)
+        self.out.flush()
+
+    def command(self, job):
+        """Returns the command used to start a job"""
+        cmd = self.solver + ['job={0}'.format(job.name),
+                             'input={0}'.format(job.input_file)]
+        if self.cpus > 1:
+            cmd.append('cpus={0:d}'.format(self.cpus))
+        cmd += self.solver_args
+        cmd.append('interactive')
+        return cmd
+
+    def check_pending(self):
+        """Skips the jobs without input file or that are already finished"""
+        for job in self.jobs:
+            if not os.path.isfile(job.input_file):
+                job.status = 'missing'
+                self.message('Not found .inp  for', job)
+                continue
+            status = job.update_status()
+            if status == 'finished':
+                job.status = 'skipped'
+                self.message('Skipping', job)
+            elif status == 'errors':
+                job.status = 'skipped'
+                self.message('Skipping (with ERRORS)', job)
+
+    def check_depends(self, job):
+        """Checks if the jobs required by a job are finished
+
+        Returns
+        -------
+        status : str
+            ``'ready'`` if all the required jobs finished, ``'waiting'`` if
+            any of them is pending or running and ``'failed'`` otherwise.
+
+        """
+        for dep in job.depends:
+            if dep.status in ('pending', 'running'):
+                return 'waiting'
+        for dep in job.depends:
+            # a skipped job may have finished with errors in a previous run
+            if (dep.status not in ('finished', 'skipped')
+                or dep.log_status != 'finished'):
+                return 'failed'
+        return 'ready'
+
+    def can_start(self, running):
+        if len(running) >= self.max_jobs:
+            return False
+        if self.max_cpus is None or not running:
+            return True
+        return (len(running) + 1)*self.cpus <= self.max_cpus
+
+    def start(self, job):
+        lck = os.path.join(self.output_dir, job.name + '.lck')
+        if os.path.isfile(lck):
+            os.remove(lck)
+        # the solver overwrites the .log file of a previous incomplete run
+        job.tail = LogTail(job.tail.path)
+        job.log_status = None
+        cmd = self.command(job)
+        if os.name == 'nt':
+            # the solver is usually a batch file
+            cmd = subprocess.list2cmdline(cmd)
+        job.process = subprocess.Popen(cmd, cwd=self.output_dir,
+                                       shell=(os.name == 'nt'))
+        job.status = 'running'
+        job.start_time = time.time()
+        self.counter += 1
+        job.counter = self.counter
+        self.message('____________________\n')
+        self.message('Counter: job {0:05d} out of {1:05d}'.format(
+                     job.counter, self.total))
+        self.message('Started  ABAQUS for', job)
+
+    def check_running(self, job):
+        """Checks if a running job is finished
+
+        Returns
+        -------
+        finished : bool
+            ``True`` if the solver process exited.
+
+        """
+        returncode = job.process.poll()
+        status = job.update_status()
+        if returncode is None:
+            if self.use_stopper and status is None:
+                self.run_stopper(job)
+            return False
+        if status == 'finished' and returncode == 0:
+            job.status = 'finished'
+            self.message('Finished', job)
+        elif job.stopped:
+            job.status = 'stopped'
+            self.message('Stopped', job)
+            # as in job_stopper.terminate(), once the solver released it
+            job_stopper.remove_dat(self.output_dir, job.name)
+        else:
+            job.status = 'errors'
+            self.message('Finished with ERRORS', job)
+        job.process = None
+        return True
+
+    def run_stopper(self, job):
+        if job.stopped:
+            return
+        # the stopper of each job keeps the position in the .dat file
+        if job.stopper is None:
+            job.stopper = job_stopper.JobStopper(self.output_dir, job.name)
+        if job.stopper.check():
+            self.message('Stopping after buckling', job)
+            job.stopped = True
+            self.terminate(job)
+
+    def terminate(self, job):
+        """Issues the solver command that terminates a running job
+
+        On Windows the solver runs inside a shell, such that terminating
+        the process of the job would not stop the solver.
+
+        Returns
+        -------
+        process : subprocess.Popen
+            The process of the terminate command.
+
+        """
+        cmd = self.solver + ['terminate', 'job={0}'.format(job.name)]
+        if os.name == 'nt':
+            cmd = subprocess.list2cmdline(cmd)
+        return subprocess.Popen(cmd, cwd=self.output_dir,
+                                shell=(os.name == 'nt'))
+
+    def run(self):
+        """Runs all the pending jobs
+
+        Returns
+        -------
+        jobs : list
+            The :class:`.Job` objects with the final ``status`` of each job:
+            ``'finished'``, ``'errors'``, ``'stopped'``, ``'skipped'`` or
+            ``'missing'``.
+
+        """
+        self.check_pending()
+        pending = [job for job in self.jobs if job.status == 'pending']
+        self.total = len(pending)
+        running = []
+        try:
+            while pending or running:
+                for job in list(pending):
+                    depends = self.check_depends(job)
+                    if depends == 'failed':
+                        pending.remove(job)
+                        job.status = 'skipped'
+                        self.message('Skipping (linear buckling failed)',
+                                     job)
+                    elif depends == 'ready' and self.can_start(running):
+                        pending.remove(job)
+                        self.start(job)
+                        running.append(job)
+                time.sleep(self.interval)
+                running = [job for job in running
+                           if not self.check_running(job)]
+        except KeyboardInterrupt:
+            for job in running:
+                self.message('Terminating', job)
+                self.terminate(job).wait()
+                job.process.terminate()
+            raise
+        self.message('____________________\n')
+        return self.jobs
+
+
+def split_command(command):
+    """Splits a command line, keeping quoted arguments with spaces
+
+    Parameters
+    ----------
+    command : str
+        The command line, e.g. ``'"C:\\Program Files\\python.exe" x.py'``.
+
+    Returns
+    -------
+    args : list
+        The arguments, without the quotes.
+
+    """
+    if os.name != 'nt':
+        return shlex.split(command)
+    # the backslashes of Windows paths are not escape characters
+    args = shlex.split(command, posix=False)
+    return [arg[1:-1] if len(arg) > 1 and arg[0] == arg[-1] == '"'
+            else arg for arg in args]
+
+
+def main(output_dir, model_names, argv=None):
+    """Runs the jobs using the command line arguments of the run file
+
+    The arguments ``max_jobs=K`` and ``max_cpus=N`` set the scheduler
+    limits, ``use_stopper`` enables the job stopper and ``solver=command``
+    replaces the solver command, where the paths containing spaces must be
+    quoted (see :func:`.split_command`). The other arguments are passed to the
+    solver, where ``cpus=n`` is also used to set the number of CPUs of each
+    job.
+
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    kwargs = {}
+    solver_args = []
+    for arg in argv:
+        key, sep, value = arg.partition('=')
+        if arg == 'use_stopper':
+            kwargs['use_stopper'] = True
+        elif arg == 'gui':
+            continue
+        elif key in ('max_jobs', 'max_cpus'):
+            kwargs[key] = int(value)
+        elif key == 'solver':
+            kwargs['solver'] = split_command(value)
+        elif key == 'cpus':
+            kwargs['cpus'] = int(value)
+        else:
+            solver_args.append(arg)
+    scheduler = Scheduler(output_dir, model_names, solver_args=solver_args,
+                          **kwargs)
+    return scheduler.run()
@@ -0,0 +1,79 @@
+"""Stub of the Abaqus command used to test the job scheduler
+
+Called as ``stub_solver.py job=NAME input=PATH [args] interactive``. The
+input file may contain the lines ``sleep=SECONDS``, ``errors`` and
+``rf3=V1,V2,...``, the latter writing one increment with each reaction force
+to the ``.dat`` file. The arguments and the start and end times are written
+to ``NAME.stub``, and the ``.log`` file is written as the one of Abaqus.
+
+Called as ``stub_solver.py terminate job=NAME`` the running job ends without
+completing the analysis.
+
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+
+
+DAT_INCREMENT = """
+                        N O D E   O U T P U T
+
+  THE FOLLOWING TABLE IS PRINTED AT THE NODES OF THE LOADED EDGE
+
+  NODE FOOT-  RF3
+  NOTE
+
+       1      1     {0:.6E}
+"""
+
+
+def main(argv):
+    if argv[0] == 'terminate':
+        name = argv[1].partition('=')[2]
+        open(name + '.terminate', 'w').close()
+        return 0
+    args = dict(arg.partition('=')[::2] for arg in argv)
+    name = args['job']
+    sleep = 0.
+    errors = False
+    rf3s = []
+    with open(args['input']) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('sleep='):
+                sleep = float(line.split('=')[1])
+            elif line == 'errors':
+                errors = True
+            elif line.startswith('rf3='):
+                rf3s = [float(v) for v in line.split('=')[1].split(',')]
+    start = time.time()
+    with open(name + '.log', 'w') as f:
+        f.write('Abaqus JOB {0}\n'.format(name))
+        f.write('Begin Abaqus/Standard Analysis\n')
+    terminated = False
+    with open(name + '.dat', 'w') as dat:
+        for i in range(max(len(rf3s), 1)):
+            if i < len(rf3s):
+                dat.write(DAT_INCREMENT.format(rf3s[i]))
+                dat.flush()
+            end = time.time() + sleep/max(len(rf3s), 1)
+            while time.time() < end and not terminated:
+                time.sleep(0.01)
+                terminated = os.path.isfile(name + '.terminate')
+            if terminated:
+                break
+    with open(name + '.log', 'a') as f:
+        if errors:
+            f.write('Abaqus/Analysis exited with errors\n')
+        elif not terminated:
+            f.write('End Abaqus/Standard Analysis\n')
+            f.write('Abaqus JOB {0} COMPLETED\n'.format(name))
+    with open(name + '.stub', 'w') as f:
+        print(' '.join(argv), file=f)
+        print(start, time.time(), file=f)
+    return 1 if errors or terminated else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,231 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from desicos.abaqus.utils.scheduler import Scheduler, main
+
+
+STUB = [sys.executable,
+        os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     'stub_solver.py')]
+
+
+class Output(object):
+    def __init__(self):
+        self.lines = []
+
+    def write(self, text):
+        self.lines.append(text)
+
+    def flush(self):
+        pass
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.out = Output()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def write(self, name, ext, text):
+        with open(os.path.join(self.output_dir, name + ext), 'w') as f:
+            f.write(text)
+
+    def read_stub(self, name):
+        path = os.path.join(self.output_dir, name + '.stub')
+        if not os.path.isfile(path):
+            return None
+        with open(path) as f:
+            argv = f.readline().split()
+            start, end = [float(v) for v in f.readline().split()]
+        return argv, start, end
+
+    def run_jobs(self, names, **kwargs):
+        scheduler = Scheduler(self.output_dir, names, solver=STUB,
+                              interval=0.05, out=self.out, **kwargs)
+        jobs = scheduler.run()
+        return dict((job.name, job.status) for job in jobs)
+
+    def max_running(self, names):
+        events = []
+        for name in names:
+            argv, start, end = self.read_stub(name)
+            events += [(start, 1), (end, -1)]
+        running = max_running = 0
+        for t, step in sorted(events):
+            running += step
+            max_running = max(max_running, running)
+        return max_running
+
+    def test_max_jobs(self):
+        names = ['job%d' % i for i in range(6)]
+        for name in names:
+            self.write(name, '.inp', 'sleep=0.5\n')
+        status = self.run_jobs(names, max_jobs=2)
+        self.assertEqual(set(status.values()), set(['finished']))
+        self.assertEqual(self.max_running(names), 2)
+
+    def test_max_cpus(self):
+        names = ['job%d' % i for i in range(4)]
+        for name in names:
+            self.write(name, '.inp', 'sleep=0.3\n')
+        status = self.run_jobs(names, max_jobs=4, max_cpus=5, cpus=2)
+        self.assertEqual(set(status.values()), set(['finished']))
+        self.assertEqual(self.max_running(names), 2)
+        argv = self.read_stub('job0')[0]
+        self.assertTrue('cpus=2' in argv)
+        self.assertEqual(argv[-1], 'interactive')
+
+    def test_lb_first(self):
+        names = ['cone_model1', 'cone_model2', 'cone_lb']
+        for name in names:
+            self.write(name, '.inp', 'sleep=0.1\n')
+        status = self.run_jobs(names, max_jobs=1)
+        self.assertEqual(status, {'cone_lb': 'finished',
+                                  'cone_model1': 'finished',
+                                  'cone_model2': 'finished'})
+        starts = [self.read_stub(name)[1] for name in names]
+        self.assertEqual(sorted(names, key=lambda n: starts[names.index(n)]),
+                         ['cone_lb', 'cone_model1', 'cone_model2'])
+
+    def test_lb_dependency(self):
+        names = ['cone_model_01', 'cone_model_02', 'cone_lb']
+        self.write('cone_lb', '.inp', 'sleep=1.\n')
+        for name in names[:2]:
+            self.write(name, '.inp', 'sleep=0.1\n')
+        status = self.run_jobs(names, max_jobs=3)
+        self.assertEqual(set(status.values()), set(['finished']))
+        lb_end = self.read_stub('cone_lb')[2]
+        for name in names[:2]:
+            self.assertTrue(self.read_stub(name)[1] >= lb_end)
+
+    def test_lb_failed(self):
+        names = ['cone_model_01', 'cone_model_02', 'cone_lb']
+        for lb_inp in ('sleep=0.3\nerrors\n', None):
+            self.tearDown()
+            self.setUp()
+            if lb_inp is not None:
+                self.write('cone_lb', '.inp', lb_inp)
+            for name in names[:2]:
+                self.write(name, '.inp', 'sleep=0.1\n')
+            status = self.run_jobs(names, max_jobs=3)
+            self.assertEqual(status['cone_lb'],
+                             'errors' if lb_inp else 'missing')
+            for name in names[:2]:
+                self.assertEqual(status[name], 'skipped')
+                self.assertEqual(self.read_stub(name), None)
+                msg = 'Skipping (linear buckling failed): ' + name
+                self.assertTrue(any(msg in line for line in self.out.lines))
+
+    def test_lb_skipped(self):
+        names = ['cone_model_01', 'cone_lb']
+        self.write('cone_model_01', '.inp', 'sleep=0.1\n')
+        self.write('cone_lb', '.inp', '')
+        self.write('cone_lb', '.log', 'End Abaqus/Standard Analysis\n')
+        status = self.run_jobs(names, max_jobs=2)
+        self.assertEqual(status, {'cone_lb': 'skipped',
+                                  'cone_model_01': 'finished'})
+        # finished with errors in a previous run
+        self.write('cone_lb', '.log', 'Abaqus/Analysis exited with errors\n')
+        os.remove(os.path.join(self.output_dir, 'cone_model_01.log'))
+        status = self.run_jobs(names, max_jobs=2)
+        self.assertEqual(status, {'cone_lb': 'skipped',
+                                  'cone_model_01': 'skipped'})
+
+    def test_keyboard_interrupt(self):
+        class Interrupted(Scheduler):
+            def check_running(self, job):
+                raise KeyboardInterrupt
+        self.write('job0', '.inp', 'sleep=30.\n')
+        scheduler = Interrupted(self.output_dir, ['job0'], solver=STUB,
+                                interval=0.5, out=self.out)
+        process = []
+        start = scheduler.start
+        def start_job(job):
+            start(job)
+            process.append(job.process)
+        scheduler.start = start_job
+        self.assertRaises(KeyboardInterrupt, scheduler.run)
+        # the solver was asked to terminate the job
+        path = os.path.join(self.output_dir, 'job0.terminate')
+        self.assertTrue(os.path.isfile(path))
+        process[0].wait()
+
+    def test_errors(self):
+        self.write('good', '.inp', 'sleep=0.1\n')
+        self.write('bad', '.inp', 'sleep=0.1\nerrors\n')
+        status = self.run_jobs(['good', 'bad'], max_jobs=2)
+        self.assertEqual(status, {'good': 'finished', 'bad': 'errors'})
+        self.assertTrue(any('Finished with ERRORS: bad' in line
+                            for line in self.out.lines))
+
+    def test_resume(self):
+        names = ['done', 'failed', 'incomplete', 'new', 'missing']
+        for name in names[:-1]:
+            self.write(name, '.inp', 'sleep=0.1\n')
+        self.write('done', '.log', 'Begin Abaqus/Standard Analysis\n'
+                                   'End Abaqus/Standard Analysis\n')
+        self.write('failed', '.log', 'Abaqus/Analysis exited with errors\n')
+        # a previous run interrupted before the end of the analysis
+        self.write('incomplete', '.log', 'Begin Abaqus/Standard Analysis\n'
+                                         'End Abaqus/Sta')
+        status = self.run_jobs(names, max_jobs=2)
+        self.assertEqual(status, {'done': 'skipped', 'failed': 'skipped',
+                                  'incomplete': 'finished',
+                                  'new': 'finished', 'missing': 'missing'})
+        self.assertEqual(self.read_stub('done'), None)
+        self.assertEqual(self.read_stub('failed'), None)
+
+    def test_stopper(self):
+        # the stopper checks the .dat file of the job that buckles
+        self.write('buckling', '.inp',
+                   'sleep=3.\nrf3=100,120,140,50,40,30,20,10,5,4\n')
+        self.write('stable', '.inp', 'sleep=0.3\nrf3=100,110,120\n')
+        status = self.run_jobs(['buckling', 'stable'], max_jobs=2,
+                               use_stopper=True)
+        self.assertEqual(status, {'buckling': 'stopped',
+                                  'stable': 'finished'})
+        argv, start, end = self.read_stub('buckling')
+        self.assertTrue(end - start < 2.)
+        path = os.path.join(self.output_dir, '%s.dat')
+        self.assertFalse(os.path.isfile(path % 'buckling'))
+        self.assertTrue(os.path.isfile(path % 'stable'))
+
+    def test_main(self):
+        self.write('job0', '.inp', '')
+        self.write('job1', '.inp', '')
+        self.write('job1', '.log', 'End Abaqus/Standard Analysis\n')
+        solver = 'solver=' + ' '.join(STUB)
+        stdout = sys.stdout
+        sys.stdout = self.out
+        try:
+            jobs = main(self.output_dir, ['job0', 'job1'],
+                        [solver, 'max_jobs=2', 'cpus=4', 'gui', 'memory=90%'])
+        finally:
+            sys.stdout = stdout
+        self.assertEqual([job.status for job in jobs], ['finished', 'skipped'])
+        argv = self.read_stub('job0')[0]
+        self.assertEqual(argv[2:], ['cpus=4', 'memory=90%', 'interactive'])
+
+    def test_main_solver_with_spaces(self):
+        stub_dir = os.path.join(self.output_dir, 'stub solver')
+        os.mkdir(stub_dir)
+        shutil.copy(STUB[1], stub_dir)
+        stub = os.path.join(stub_dir, 'stub_solver.py')
+        self.write('job0', '.inp', '')
+        solver = 'solver="{0}" "{1}"'.format(sys.executable, stub)
+        stdout = sys.stdout
+        sys.stdout = self.out
+        try:
+            jobs = main(self.output_dir, ['job0'], [solver])
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(jobs[0].status, 'finished')
+
+
+if __name__ == '__main__':
+    unittest.main()
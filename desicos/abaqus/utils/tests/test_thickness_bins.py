@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from desicos.abaqus.utils import index_within_linspace
+from desicos.abaqus.utils.thickness_bins import assign_levels, \
+    group_by_level, level_report, bin_thicknesses
+
+
+def legacy_sets(t_list, elems_t):
+    # grouping of change_thickness_ABAQUS() before the thickness bins
+    sets_ids = [[] for i in range(len(t_list))]
+    for elem_id, t in elems_t:
+        index = index_within_linspace(t_list, t)
+        sets_ids[index].append(int(elem_id))
+    return sets_ids
+
+
+class TestLegacyLevels(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        # measured thicknesses quantized to 0.01
+        self.t_set = set(np.round(rng.uniform(0.92, 1.06, 200), 2))
+        levels = np.array(sorted(self.t_set))
+        # interpolated thicknesses, with exact levels, exact middle points
+        # and the zeros of elements without measured data
+        t = np.concatenate((rng.uniform(0.9, 1.07, 3000), levels,
+                            0.5*(levels[1:] + levels[:-1]),
+                            np.linspace(0.92, 1.06, 57), np.zeros(5)))
+        rng.shuffle(t)
+        ids = rng.permutation(t.shape[0]) + 1
+        self.elems_t = np.column_stack((ids, t))
+
+    def check(self, t_list):
+        indices, report = level_report(t_list, self.elems_t[:, 1],
+                                       ignore_zero=False)
+        sets_ids = group_by_level(self.elems_t[:, 0], indices, len(t_list))
+        expected = legacy_sets(t_list, self.elems_t)
+        self.assertEqual([len(s) for s in sets_ids],
+                         [len(s) for s in expected])
+        self.assertEqual(sets_ids, expected)
+        self.assertEqual(report['counts'].tolist(),
+                         [len(s) for s in expected])
+
+    def test_unique(self):
+        t_list = np.array(sorted(self.t_set))
+        self.assertEqual(len(t_list), 15)
+        self.check(t_list)
+
+    def test_linspace(self):
+        for number_of_sets in (1, 2, 5, 10, 14, 37):
+            t_list = np.linspace(min(self.t_set), max(self.t_set),
+                                 number_of_sets+1)
+            self.check(t_list)
+
+    def test_repeated_levels(self):
+        self.check(np.linspace(1., 1., 4))
+        self.check(np.array([0.9, 1., 1., 1.1]))
+
+
+class TestBinThicknesses(unittest.TestCase):
+    def test_assign_levels(self):
+        levels = np.array([0.1, 0.3, 0.7])
+        t = np.array([0., 0.19, 0.21, 0.49, 0.69, 2.])
+        self.assertEqual(assign_levels(levels, t).tolist(),
+                         [0, 0, 1, 1, 2, 2])
+
+    def test_tolerance(self):
+        t = np.random.RandomState(2).uniform(0.9, 1.1, 1000)
+        for method in ('linspace', 'quantile', 'kmeans', 'jenks',
+                       'tolerance'):
+            levels, indices, report = bin_thicknesses(t, method=method,
+                                                      tol=0.01)
+            self.assertTrue(report['max_error'] <= 0.01)
+            self.assertEqual(report['counts'].sum(), t.shape[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
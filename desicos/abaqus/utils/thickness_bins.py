@@ -0,0 +1,322 @@
+r"""
+==========================================================
+Thickness Bins (:mod:`desicos.abaqus.utils.thickness_bins`)
+==========================================================
+
+.. currentmodule:: desicos.abaqus.utils.thickness_bins
+
+Groups the interpolated element thicknesses of a thickness imperfection
+into a few thickness levels, each level becoming one composite layup in the
+finite element model.
+
+The available methods are:
+
+==============  ============================================================
+Method          Description
+==============  ============================================================
+``'unique'``    One level for each distinct thickness
+``'linspace'``  Equally spaced levels between the minimum and maximum
+                thicknesses
+``'quantile'``  Bins with the same number of elements, each level placed in
+                the middle of its bin
+``'kmeans'``    Levels minimizing the squared thickness error, using Lloyd's
+                algorithm starting from the quantile bins
+``'jenks'``     The optimal levels minimizing the squared thickness error
+                (Jenks natural breaks), using dynamic programming
+``'tolerance'`` The fewest levels keeping the thickness error of every
+                element below ``tol``
+==============  ============================================================
+
+When a tolerance ``tol`` is given to the other methods, except
+``'unique'``, the smallest number of levels that keeps the maximum
+thickness error below ``tol`` is searched for.
+
+"""
+import numpy as np
+
+from desicos.logger import warn
+from desicos.constants import FLOAT
+
+
+METHODS = ('unique', 'linspace', 'quantile', 'kmeans', 'jenks', 'tolerance')
+MAX_JENKS_POINTS = 1000
+
+
+def assign_levels(levels, t):
+    """Assigns each thickness to the closest level
+
+    Parameters
+    ----------
+    levels : array-like
+        The sorted thickness levels.
+    t : array-like
+        The thicknesses.
+
+    Returns
+    -------
+    indices : np.ndarray
+        The index of the closest level for each thickness. In case of a tie
+        the lower level is chosen, giving the same result as
+        ``np.abs(levels - ti).argmin()`` for each thickness ``ti``.
+
+    """
+    levels = np.asarray(levels, dtype=FLOAT)
+    t = np.asarray(t, dtype=FLOAT)
+    if levels.shape[0] < 2:
+        return np.zeros(t.shape, dtype=int)
+    mids = 0.5*(levels[1:] + levels[:-1])
+    indices = np.searchsorted(mids, t)
+    # the rounding of the middle points may shift the ties by one level
+    err = np.abs(t - levels[indices])
+    lower = np.maximum(indices - 1, 0)
+    upper = np.minimum(indices + 1, levels.shape[0] - 1)
+    use_upper = np.abs(t - levels[upper]) < err
+    indices = np.where(use_upper, upper, indices)
+    err = np.abs(t - levels[indices])
+    use_lower = np.abs(t - levels[lower]) <= err
+    indices = np.where(use_lower, lower, indices)
+    # the first of repeated levels
+    return np.searchsorted(levels, levels[indices])
+
+
+def group_by_level(elem_ids, indices, num_levels):
+    """Groups the element ids by their thickness level
+
+    Parameters
+    ----------
+    elem_ids : array-like
+        The element ids.
+    indices : array-like
+        The level index of each element, see :func:`.assign_levels`.
+    num_levels : int
+        The number of levels.
+
+    Returns
+    -------
+    sets_ids : list
+        A list with the element ids of each level, keeping the order given
+        in ``elem_ids``. Levels without elements give empty lists.
+
+    """
+    indices = np.asarray(indices, dtype=int)
+    elem_ids = np.asarray(elem_ids).astype(int)
+    order = np.argsort(indices, kind='mergesort')
+    splits = np.cumsum(np.bincount(indices, minlength=num_levels))
+    sets_ids = np.split(elem_ids[order], splits[:-1])
+    return [set_ids.tolist() for set_ids in sets_ids]
+
+
+def _errors(levels, t):
+    indices = assign_levels(levels, t)
+    err = np.abs(t - levels[indices]) if t.shape[0] else np.zeros(0)
+    return indices, err
+
+
+def _quantile_levels(ts, k):
+    n = ts.shape[0]
+    splits = np.unique(np.round(np.linspace(0, n, k+1)).astype(int))
+    starts, ends = splits[:-1], splits[1:]
+    # the middle of each bin minimizes the maximum error
+    return np.unique(0.5*(ts[starts] + ts[ends-1]))
+
+
+def _kmeans_levels(ts, k, max_iter=100):
+    cums = np.concatenate(([0.], np.cumsum(ts)))
+    levels = _quantile_levels(ts, k)
+    for i in range(max_iter):
+        splits = np.searchsorted(ts, 0.5*(levels[1:] + levels[:-1]))
+        splits = np.concatenate(([0], splits, [ts.shape[0]]))
+        starts, ends = splits[:-1], splits[1:]
+        valid = ends > starts
+        starts, ends = starts[valid], ends[valid]
+        new = (cums[ends] - cums[starts])/(ends - starts)
+        if new.shape == levels.shape and np.allclose(new, levels, rtol=0.,
+                atol=1e-12*max(1., abs(ts[-1]))):
+            return new
+        levels = new
+    return levels
+
+
+def _jenks_tables(ts):
+    # the sorted thicknesses are grouped into at most MAX_JENKS_POINTS
+    # weighted points, keeping the problem size independent of the mesh
+    x, inv = np.unique(ts, return_inverse=True)
+    w = np.bincount(inv).astype(FLOAT)
+    if x.shape[0] > MAX_JENKS_POINTS:
+        edges = np.linspace(x[0], x[-1], MAX_JENKS_POINTS+1)
+        ind = np.clip(np.searchsorted(edges, x, side='right') - 1, 0,
+                      MAX_JENKS_POINTS-1)
+        wsum = np.bincount(ind, weights=w, minlength=MAX_JENKS_POINTS)
+        xsum = np.bincount(ind, weights=w*x, minlength=MAX_JENKS_POINTS)
+        keep = wsum > 0
+        x = xsum[keep]/wsum[keep]
+        w = wsum[keep]
+    m = x.shape[0]
+    cw = np.concatenate(([0.], np.cumsum(w)))
+    cx = np.concatenate(([0.], np.cumsum(w*x)))
+    cxx = np.concatenate(([0.], np.cumsum(w*x*x)))
+    # cost[i, j] is the squared error of the points i, ..., j-1
+    i = np.arange(m+1)[:, None]
+    j = np.arange(m+1)[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sw = cw[j] - cw[i]
+        sx = cx[j] - cx[i]
+        cost = (cxx[j] - cxx[i]) - sx*sx/sw
+    cost[j <= i] = np.inf
+    cost = np.maximum(cost, 0.)
+    return x, w, cw, cx, cost
+
+
+def _iter_jenks_levels(ts, max_k):
+    """Yields the optimal levels for ``1, 2, ..., max_k`` bins"""
+    x, w, cw, cx, cost = _jenks_tables(ts)
+    m = x.shape[0]
+    best = cost[0, :]
+    back = []
+    for k in range(1, min(max_k, m) + 1):
+        if k > 1:
+            tmp = best[:, None] + cost
+            back.append(tmp.argmin(axis=0))
+            best = tmp.min(axis=0)
+        splits = [m]
+        for b in reversed(back):
+            splits.append(b[splits[-1]])
+        splits = np.array([0] + splits[::-1])
+        starts, ends = splits[:-1], splits[1:]
+        yield (cx[ends] - cx[starts])/(cw[ends] - cw[starts])
+
+
+def _tolerance_levels(ts, tol):
+    levels = []
+    start = 0
+    n = ts.shape[0]
+    while start < n:
+        end = np.searchsorted(ts, ts[start] + 2*tol, side='right')
+        levels.append(0.5*(ts[start] + ts[end-1]))
+        start = end
+    return np.array(levels, dtype=FLOAT)
+
+
+def _levels(ts, method, k):
+    if method == 'linspace':
+        return np.linspace(ts[0], ts[-1], k)
+    elif method == 'quantile':
+        return _quantile_levels(ts, k)
+    elif method == 'kmeans':
+        return _kmeans_levels(ts, k)
+    raise ValueError('Invalid method: {0}'.format(method))
+
+
+def bin_thicknesses(t, number_of_sets=None, method='linspace', tol=None,
+                    max_sets=100, ignore_zero=True):
+    r"""Groups thicknesses into thickness levels
+
+    Parameters
+    ----------
+    t : array-like
+        The thickness of each element.
+    number_of_sets : int or None, optional
+        The number of levels. Not used by the ``'unique'`` and
+        ``'tolerance'`` methods nor when ``tol`` is given. The default is
+        ``10``.
+    method : str, optional
+        One of the methods described in :mod:`.thickness_bins`.
+    tol : float or None, optional
+        The maximum thickness error allowed for each element.
+    max_sets : int, optional
+        The maximum number of levels searched for when ``tol`` is given.
+    ignore_zero : bool, optional
+        If null thicknesses, which are returned by the interpolation where
+        no measured data is found, should be ignored when defining the
+        levels. These elements are still assigned to the closest level.
+
+    Returns
+    -------
+    levels : np.ndarray
+        The sorted thickness levels.
+    indices : np.ndarray
+        The index of the level assigned to each element.
+    report : dict
+        A dictionary with the ``method``, the ``number_of_sets``, the
+        ``max_error`` and the ``rms_error`` of the thicknesses and the
+        ``counts`` of elements in each level.
+
+    """
+    t = np.asarray(t, dtype=FLOAT).ravel()
+    if not method in METHODS:
+        raise ValueError('Invalid method: {0}, use one of {1}'.format(
+                         method, ', '.join(METHODS)))
+    ts = np.sort(t[t != 0.] if ignore_zero else t)
+    if ts.shape[0] == 0:
+        ts = np.sort(t)
+    if ts.shape[0] == 0:
+        levels = np.zeros(0, dtype=FLOAT)
+        return levels, np.zeros(0, dtype=int), dict(method=method,
+                number_of_sets=0, max_error=0., rms_error=0.,
+                counts=np.zeros(0, dtype=int))
+    if number_of_sets in (None, 0):
+        number_of_sets = 10
+
+    if method == 'unique':
+        levels = np.unique(ts)
+    elif method == 'tolerance':
+        if tol is None:
+            raise ValueError('The tolerance method requires tol')
+        levels = _tolerance_levels(ts, tol)
+    elif tol is None:
+        if method == 'jenks':
+            for levels in _iter_jenks_levels(ts, number_of_sets):
+                pass
+        else:
+            levels = _levels(ts, method, number_of_sets)
+    else:
+        if method == 'jenks':
+            candidates = _iter_jenks_levels(ts, max_sets)
+        else:
+            candidates = (_levels(ts, method, k)
+                          for k in range(1, max_sets+1))
+        for levels in candidates:
+            if _errors(levels, ts)[1].max() <= tol:
+                break
+        else:
+            warn('Thickness tolerance {0} not reached with {1} sets'.format(
+                 tol, levels.shape[0]), level=1)
+
+    levels = np.asarray(levels, dtype=FLOAT)
+    indices, report = level_report(levels, t, ignore_zero=ignore_zero)
+    report['method'] = method
+    return levels, indices, report
+
+
+def level_report(levels, t, ignore_zero=True):
+    """Assigns thicknesses to given levels and reports the errors
+
+    Parameters
+    ----------
+    levels : array-like
+        The sorted thickness levels.
+    t : array-like
+        The thickness of each element.
+    ignore_zero : bool, optional
+        If null thicknesses should be ignored in the errors.
+
+    Returns
+    -------
+    indices : np.ndarray
+        The index of the level assigned to each element, see
+        :func:`.assign_levels`.
+    report : dict
+        See :func:`.bin_thicknesses`, without the ``method``.
+
+    """
+    levels = np.asarray(levels, dtype=FLOAT)
+    t = np.asarray(t, dtype=FLOAT).ravel()
+    indices, err = _errors(levels, t)
+    if ignore_zero:
+        err = err[t != 0.]
+    report = dict(number_of_sets=levels.shape[0],
+                  max_error=float(err.max()) if err.shape[0] else 0.,
+                  rms_error=(float(np.sqrt((err**2).mean()))
+                             if err.shape[0] else 0.),
+                  counts=np.bincount(indices, minlength=levels.shape[0]))
+    return indices, report
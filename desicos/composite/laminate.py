@@ -115,6 +115,139 @@ def read_lamination_parameters(thickness, laminaprop,
     lam.calc_ABDE_from_lamination_parameters()
     return lam
 
+def _stack_arrays(stacks, plyts):
+    # Broadcast the angles and thicknesses to (n_laminates, n_plies) and
+    # calculate the z coordinates of the bottom and top of each ply
+    stacks = np.asarray(stacks, dtype=FLOAT)
+    if stacks.ndim == 1:
+        stacks = stacks[None, :]
+    plyts = np.zeros_like(stacks) + np.asarray(plyts, dtype=FLOAT)
+    hk = np.cumsum(plyts, axis=1)
+    t = hk[:, -1].copy()
+    hk -= t[:, None]/2
+    hk_1 = hk - plyts
+    return np.deg2rad(stacks), plyts, t, hk_1, hk
+
+def _material_arrays(laminaprops, mat_ids, shape):
+    # Plane-stress constants of each material, as in Lamina.rebuild(),
+    # gathered for each ply
+    if not isinstance(laminaprops[0], (list, tuple, np.ndarray)):
+        laminaprops = [laminaprops]
+    q = np.zeros((6, len(laminaprops)), dtype=FLOAT)
+    for i, laminaprop in enumerate(laminaprops):
+        m = read_laminaprop(laminaprop)
+        den = 1 - m.nu12*m.nu21
+        q[:, i] = (m.e1/den, m.nu12*m.e2/den, m.e2/den, m.g23, m.g13,
+                   m.g12)
+    if mat_ids is None:
+        mat_ids = 0
+    mat_ids = np.zeros(shape, dtype=int) + np.asarray(mat_ids, dtype=int)
+    return q[:, mat_ids]
+
+def calc_ABDE_stacks(stacks, plyts, laminaprops, mat_ids=None):
+    """Calculates the ``ABDE`` matrices of many laminates at once.
+
+    The same results as :meth:`.Laminate.calc_constitutive_matrix` are
+    obtained, without creating one :class:`.Lamina` object for each ply.
+
+    Parameters
+    ----------
+    stacks : array-like
+        The ply angles in degrees, with ``shape=(n_laminates, n_plies)``.
+        Laminates with fewer plies can be padded with plies of null
+        thickness.
+    plyts : float or array-like
+        The ply thicknesses, broadcast to the shape of ``stacks``.
+    laminaprops : tuple or list
+        One ``laminaprop`` tuple used by all the plies, or a list of
+        ``laminaprop`` tuples indexed by ``mat_ids``.
+    mat_ids : array-like, optional
+        The index in ``laminaprops`` of the material of each ply, broadcast
+        to the shape of ``stacks``. The first material is used by default.
+
+    Returns
+    -------
+    ABDE : np.ndarray
+        The ``ABDE`` matrices with ``shape=(n_laminates, 8, 8)``. The
+        ``ABD`` matrices are ``ABDE[:, :6, :6]``.
+
+    """
+    thetarad, plyts, t, hk_1, hk = _stack_arrays(stacks, plyts)
+    q11, q12, q22, q44, q55, q66 = _material_arrays(laminaprops, mat_ids,
+                                                    thetarad.shape)
+    cost = np.cos(thetarad)
+    sint = np.sin(thetarad)
+    cos2 = cost**2
+    sin2 = sint**2
+    cos4 = cos2**2
+    sin4 = sin2**2
+    sincos = sint*cost
+    sin2cos2 = sin2*cos2
+
+    QL = np.zeros((9,) + thetarad.shape, dtype=FLOAT)
+    QL[0] = q11*cos4 + 2*(q12 + 2*q66)*sin2cos2 + q22*sin4
+    QL[1] = (q11 + q22 - 4*q66)*sin2cos2 + q12*(sin4 + cos4)
+    QL[2] = q11*sin4 + 2*(q12 + 2*q66)*sin2cos2 + q22*cos4
+    QL[3] = ((q11 - q12 - 2*q66)*cos2 + (q12 - q22 + 2*q66)*sin2)*sincos
+    QL[4] = ((q11 - q12 - 2*q66)*sin2 + (q12 - q22 + 2*q66)*cos2)*sincos
+    QL[5] = (q11 + q22 - 2*q12 - 2*q66)*sin2cos2 + q66*(sin4 + cos4)
+    QL[6] = q44*cos2 + q55*sin2
+    QL[7] = (q55 - q44)*sincos
+    QL[8] = q55*cos2 + q44*sin2
+
+    # terms 11, 12, 22, 16, 26, 66, 44, 45, 55 summed over the plies
+    A = np.einsum('kij,ij->ki', QL, hk - hk_1)
+    B = np.einsum('kij,ij->ki', QL[:6], (hk**2 - hk_1**2)/2.)
+    D = np.einsum('kij,ij->ki', QL[:6], (hk**3 - hk_1**3)/3.)
+
+    ABDE = np.zeros((thetarad.shape[0], 8, 8), dtype=FLOAT)
+    ij = ((0, 0), (0, 1), (1, 1), (0, 2), (1, 2), (2, 2))
+    for k, (i, j) in enumerate(ij):
+        for row, col in set([(i, j), (j, i)]):
+            ABDE[:, row, col] = A[k]
+            ABDE[:, row, col+3] = B[k]
+            ABDE[:, row+3, col] = B[k]
+            ABDE[:, row+3, col+3] = D[k]
+    ABDE[:, 6, 6] = A[6]
+    ABDE[:, 6, 7] = A[7]
+    ABDE[:, 7, 6] = A[7]
+    ABDE[:, 7, 7] = A[8]
+    return ABDE
+
+def calc_lamination_parameters_stacks(stacks, plyts):
+    r"""Calculates the lamination parameters of many laminates at once.
+
+    Parameters
+    ----------
+    stacks : array-like
+        The ply angles in degrees, with ``shape=(n_laminates, n_plies)``.
+    plyts : float or array-like
+        The ply thicknesses, broadcast to the shape of ``stacks``.
+
+    Returns
+    -------
+    t, xiA, xiB, xiD, xiE : np.ndarray
+        The laminate thicknesses, with ``shape=(n_laminates,)``, and the
+        lamination parameters, each one with ``shape=(n_laminates, 5)``
+        and the same format as the attributes of :class:`.Laminate`, i.e.
+        ``xiA[:, 1:]`` are `\xi_{A1} \cdots \xi_{A4}`.
+
+    """
+    thetarad, plyts, t, hk_1, hk = _stack_arrays(stacks, plyts)
+    trig = np.array([np.cos(2*thetarad), np.sin(2*thetarad),
+                     np.cos(4*thetarad), np.sin(4*thetarad)])
+    Afac = plyts / t[:, None]
+    Bfac = (2. / t[:, None]**2) * (hk**2 - hk_1**2)
+    Dfac = (4. / t[:, None]**3) * (hk**3 - hk_1**3)
+    xis = []
+    for first, fac in ((1., Afac), (0., Bfac), (1., Dfac), (1., Afac)):
+        xi = np.empty((thetarad.shape[0], 5), dtype=FLOAT)
+        xi[:, 0] = first
+        xi[:, 1:] = np.einsum('kij,ij->ik', trig, fac)
+        xis.append(xi)
+    xiA, xiB, xiD, xiE = xis
+    return t, xiA, xiB, xiD, xiE
+
 class Laminate(object):
     """
     =========  ===========================================================
@@ -189,56 +322,15 @@ class Laminate(object):
             xiA, xiB, xiD, xiE
 
         """
-        xiA1, xiA2, xiA3, xiA4 = 0, 0, 0, 0
-        xiB1, xiB2, xiB3, xiB4 = 0, 0, 0, 0
-        xiD1, xiD2, xiD3, xiD4 = 0, 0, 0, 0
-        xiE1, xiE2, xiE3, xiE4 = 0, 0, 0, 0
-
-        lam_thick = 0
-
-        for ply in self.plies:
-            lam_thick += ply.t
-        self.t = lam_thick
-        h0   = -lam_thick/2
-        for ply in self.plies:
-            hk_1 =  h0
-            h0   += ply.t
-            hk   =  h0
-
-            Afac  = ply.t / lam_thick
-            Bfac  = (2. / lam_thick**2) * (hk**2 - hk_1**2)
-            Dfac  = (4. / lam_thick**3) * (hk**3 - hk_1**3)
-            Efac  = (1. / lam_thick   ) * (hk    - hk_1   )# * (5./6) * (5./6)
-
-            cos2t = ply.cos2t
-            cos4t = ply.cos4t
-            sin2t = ply.sin2t
-            sin4t = ply.sin4t
-
-            xiA1  += Afac * cos2t
-            xiA2  += Afac * sin2t
-            xiA3  += Afac * cos4t
-            xiA4  += Afac * sin4t
-
-            xiB1  += Bfac * cos2t
-            xiB2  += Bfac * sin2t
-            xiB3  += Bfac * cos4t
-            xiB4  += Bfac * sin4t
-
-            xiD1  += Dfac * cos2t
-            xiD2  += Dfac * sin2t
-            xiD3  += Dfac * cos4t
-            xiD4  += Dfac * sin4t
-
-            xiE1  += Efac * cos2t
-            xiE2  += Efac * sin2t
-            xiE3  += Efac * cos4t
-            xiE4  += Efac * sin4t
-
-        self.xiA = np.array([1, xiA1, xiA2, xiA3, xiA4], dtype=FLOAT)
-        self.xiB = np.array([0, xiB1, xiB2, xiB3, xiB4], dtype=FLOAT)
-        self.xiD = np.array([1, xiD1, xiD2, xiD3, xiD4], dtype=FLOAT)
-        self.xiE = np.array([1, xiE1, xiE2, xiE3, xiE4], dtype=FLOAT)
+        stack = [ply.theta for ply in self.plies]
+        plyts = [ply.t for ply in self.plies]
+        t, xiA, xiB, xiD, xiE = calc_lamination_parameters_stacks(stack,
+                                                                  plyts)
+        self.t = t[0]
+        self.xiA = xiA[0]
+        self.xiB = xiB[0]
+        self.xiD = xiD[0]
+        self.xiE = xiE[0]
 
     def calc_ABDE_from_lamination_parameters(self):
         """Use the ABDE matrix based on lamination parameters.
@@ -32,9 +32,18 @@ an imperfection file had been made available.
 .. automodule:: desicos.conecylDB.interpolate
     :members:
 
+.. automodule:: desicos.conecylDB.interp_cache
+    :members:
+
 .. automodule:: desicos.conecylDB.read_write
     :members:
 
+.. automodule:: desicos.conecylDB.binary_store
+    :members:
+
+.. automodule:: desicos.conecylDB.batch_convert
+    :members:
+
 """
 from __future__ import absolute_import
 from .conecylDB import *
@@ -0,0 +1,305 @@
+r"""
+Batch Conversion (:mod:`desicos.conecylDB.batch_convert`)
+=========================================================
+
+.. currentmodule:: desicos.conecylDB.batch_convert
+
+This module converts the measured imperfection files of the ``ccs`` entries
+to the "`\theta` `z` `imp`" and "`\theta` `z` `thick`" formats, using
+:func:`.xyz2thetazimp` and :func:`.xyzthick2thetazthick` on many worker
+processes.
+
+The converted files are saved next to the measured ones, named as expected
+by :func:`.update_imps`, e.g. ``degenhardt_2010_z25_msi_theta_z_imp.txt``.
+For each converted file the SHA-1 checksums of the input and output files,
+``R_best_fit``, the transformation matrices ``T`` and ``Tinv`` and the
+time spent are recorded in ``batch_convert.json`` inside the local
+data-base (``localDB_path``). When the pipeline is run again only the files
+whose checksums or conversion parameters changed are converted.
+
+From the command line::
+
+    python -m desicos.conecylDB.batch_convert --processes 4
+    python -m desicos.conecylDB.batch_convert degenhardt_2010_z25 --force
+
+"""
+from __future__ import absolute_import
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from desicos.logger import *
+from .conecylDB import DBHOME, localDB_path, fetch, prefer_binary
+from .binary_store import checksum
+
+
+records_path = os.path.join(localDB_path, 'batch_convert.json')
+
+SUFFIXES = {'msi': ('_msi.txt', '_msi_theta_z_imp.txt'),
+            'ti': ('_ti.txt', '_ti_theta_z_thick.txt')}
+
+
+def find_jobs(names=None, sample_size=None, fmt='%1.8f'):
+    """Finds the measured imperfection files of the ``ccs`` entries
+
+    Parameters
+    ----------
+    names : list or None, optional
+        The ``ccs`` keys or imperfection names to be considered. All the
+        entries are considered if ``None``.
+    sample_size : int, optional
+        Passed to the best fit routines.
+    fmt : str, optional
+        The format used to save the converted files.
+
+    Returns
+    -------
+    jobs : list
+        A list of dictionaries with the paths and parameters for each
+        conversion.
+
+    """
+    jobs = []
+    for key, cc in sorted(fetch('ccs').items()):
+        for kind in ('msi', 'ti'):
+            if not kind in cc.keys():
+                continue
+            imp = cc[kind]
+            if names and not (key in names or imp in names):
+                continue
+            suffix_in, suffix_out = SUFFIXES[kind]
+            folder = os.path.join(DBHOME, 'files', cc['database'], imp)
+            path = prefer_binary(os.path.join(folder, imp + suffix_in))
+            if not os.path.isfile(path):
+                continue
+            params = dict(alphadeg_measured=cc.get('alphadeg', 0.),
+                          H_measured=cc['H'],
+                          R_expected=cc['rbot'],
+                          sample_size=sample_size,
+                          fmt=fmt)
+            jobs.append(dict(name=imp + '_' + kind,
+                             kind=kind,
+                             path=path,
+                             outpath=os.path.join(folder, imp + suffix_out),
+                             params=params))
+    return jobs
+
+
+def load_records(path=None):
+    """Loads the conversion records from the local data-base
+
+    Parameters
+    ----------
+    path : str, optional
+        The path to the records file, ``records_path`` by default.
+
+    Returns
+    -------
+    records : dict
+        The records of each converted file, by job name.
+
+    """
+    if path is None:
+        path = records_path
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        warn('Invalid records file {0} ignored'.format(path))
+        return {}
+
+
+def save_records(records, path=None):
+    """Saves the conversion records into the local data-base
+
+    Parameters
+    ----------
+    records : dict
+        The records of each converted file, by job name.
+    path : str, optional
+        The path to the records file, ``records_path`` by default.
+
+    """
+    if path is None:
+        path = records_path
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(records, f, indent=4, sort_keys=True)
+    if os.path.isfile(path):
+        os.remove(path)
+    os.rename(tmp_path, path)
+
+
+def is_up_to_date(job, records):
+    """Checks if the output of a conversion job is up to date
+
+    Parameters
+    ----------
+    job : dict
+        A job as returned by :func:`.find_jobs`.
+    records : dict
+        The records loaded with :func:`.load_records`.
+
+    Returns
+    -------
+    up_to_date : bool
+        ``True`` if the input file and the parameters did not change since
+        the last conversion, and the output file is unchanged.
+
+    """
+    record = records.get(job['name'])
+    if record is None or not os.path.isfile(job['outpath']):
+        return False
+    if record.get('params') != job['params']:
+        return False
+    if record.get('sha1_input') != checksum(job['path']):
+        return False
+    return record.get('sha1_output') == checksum(job['outpath'])
+
+
+def convert(job):
+    """Runs one conversion job
+
+    This function is executed by the worker processes.
+
+    Parameters
+    ----------
+    job : dict
+        A job as returned by :func:`.find_jobs`.
+
+    Returns
+    -------
+    name, record : str, dict
+        The job name and the record to be saved, with the key ``'error'``
+        when the conversion failed.
+
+    """
+    from .read_write import xyz2thetazimp, xyzthick2thetazthick
+
+    t0 = time.time()
+    params = dict(job['params'])
+    fmt = params.pop('fmt')
+    try:
+        if job['kind'] == 'msi':
+            mps, out = xyz2thetazimp(job['path'], save=False,
+                                     best_fit_output=True, **params)
+        else:
+            mps, out = xyzthick2thetazthick(job['path'], save=False,
+                                            best_fit_output=True, **params)
+        np.savetxt(job['outpath'], mps, fmt=fmt)
+    except Exception as e:
+        return job['name'], dict(error='{0}: {1}'.format(
+                                 e.__class__.__name__, e))
+    record = dict(params=job['params'],
+                  path=job['path'],
+                  outpath=job['outpath'],
+                  sha1_input=checksum(job['path']),
+                  sha1_output=checksum(job['outpath']),
+                  R_best_fit=float(out['R_best_fit']),
+                  T=np.asarray(out['T']).tolist(),
+                  Tinv=np.asarray(out['Tinv']).tolist(),
+                  time=time.time() - t0)
+    return job['name'], record
+
+
+def run(names=None, processes=None, force=False, sample_size=None,
+        fmt='%1.8f'):
+    """Converts the measured imperfection files that are not up to date
+
+    Parameters
+    ----------
+    names : list or None, optional
+        See :func:`.find_jobs`.
+    processes : int or None, optional
+        The number of worker processes. All the CPUs are used if ``None``
+        and the conversions are performed in this process if ``1``.
+    force : bool, optional
+        Converts all the files, even if they are up to date.
+    sample_size : int, optional
+        Passed to the best fit routines.
+    fmt : str, optional
+        The format used to save the converted files.
+
+    Returns
+    -------
+    records : dict
+        The records of all the converted files. The records are saved
+        after each conversion, such that an interrupted run can be resumed.
+        A failure to save the records is reported without stopping the
+        conversions.
+
+    """
+    records = load_records()
+    jobs = find_jobs(names, sample_size=sample_size, fmt=fmt)
+    if not force:
+        todo = [job for job in jobs if not is_up_to_date(job, records)]
+    else:
+        todo = jobs
+    log('{0} files found, {1} to be converted'.format(len(jobs), len(todo)))
+    if not todo:
+        return records
+
+    if processes == 1:
+        results = (convert(job) for job in todo)
+    else:
+        pool = Pool(processes)
+        results = pool.imap_unordered(convert, todo)
+    saved = True
+    try:
+        for name, record in results:
+            if 'error' in record:
+                error('{0} failed, {1}'.format(name, record['error']),
+                      level=1)
+                continue
+            log('{0} converted in {1:1.2f} s, R_best_fit = {2}'.format(
+                name, record['time'], record['R_best_fit']), level=1)
+            records[name] = record
+            saved = _try_save_records(records)
+    finally:
+        if processes != 1:
+            pool.terminate()
+            pool.join()
+    if not saved and not _try_save_records(records):
+        warn('The records could not be saved, the files converted in this '
+             'run will be converted again in the next run')
+    return records
+
+
+def _try_save_records(records):
+    # a failing save must not abort the conversions already performed
+    try:
+        save_records(records)
+    except (IOError, OSError) as e:
+        warn('Records not saved in {0}: {1}'.format(records_path, e),
+             level=1)
+        return False
+    return True
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Converts the measured '
+            'imperfection files of the conecylDB to the theta-z format')
+    parser.add_argument('names', nargs='*',
+            help='ccs keys or imperfection names, all if not given')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+            help='number of worker processes, all CPUs by default')
+    parser.add_argument('-f', '--force', action='store_true',
+            help='convert also the files that are up to date')
+    parser.add_argument('-s', '--sample-size', type=int, default=None,
+            help='number of points used in the best fit')
+    parser.add_argument('--fmt', default='%1.8f',
+            help='format of the converted files')
+    args = parser.parse_args(argv)
+    run(args.names or None, processes=args.processes, force=args.force,
+        sample_size=args.sample_size, fmt=args.fmt)
+
+
+if __name__ == '__main__':
+    main()
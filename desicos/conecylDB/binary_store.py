@@ -0,0 +1,178 @@
+r"""
+Binary Store (:mod:`desicos.conecylDB.binary_store`)
+====================================================
+
+.. currentmodule:: desicos.conecylDB.binary_store
+
+This module keeps a binary copy of the measured data files, which are
+otherwise parsed from text every time they are used.
+
+The first time a text file such as ``degenhardt_2010_z25_msi.txt`` is
+loaded a sidecar ``degenhardt_2010_z25_msi.npy`` is written in the same
+directory, together with ``degenhardt_2010_z25_msi.npy.json`` containing
+the size, modification time and SHA-1 checksum of the text file. The
+following loads memory-map the ``.npy`` file. When the text file changes
+the sidecar is automatically rebuilt.
+
+"""
+from __future__ import absolute_import
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from desicos.logger import *
+from desicos.constants import FLOAT
+
+
+def sidecar_path(path):
+    """Returns the path of the binary sidecar of a text file
+
+    Parameters
+    ----------
+    path : str
+        The path to the text file.
+
+    Returns
+    -------
+    npy_path : str
+        The path to the ``.npy`` file.
+
+    """
+    return os.path.splitext(path)[0] + '.npy'
+
+
+def checksum(path):
+    """Returns the SHA-1 checksum of a file
+
+    Parameters
+    ----------
+    path : str
+        The path to the file.
+
+    Returns
+    -------
+    sha1 : str
+        The hexadecimal digest.
+
+    """
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024*1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_meta(npy_path):
+    try:
+        with open(npy_path + '.json') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def is_fresh(path):
+    """Checks if the binary sidecar of a text file is up to date
+
+    The size and modification time of the text file are compared first,
+    and the SHA-1 checksum only if they differ, such that copied or touched
+    files do not force a rebuild.
+
+    Parameters
+    ----------
+    path : str
+        The path to the text file.
+
+    Returns
+    -------
+    fresh : bool
+        ``True`` if the sidecar exists and corresponds to the text file.
+
+    """
+    npy_path = sidecar_path(path)
+    if not os.path.isfile(npy_path):
+        return False
+    meta = _read_meta(npy_path)
+    if meta is None or meta.get('source') != os.path.basename(path):
+        return False
+    st = os.stat(path)
+    if st.st_size != meta.get('size'):
+        return False
+    if st.st_mtime == meta.get('mtime'):
+        return True
+    if checksum(path) != meta.get('sha1'):
+        return False
+    meta['mtime'] = st.st_mtime
+    try:
+        with open(npy_path + '.json', 'w') as f:
+            json.dump(meta, f)
+    except (IOError, OSError):
+        pass
+    return True
+
+
+def build(path, dtype=FLOAT):
+    """Creates the binary sidecar of a text file
+
+    Parameters
+    ----------
+    path : str
+        The path to the text file.
+    dtype : str, optional
+        The data type of the stored array.
+
+    Returns
+    -------
+    data : np.ndarray
+        The array read from the text file.
+
+    """
+    log('Creating binary copy of: {0} ...'.format(path))
+    st = os.stat(path)
+    data = np.loadtxt(path, dtype=dtype, ndmin=2)
+    npy_path = sidecar_path(path)
+    meta = dict(source=os.path.basename(path),
+                size=st.st_size,
+                mtime=st.st_mtime,
+                sha1=checksum(path),
+                shape=list(data.shape),
+                dtype=str(data.dtype))
+    try:
+        np.save(npy_path, data)
+        with open(npy_path + '.json', 'w') as f:
+            json.dump(meta, f)
+    except (IOError, OSError):
+        warn('Binary copy could not be saved in {0}'.format(npy_path),
+             level=1)
+    return data
+
+
+def load(path, dtype=FLOAT, mmap_mode='c'):
+    """Loads a measured data file, preferring its binary sidecar
+
+    Parameters
+    ----------
+    path : str
+        The path to the text file, or directly to a ``.npy`` file.
+    dtype : str, optional
+        The data type of the returned array.
+    mmap_mode : str or None, optional
+        See ``np.load()``. The default ``'c'`` (copy-on-write) memory-maps
+        the file while allowing in-place changes that are not written back.
+
+    Returns
+    -------
+    data : np.ndarray
+        A 2-D array with one column for each column of the text file.
+
+    """
+    if path.endswith('.npy'):
+        data = np.load(path, mmap_mode=mmap_mode)
+    elif is_fresh(path):
+        data = np.load(sidecar_path(path), mmap_mode=mmap_mode)
+    else:
+        data = build(path, dtype=dtype)
+    if data.dtype != np.dtype(dtype):
+        data = data.astype(dtype)
+    return data
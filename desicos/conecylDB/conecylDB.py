@@ -13,6 +13,7 @@ from desicos.logger import *
 from .ccs import ccs as default_ccs
 from .allowables import allowables as default_allowables
 from .laminaprops import laminaprops as default_laminaprops
+from . import binary_store
 from desicos.constants import DESHOME
 
 
@@ -88,6 +89,30 @@ def fetch(which, local_only=False):
         raise ValueError('{0} is an invalid option to fetch'.format(which))
 
 
+def prefer_binary(path):
+    """Returns the path to a measured data file or to its binary copy
+
+    The text file is kept when present, since reading it through
+    :func:`.binary_store.load` already uses an up to date binary copy. The
+    ``.npy`` file is returned when only the binary copy is distributed.
+
+    Parameters
+    ----------
+    path : str
+        The path to the text file.
+
+    Returns
+    -------
+    path : str
+        The path to the text file or to the ``.npy`` file.
+
+    """
+    npy_path = binary_store.sidecar_path(path)
+    if not os.path.isfile(path) and os.path.isfile(npy_path):
+        return npy_path
+    return path
+
+
 def update_imps():
     """Returns the updated imperfection definitions from the data-base
 
@@ -100,7 +125,9 @@ def update_imps():
 
         - ``imps``: contains the full path of an imperfection file
           corresponding to ``key``, accessed doing ``imp[key]['msi']`` or
-          ``imp[key]['ti']``
+          ``imp[key]['ti']``. When only the binary copy of a file is
+          available (cf. :mod:`.binary_store`) the path to the ``.npy`` file
+          is given
         - ``imps_theta_z``: similar to ``imps``
         - ``t_measured``: contains the measured shell thickness for a
           correponding entry access doing ``t_measured[key]``
@@ -120,14 +147,15 @@ def update_imps():
             db = cc['database']
             imp = cc['msi']
 
-            path = os.path.join(DBHOME, 'files', db, imp, imp + '_msi.txt')
+            path = prefer_binary(os.path.join(DBHOME, 'files', db, imp,
+                                               imp + '_msi.txt'))
             if os.path.isfile(path):
                 if not imp in imps.keys():
                     imps[imp] = {}
                 imps[imp]['msi'] = path
 
-            path_theta_z = os.path.join(DBHOME, 'files', db, imp,
-                                        imp + '_msi_theta_z_imp.txt')
+            path_theta_z = prefer_binary(os.path.join(DBHOME, 'files', db,
+                                  imp, imp + '_msi_theta_z_imp.txt'))
             if os.path.isfile(path_theta_z):
                 if not imp in imps_theta_z.keys():
                     imps_theta_z[imp] = {}
@@ -137,14 +165,15 @@ def update_imps():
             db = cc['database']
             imp = cc['ti']
 
-            path = os.path.join(DBHOME, 'files', db, imp, imp + '_ti.txt')
+            path = prefer_binary(os.path.join(DBHOME, 'files', db, imp,
+                                               imp + '_ti.txt'))
             if os.path.isfile(path):
                 if not imp in imps.keys():
                     imps[imp] = {}
                 imps[imp]['ti'] = path
 
-            path_theta_z = os.path.join(DBHOME, 'files', db, imp,
-                                        imp + '_ti_theta_z_thick.txt')
+            path_theta_z = prefer_binary(os.path.join(DBHOME, 'files', db,
+                                  imp, imp + '_ti_theta_z_thick.txt'))
             if os.path.isfile(path_theta_z):
                 if not imp in imps_theta_z.keys():
                     imps_theta_z[imp] = {}
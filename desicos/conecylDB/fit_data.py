@@ -15,10 +15,12 @@ from numpy import sin, cos, pi, deg2rad
 
 from desicos.logger import *
 from desicos.constants import FLOAT
+from desicos.conecylDB import binary_store
 
 
 def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
-                      maxNumIter=1000, sample_size=None):
+                      maxNumIter=1000, sample_size=None, method='joint',
+                      loss='linear', f_scale=1., p0=None):
     r"""Fit a best cylinder for a given set of measured data
 
     The coordinate transformation which must be performed in order to adjust
@@ -46,9 +48,9 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
       `\Delta z_0`
 
     The five unknowns are calculated iteratively in a non-linear least-sqares
-    problem (solved with ``scipy.optimize.leastsq``), where the measured data
-    is transformed to the reference coordinate system and there compared with
-    a reference cylinder in order to compute the residual error using:
+    problem (solved with ``scipy.optimize.least_squares``), where the measured
+    data is transformed to the reference coordinate system and there compared
+    with a reference cylinder in order to compute the residual error using:
 
     .. math::
         \begin{Bmatrix} x_{ref} \\ y_{ref} \\ z_{ref} \end{Bmatrix} =
@@ -74,9 +76,12 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
                          z_{ref} - H, & \text{if } z_{ref} > H \\
                        \end{cases}
 
-    Since the measured data may have an unknown radius `R`, the solution of
-    these equations has to be performed iteratively with one additional
-    external loop in order to update `R`.
+    Since the measured data may have an unknown radius `R`, it is by default
+    included as a sixth unknown of the least-squares problem
+    (``method='joint'``). With ``method='fixed_point'`` the solution is
+    performed iteratively with one additional external loop in order to
+    update `R`, each iteration starting from the previous solution. In both
+    cases the Jacobian of the residuals is calculated analytically.
 
     Parameters
     ----------
@@ -104,6 +109,21 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
         If the input file containing the measured data is too big it may
         be convenient to use only a sample of it in order to calculate the
         best fit.
+    method : str, optional
+        ``'joint'`` to solve `R` together with the five unknowns above, or
+        ``'fixed_point'`` to update `R` in an external loop, in which case
+        ``errorRtol`` and ``maxNumIter`` are used.
+    loss : str, optional
+        The loss function passed to ``scipy.optimize.least_squares``. Robust
+        losses such as ``'soft_l1'``, ``'huber'`` or ``'cauchy'`` reduce the
+        influence of outliers in the measured data.
+    f_scale : float, optional
+        The residual (in length units) above which a point is considered an
+        outlier by the robust loss functions.
+    p0 : array-like, optional
+        The initial guess for `\alpha`, `\beta`, `\Delta x_0`, `\Delta y_0`
+        and `\Delta z_0`, typically ``out['p']`` from a previous fit of a
+        similar data set.
 
     Returns
     -------
@@ -122,6 +142,9 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
             The input points in a `3 \times N` 2-D array.
         ``out['output_pts']`` : np.ndarray
             The transformed points in a `3 \times N` 2-D array.
+        ``out['p']`` : np.ndarray
+            The optimized `\alpha`, `\beta`, `\Delta x_0`, `\Delta y_0`,
+            `\Delta z_0` and `R`.
 
     Examples
     --------
@@ -155,12 +178,13 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
 
 
     """
-    from scipy.optimize import leastsq
+    if method not in ('joint', 'fixed_point'):
+        raise ValueError('Invalid method: {0}'.format(method))
 
     if isinstance(path, np.ndarray):
         input_pts = path.T
     else:
-        input_pts = np.loadtxt(path, unpack=True)
+        input_pts = binary_store.load(path).T
 
     if input_pts.shape[0] != 3:
         raise ValueError('Input does not have the format: "x, y, z"')
@@ -171,9 +195,11 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
             input_pts = input_pts[:, sample(range(num), int(sample_size))]
 
     pts = np.vstack((input_pts, np.ones_like(input_pts[0, :])))
+    xi, yi, zi = input_pts
+    factor = 0.1
 
     def fT(p):
-        a, b, x0, y0, z0 = p
+        a, b, x0, y0, z0 = p[:5]
         a %= 2*np.pi
         b %= 2*np.pi
         # rotation in x, y
@@ -182,56 +208,91 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
                       [sin(b), -sin(a)*cos(b),  cos(a)*cos(b), z0]])
         return T
 
-    i = 0
-    R = R_expected
-    while i <= maxNumIter:
-        i += 1
-
-        def calc_dist(p, pts):
-            T = fT(p)
-            xn, yn, zn = T.dot(pts)
-            dz = np.zeros_like(zn)
-            factor = 0.1
-            # point below the bottom edge
-            mask = zn < 0
-            dz[mask] = -zn[mask]*factor
-
-            # point inside the cylinder
-            pass
-            #dz[(zn >= 0) & (zn <= H)] *= 0
-
-            # point above the top edge
-            mask = zn > H
-            dz[mask] = (zn[mask] - H)*factor
-
-            dr = R - np.sqrt(xn**2 + yn**2)
-            dist = np.sqrt(dr**2 + dz**2)
-            return dist
-
-        # initial guess for the optimization variables
-        # the variables are alpha, beta, x0, y0, z0
-        x, y, z = input_pts
-        p = [0.5, 0.5, 2*x.mean(), 2*y.mean(), 2*z.mean()]
-
-        # performing the leastsq analysis
-        popt, pcov = leastsq(func=calc_dist, x0=p, args=(pts,),
-                             ftol=1.e-12, xtol=1.e-12, maxfev=1000000)
+    def calc_res(p, R):
+        # the radial and axial distances are kept as separate residuals
+        # such that their sum of squares is the squared distance used
+        # previously, but with a smooth Jacobian
+        xn, yn, zn = fT(p).dot(pts)
+        dz = np.zeros_like(zn)
+        # point below the bottom edge
+        mask = zn < 0
+        dz[mask] = -zn[mask]*factor
+        # point above the top edge
+        mask = zn > H
+        dz[mask] = (zn[mask] - H)*factor
+        dr = R - np.sqrt(xn**2 + yn**2)
+        return np.concatenate((dr, dz))
+
+    def calc_jac(p):
+        a, b = p[:2]
+        sa, ca, sb, cb = sin(a), cos(a), sin(b), cos(b)
+        xn, yn, zn = fT(p).dot(pts)
+        rn = np.sqrt(xn**2 + yn**2)
+        rn[rn == 0] = 1.
+        one = np.ones_like(xi)
+        zero = np.zeros_like(xi)
+        # derivatives of xn, yn, zn with respect to a, b, x0, y0, z0
+        dxn = (ca*sb*yi + sa*sb*zi, -sb*xi + sa*cb*yi - ca*cb*zi,
+               one, zero, zero)
+        dyn = (-sa*yi + ca*zi, zero, zero, one, zero)
+        dzn = (-ca*cb*yi - sa*cb*zi, cb*xi + sa*sb*yi - ca*sb*zi,
+               zero, zero, one)
+        sign = np.zeros_like(zn)
+        sign[zn < 0] = -factor
+        sign[zn > H] = factor
+        jac = np.zeros((2*xi.shape[0], len(p)), dtype=xn.dtype)
+        for j in range(5):
+            jac[:xi.shape[0], j] = -(xn*dxn[j] + yn*dyn[j])/rn
+            jac[xi.shape[0]:, j] = sign*dzn[j]
+        if len(p) == 6:
+            jac[:xi.shape[0], 5] = 1.
+        return jac
+
+    # initial guess for the optimization variables
+    # the variables are alpha, beta, x0, y0, z0 (and R for method='joint')
+    if p0 is None:
+        p = [0.5, 0.5, 2*xi.mean(), 2*yi.mean(), 2*zi.mean()]
+    else:
+        p = list(p0[:5])
+
+    if method == 'joint':
+        p = np.array(p + [R_expected], dtype=FLOAT)
+        popt = _least_squares(lambda p: calc_res(p, p[5]), calc_jac, p,
+                              loss, f_scale)
         T = fT(popt)
         output_pts = T.dot(pts)
-        x, y, z = output_pts
-        mask = (z>=0) & (z<=H)
-        R_best_fit = np.sqrt(x[mask]**2 + y[mask]**2).mean()
-        errorR = abs(R_best_fit - R)/R_best_fit
+        xo, yo, zo = output_pts
+        R_best_fit = popt[5]
+        errorR = 0.
+        i = 1
+        log('R_best_fit: {0}'.format(R_best_fit), level=1)
 
-        log('Iteration: {0}, R_best_fit: {1}, errorR: {2}'.format(
-            i, R_best_fit, errorR), level=1)
-
-        if errorR < errorRtol:
-            break
-        else:
-            R = R_best_fit
     else:
-        warn('The maximum number of iterations was achieved!')
+        i = 0
+        R = R_expected
+        p = np.array(p, dtype=FLOAT)
+        while i <= maxNumIter:
+            i += 1
+            # warm start from the solution of the previous iteration
+            p = popt = _least_squares(lambda p: calc_res(p, R), calc_jac, p,
+                                      loss, f_scale)
+            T = fT(popt)
+            output_pts = T.dot(pts)
+            xo, yo, zo = output_pts
+            mask = (zo>=0) & (zo<=H)
+            R_best_fit = np.sqrt(xo[mask]**2 + yo[mask]**2).mean()
+            errorR = abs(R_best_fit - R)/R_best_fit
+
+            log('Iteration: {0}, R_best_fit: {1}, errorR: {2}'.format(
+                i, R_best_fit, errorR), level=1)
+
+            if errorR < errorRtol:
+                break
+            else:
+                R = R_best_fit
+        else:
+            warn('The maximum number of iterations was achieved!')
+        popt = np.append(popt, R_best_fit)
 
     alpha, beta = popt[:2]
     alpha %= 2*np.pi
@@ -250,7 +311,7 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
     log('')
 
     if save:
-        np.savetxt('output_best_fit.txt', np.vstack((x, y, z)).T)
+        np.savetxt('output_best_fit.txt', np.vstack((xo, yo, zo)).T)
 
     Tinv = np.zeros_like(T)
     Tinv[:3, :3] = T[:3, :3].T
@@ -258,7 +319,25 @@ def best_fit_cylinder(path, H, R_expected=10., save=True, errorRtol=1.e-9,
     return dict(R_best_fit=R_best_fit,
                 input_pts=input_pts,
                 output_pts=output_pts,
-                T=T, Tinv=Tinv)
+                T=T, Tinv=Tinv,
+                p=popt)
+
+
+def _least_squares(fun, jac, p0, loss='linear', f_scale=1.):
+    try:
+        from scipy.optimize import least_squares
+    except ImportError:
+        # older SciPy versions
+        from scipy.optimize import leastsq
+        if loss != 'linear':
+            warn('Robust loss functions require scipy.optimize.least_squares'
+                 ', using loss="linear"', level=1)
+        return leastsq(func=fun, x0=p0, Dfun=jac, ftol=1.e-12, xtol=1.e-12,
+                       maxfev=100000)[0]
+    res = least_squares(fun, p0, jac=jac, loss=loss, f_scale=f_scale,
+                        x_scale='jac', ftol=1.e-12, xtol=1.e-12,
+                        max_nfev=1000)
+    return res.x
 
 
 def best_fit_cone(path, H, alphadeg, R_expected=10., save=True,
@@ -273,7 +352,7 @@ def best_fit_cone(path, H, alphadeg, R_expected=10., save=True,
 
 def calc_c0(path, m0=50, n0=50, funcnum=2, fem_meridian_bot2top=True,
         rotatedeg=None, filter_m0=None, filter_n0=None, sample_size=None,
-        maxmem=8):
+        maxmem=8, solver='lstsq', grid_shape=None):
     r"""Find the coefficients that best fit the `w_0` imperfection
 
     The measured data will be fit using one of the following functions,
@@ -355,7 +434,31 @@ def calc_c0(path, m0=50, n0=50, funcnum=2, fem_meridian_bot2top=True,
         computations.
     maxmem : int, optional
         Maximum RAM memory in GB allowed to compute the base functions.
-        The ``scipy.interpolate.lstsq`` will go beyond this limit.
+        The ``scipy.interpolate.lstsq`` will go beyond this limit. When
+        ``solver='lstsq'`` a random sample of the measured points is used if
+        this limit is exceeded, whereas when ``solver='normal'`` it defines
+        the size of the blocks of points.
+    solver : str, optional
+        The least-squares solver:
+
+        - ``'lstsq'``: the full matrix `[g]` is computed and passed to
+          ``scipy.linalg.lstsq``
+        - ``'normal'``: the normal equations `[g]^T[g] \{c_0\} =
+          [g]^T \{w_0\}` are accumulated over blocks of points, such that
+          all measured points are used and the memory scales with the
+          number of coefficients instead of the number of points
+        - ``'fft'``: the measured points are resampled onto a regular
+          `(z, \theta)` grid using the inverse-weighted interpolation
+          (:func:`.calc_inv_weights`) and the coefficients are obtained
+          with a discrete cosine (or sine) transform along `z` and a fast
+          Fourier transform along `\theta`, with a cost of `O(N log N)`.
+          Available for ``funcnum=1`` and ``funcnum=2``, whose base
+          functions are orthogonal on such grid. The returned residual is
+          calculated against the measured points, allowing a comparison
+          with the other solvers
+    grid_shape : tuple or None, optional
+        The number of points ``(nz, ntheta)`` of the regular grid used when
+        ``solver='fft'``. The default is ``(4*m0, 4*n0)``.
 
     Returns
     -------
@@ -379,7 +482,7 @@ def calc_c0(path, m0=50, n0=50, funcnum=2, fem_meridian_bot2top=True,
         input_pts = path
         path = 'unmamed.txt'
     else:
-        input_pts = np.loadtxt(path)
+        input_pts = binary_store.load(path)
 
     if input_pts.shape[1] != 3:
         raise ValueError('Input does not have the format: "theta, z, imp"')
@@ -410,10 +513,16 @@ def calc_c0(path, m0=50, n0=50, funcnum=2, fem_meridian_bot2top=True,
 
     maxnum = int(maxmem*1024*1024*1024*8/(64.*size*m0*n0)/memfac)
     num = input_pts.shape[0]
-    if num >= maxnum:
-        input_pts = input_pts[sample(range(num), int(maxnum))]
-        warn('Using {0} measured points due to the "maxmem" specified'.
-                format(maxnum), level=1)
+    if solver == 'lstsq':
+        if num >= maxnum:
+            input_pts = input_pts[sample(range(num), int(maxnum))]
+            warn('Using {0} measured points due to the "maxmem" specified'.
+                    format(maxnum), level=1)
+    elif solver not in ('normal', 'fft'):
+        raise ValueError(
+                'Valid values for "solver" are "lstsq", "normal" or "fft"')
+    if solver == 'fft' and funcnum == 3:
+        raise ValueError('solver="fft" is available for funcnum 1 or 2')
 
     ts = input_pts[:, 0].copy()
     if rotatedeg is not None:
@@ -428,11 +537,19 @@ def calc_c0(path, m0=50, n0=50, funcnum=2, fem_meridian_bot2top=True,
         zs *= -1
         zs += 1
 
-    a = fa(m0, n0, zs, ts, funcnum)
+    if solver == 'normal':
+        c0, residues = _solve_normal(m0, n0, zs, ts, w0pts, funcnum,
+                                     max(maxnum, 1))
+    elif solver == 'fft':
+        if grid_shape is None:
+            grid_shape = (4*m0, 4*n0)
+        c0, residues = _solve_fft(m0, n0, zs, ts, w0pts, funcnum, grid_shape)
+    else:
+        a = fa(m0, n0, zs, ts, funcnum)
 
-    log('Base functions calculated', level=1)
-    c0, residues, rank, s = lstsq(a, w0pts)
-    log('Finished scipy.linalg.lstsq', level=1)
+        log('Base functions calculated', level=1)
+        c0, residues, rank, s = lstsq(a, w0pts)
+        log('Finished scipy.linalg.lstsq', level=1)
 
     if filter_m0 is not None or filter_n0 is not None:
         c0 = filter_c0(m0, n0, c0, filter_m0, filter_n0, funcnum=funcnum)
@@ -440,6 +557,110 @@ def calc_c0(path, m0=50, n0=50, funcnum=2, fem_meridian_bot2top=True,
     return c0, residues
 
 
+def _solve_normal(m0, n0, zs, ts, w0pts, funcnum, block_size):
+    from scipy.linalg import cho_factor, cho_solve, lstsq, LinAlgError
+
+    num = zs.shape[0]
+    num_blocks = (num - 1)//block_size + 1
+    log('Accumulating normal equations in {0} blocks'.format(num_blocks),
+        level=1)
+    # the Cython version of fa() requires each block to contain the
+    # normalized limits z=0 and z=1, two dummy points are prepended and
+    # their rows discarded
+    zlim = np.array([0., 1.])
+    tlim = np.zeros(2)
+    ata = None
+    for i in range(num_blocks):
+        i_inf = i*block_size
+        i_sup = min(i_inf + block_size, num)
+        a = fa(m0, n0, np.concatenate((zlim, zs[i_inf:i_sup])),
+               np.concatenate((tlim, ts[i_inf:i_sup])), funcnum)[2:]
+        w = w0pts[i_inf:i_sup]
+        if ata is None:
+            ata = a.T.dot(a)
+            atw = a.T.dot(w)
+        else:
+            ata += a.T.dot(a)
+            atw += a.T.dot(w)
+        del a
+    log('Normal equations calculated', level=1)
+
+    # base functions vanishing at every point, e.g. sin(0*theta), give null
+    # rows and columns and are removed from the system
+    nz = np.diag(ata) > 0
+    c0 = np.zeros_like(atw)
+    ata_nz = ata[np.ix_(nz, nz)]
+    try:
+        c0[nz] = cho_solve(cho_factor(ata_nz), atw[nz])
+    except LinAlgError:
+        warn('Singular normal equations, using scipy.linalg.lstsq', level=1)
+        c0[nz] = lstsq(ata_nz, atw[nz])[0]
+    log('Finished normal equations solution', level=1)
+
+    residues = (w0pts.dot(w0pts) - 2*c0.dot(atw) + c0.dot(ata.dot(c0)))
+    return c0, residues
+
+
+def _solve_fft(m0, n0, zs, ts, w0pts, funcnum, grid_shape):
+    from scipy.fftpack import dct, dst
+
+    from .interpolate import calc_inv_weights, apply_inv_weights
+
+    nz, nt = [int(i) for i in grid_shape]
+    if nz <= m0 or nt <= 2*n0:
+        raise ValueError('grid_shape must be larger than (m0, 2*n0)')
+
+    log('Resampling onto a regular grid of shape {0}'.format((nz, nt)),
+        level=1)
+    # angles in [-pi, pi), both coordinates normalized between 0 and 1
+    ts = (ts + pi) % (2*pi) - pi
+    coords = np.vstack(((ts + pi)/(2*pi), zs)).T
+    # periodic copies of the points close to the seam at theta=-pi
+    low = coords[:, 0] < 0.1
+    high = coords[:, 0] > 0.9
+    coords = np.vstack((coords, coords[low] + [1., 0.],
+                        coords[high] - [1., 0.]))
+    values = np.concatenate((w0pts, w0pts[low], w0pts[high]))
+    # cell-centred z and uniform theta, giving orthogonal discrete bases
+    zg = (np.arange(nz) + 0.5)/nz
+    tg = -pi + 2*pi*np.arange(nt)/nt
+    TG, ZG = np.meshgrid(tg, zg)
+    mesh = np.vstack(((TG.ravel() + pi)/(2*pi), ZG.ravel())).T
+    indices, weights = calc_inv_weights(coords, mesh)
+    wg = apply_inv_weights(indices, weights, values).reshape(nz, nt)
+
+    log('Computing spectral coefficients', level=1)
+    # along theta: sum_l w_l exp(-i j theta_l), where theta_l = -pi + ...
+    ft = np.fft.rfft(wg, axis=1)[:, :n0]
+    ft *= (-1.)**np.arange(n0)
+    fac = np.full(n0, 2./nt)
+    fac[0] = 1./nt
+    gsin = -ft.imag*fac
+    gcos = ft.real*fac
+    # along z
+    if funcnum == 1:
+        # sin(i*pi*z) for i=1..m0 with a DST-II
+        csin = dst(gsin, type=2, axis=0)[:m0]/nz
+        ccos = dst(gcos, type=2, axis=0)[:m0]/nz
+    else:
+        # cos(i*pi*z) for i=0..m0-1 with a DCT-II
+        csin = dct(gsin, type=2, axis=0)[:m0]/nz
+        ccos = dct(gcos, type=2, axis=0)[:m0]/nz
+        csin[0] /= 2
+        ccos[0] /= 2
+    c0 = np.zeros((n0, m0, 2), dtype=FLOAT)
+    c0[:, :, 0] = csin.T
+    c0[:, :, 1] = ccos.T
+    c0 = c0.ravel()
+    log('Finished spectral coefficients', level=1)
+
+    w0fit = fw0(m0, n0, c0, zs, ts, funcnum)
+    residues = np.sum((w0pts - w0fit)**2)
+    log('Residual against the measured points: {0}'.format(residues),
+        level=1)
+    return c0, residues
+
+
 def filter_c0(m0, n0, c0, filter_m0, filter_n0, funcnum=2):
     r"""Apply filter to the imperfection coefficients `\{c_0\}`
 
@@ -594,6 +815,11 @@ def fw0(m0, n0, c0, xs_norm, ts, funcnum=2):
     - ``size=2`` if ``funcnum==1 or funcnum==2``
     - ``size=4`` if ``funcnum==3``
 
+    When the points lie on a structured grid, i.e. when the number of
+    unique ``xs_norm`` times the number of unique ``ts`` is not larger than
+    twice the number of points, :func:`.fw0_grid` is used to evaluate the
+    field on the grid and the values are gathered for each point.
+
     """
     if xs_norm.shape != ts.shape:
         raise ValueError('xs_norm and ts must have the same shape')
@@ -605,6 +831,11 @@ def fw0(m0, n0, c0, xs_norm, ts, funcnum=2):
         size = 4
     if c0.shape[0] != size*m0*n0:
         raise ValueError('Invalid c0 for the given m0 and n0!')
+    uxs, ixs = np.unique(xs_norm.ravel(), return_inverse=True)
+    uts, its = np.unique(ts.ravel(), return_inverse=True)
+    if uxs.shape[0]*uts.shape[0] <= 2*xs_norm.size:
+        w0s = fw0_grid(m0, n0, c0, uxs, uts, funcnum)[ixs, its]
+        return w0s.reshape(xs_norm.shape)
     try:
         import _fit_data
         w0s = _fit_data.fw0(m0, n0, c0, xs_norm.ravel(), ts.ravel(), funcnum)
@@ -614,6 +845,71 @@ def fw0(m0, n0, c0, xs_norm, ts, funcnum=2):
     return w0s.reshape(xs_norm.shape)
 
 
+def fw0_grid(m0, n0, c0, xs_norm, ts, funcnum=2):
+    r"""Calculates the imperfection field `w_0` on a structured grid
+
+    The base functions are separable in `x` and `\theta`, such that the
+    field on a grid can be written as:
+
+    .. math::
+        [w_0] = \sum_k [b_x]_k [C]_k [b_\theta]_k^T
+
+    where `[b_x]_k` and `[b_\theta]_k` contain the 1-D base functions
+    evaluated once for each unique coordinate and `[C]_k` the corresponding
+    coefficients, avoiding the evaluation of every base function at every
+    point.
+
+    Parameters
+    ----------
+    m0 : int
+        The number of terms along the meridian.
+    n0 : int
+        The number of terms along the circumference.
+    c0 : np.ndarray
+        The coefficients of the imperfection pattern.
+    xs_norm : np.ndarray
+        A 1-D array with the meridian coordinates (`x`) of the grid,
+        normalized to be between ``0.`` and ``1.``.
+    ts : np.ndarray
+        A 1-D array with the angles in radians of the grid.
+    funcnum : int, optional
+        The function used for the approximation (see function :func:`.calc_c0`)
+
+    Returns
+    -------
+    w0s : np.ndarray
+        A 2-D array with shape ``(xs_norm.shape[0], ts.shape[0])``
+        containing the calculated imperfections.
+
+    """
+    xs_norm = np.asarray(xs_norm, dtype=FLOAT).ravel()
+    ts = np.asarray(ts, dtype=FLOAT).ravel()
+    if funcnum==1:
+        size = 2
+        bx = sin(pi*np.outer(xs_norm, np.arange(1, m0+1)))
+        terms = ((bx, sin), (bx, cos))
+    elif funcnum==2:
+        size = 2
+        bx = cos(pi*np.outer(xs_norm, np.arange(m0)))
+        terms = ((bx, sin), (bx, cos))
+    elif funcnum==3:
+        size = 4
+        bxs = sin(pi*np.outer(xs_norm, np.arange(m0)))
+        bxc = cos(pi*np.outer(xs_norm, np.arange(m0)))
+        terms = ((bxs, sin), (bxs, cos), (bxc, sin), (bxc, cos))
+    else:
+        raise ValueError('Valid values for "funcnum" are 1, 2 or 3')
+    if c0.shape[0] != size*m0*n0:
+        raise ValueError('Invalid c0 for the given m0 and n0!')
+    c = c0.reshape(n0, m0, size)
+    jt = np.outer(ts, np.arange(n0))
+    bt = {sin: sin(jt), cos: cos(jt)}
+    w0s = np.zeros((xs_norm.shape[0], ts.shape[0]), dtype=FLOAT)
+    for k, (bx, ft) in enumerate(terms):
+        w0s += bx.dot(c[:, :, k].T).dot(bt[ft].T)
+    return w0s
+
+
 def transf_matrix(alphadeg, betadeg, gammadeg, x0, y0, z0):
     r"""Calculates the transformation matrix
 
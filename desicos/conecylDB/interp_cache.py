@@ -0,0 +1,205 @@
+r"""
+Interpolation Cache (:mod:`desicos.conecylDB.interp_cache`)
+===========================================================
+
+.. currentmodule:: desicos.conecylDB.interp_cache
+
+This module stores on disk the closest points and weights computed by
+:func:`.calc_inv_weights`, such that models sharing the same mesh and the
+same measured imperfection do not repeat the interpolation.
+
+Each plan is stored in a ``.npz`` file named after a hash of the mesh
+coordinates, of the measured data and of the interpolation parameters. The
+least recently used plans are removed when the total size of the cache
+exceeds ``max_size``.
+
+"""
+from __future__ import absolute_import
+import hashlib
+import os
+
+import numpy as np
+
+from desicos.logger import *
+from desicos.constants import TMP_DIR
+from .interpolate import calc_inv_weights
+
+
+CACHE_DIR = os.path.join(os.path.expanduser(TMP_DIR), 'interp_cache')
+MAX_SIZE = 1024*1024*1024 # 1 GB
+
+
+def plan_key(mesh, data, **params):
+    r"""Calculates the key identifying an interpolation plan
+
+    Parameters
+    ----------
+    mesh : numpy.ndarray
+        The coordinates where the values will be interpolated to.
+    data : str or numpy.ndarray
+        The path to the measured data file or an array with the measured
+        data.
+    params : dict
+        Any other parameter affecting the interpolation, such as ``ncp``,
+        ``power_parameter``, ``rotatedeg`` or ``stretch_H``.
+
+    Returns
+    -------
+    key : str
+        A hexadecimal hash.
+
+    """
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(mesh, dtype='float64'))
+    if isinstance(data, np.ndarray):
+        h.update(np.ascontiguousarray(data, dtype='float64'))
+    else:
+        with open(data, 'rb') as f:
+            for block in iter(lambda: f.read(1024*1024), b''):
+                h.update(block)
+    for k in sorted(params.keys()):
+        h.update('{0}={1!r};'.format(k, params[k]).encode('utf-8'))
+    return h.hexdigest()
+
+
+def load_plan(key, cache_dir=CACHE_DIR):
+    """Loads an interpolation plan from the cache
+
+    Parameters
+    ----------
+    key : str
+        The key calculated with :func:`.plan_key`.
+    cache_dir : str, optional
+        The cache directory.
+
+    Returns
+    -------
+    plan : tuple or None
+        A tuple ``(indices, weights)``, or ``None`` if the plan is not
+        cached.
+
+    """
+    path = os.path.join(cache_dir, key + '.npz')
+    if not os.path.isfile(path):
+        return None
+    try:
+        tmp = np.load(path)
+        plan = tmp['indices'], tmp['weights']
+        tmp.close()
+    except Exception:
+        warn('Corrupted interpolation plan {0} ignored'.format(path),
+             level=1)
+        return None
+    # the modification time is used to keep track of the recently used plans
+    os.utime(path, None)
+    return plan
+
+
+def save_plan(key, indices, weights, cache_dir=CACHE_DIR,
+              max_size=MAX_SIZE):
+    """Saves an interpolation plan into the cache
+
+    After saving, the least recently used plans are removed until the total
+    size of the cache is below ``max_size``.
+
+    Parameters
+    ----------
+    key : str
+        The key calculated with :func:`.plan_key`.
+    indices : numpy.ndarray
+        The indices of the closest points.
+    weights : numpy.ndarray
+        The weights of the closest points.
+    cache_dir : str, optional
+        The cache directory.
+    max_size : int, optional
+        The maximum size of the cache in bytes.
+
+    """
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        path = os.path.join(cache_dir, key + '.npz')
+        tmp_path = os.path.join(cache_dir, key + '.tmp.npz')
+        np.savez(tmp_path, indices=indices, weights=weights)
+        if os.path.isfile(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        warn('Interpolation plan could not be saved in {0}'.format(cache_dir),
+             level=1)
+        return
+    evict(cache_dir, max_size)
+
+
+def evict(cache_dir=CACHE_DIR, max_size=MAX_SIZE):
+    """Removes the least recently used plans exceeding ``max_size``
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        The cache directory.
+    max_size : int, optional
+        The maximum size of the cache in bytes.
+
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.npz') or name.endswith('.tmp.npz'):
+            continue
+        path = os.path.join(cache_dir, name)
+        st = os.stat(path)
+        entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()
+    total = sum(e[1] for e in entries)
+    for mtime, size, path in entries:
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            log('Interpolation plan removed from cache: {0}'.format(path),
+                level=1)
+        except OSError:
+            pass
+
+
+def cached_inv_weights(key, coords, mesh, cache_dir=CACHE_DIR,
+        max_size=MAX_SIZE, **kwargs):
+    """Same as :func:`.calc_inv_weights`, reusing plans from the cache
+
+    Parameters
+    ----------
+    key : str
+        The key calculated with :func:`.plan_key`.
+    coords : numpy.ndarray, shape (N, ndim)
+        The coordinates of the measured points.
+    mesh : numpy.ndarray, shape (M, ndim)
+        The new coordinates where the values will be interpolated to.
+    cache_dir : str, optional
+        The cache directory.
+    max_size : int, optional
+        The maximum size of the cache in bytes.
+    kwargs : dict
+        Other parameters passed to :func:`.calc_inv_weights`.
+
+    Returns
+    -------
+    indices, weights : numpy.ndarray
+        See :func:`.calc_inv_weights`.
+
+    """
+    plan = load_plan(key, cache_dir)
+    if plan is not None:
+        indices, weights = plan
+        if (indices.shape[0] == mesh.shape[0]
+            and indices.max() < coords.shape[0]):
+            log('Using cached interpolation plan {0}'.format(key))
+            return indices, weights
+        warn('Cached interpolation plan {0} does not match'.format(key),
+             level=1)
+    indices, weights = calc_inv_weights(coords, mesh, **kwargs)
+    save_plan(key, indices, weights, cache_dir, max_size)
+    return indices, weights
@@ -19,58 +19,151 @@ from desicos.constants import FLOAT
 from .read_write import read_theta_z_imp
 
 
-def inv_weighted(data, mesh, num_sub, col, ncp=5, power_parameter=2):
-    r"""Interpolates the values taken at one group of points into
-    another using an inverse-weighted algorithm
+def calc_inv_weights(coords, mesh, ncp=5, power_parameter=2,
+        method='kdtree', num_sub=None, col=None, chunk_size=100000):
+    r"""Finds the closest points and the inverse-weighted interpolation
+    weights
 
-    In the inverse-weighted algorithm a number of `n_{CP}` measured points
-    of the input parameter ``data`` that are closest to a given node in
-    the input parameter ``mesh`` are found and the imperfection value of
-    this node (represented by the normal displacement `{w_0}_{node}`) is
-    calculated as follows:
-
-    .. math::
-        {w_0}_{node} = \frac{\sum_{i}^{n_{CP}}{{w_0}_i\frac{1}{w_i}}}
-                            {\sum_{i}^{n_{CP}}{\frac{1}{w_i}}}
-
-    where `w_i` is the inverse weight of each measured point, calculated as:
-
-    .. math::
-        w_i = \left[(x_{node}-x_i)^2+(y_{node}-y_i)^2+(z_{node}-z_i)^2
-              \right]^p
-
-    with `p` being a power parameter that when increased will increase the
-    relative influence of a closest point.
+    This is the kernel of the inverse-weighted algorithm described in
+    :func:`.inv_weighted`. The returned indices and weights depend only on
+    the point coordinates, such that they can be reused to interpolate
+    any number of value columns measured at ``coords`` using
+    :func:`.apply_inv_weights`.
 
     Parameters
     ----------
-    data : numpy.ndarray, shape (N, ndim+1)
-        The data or an array containing the imperfection file. The values
-        to be interpolated must be in the last column.
+    coords : numpy.ndarray, shape (N, ndim)
+        The coordinates of the measured points.
     mesh : numpy.ndarray, shape (M, ndim)
         The new coordinates where the values will be interpolated to.
-    num_sub : int
-        The number of sub-sets used during the interpolation. The points
-        are divided in sub-sets to increase the algorithm's efficiency.
-    col : int
-        The index of the column to be used in order to divide the data
-        in sub-sets. Note that the first column index is ``0``.
     ncp : int, optional
         Number of closest points used in the inverse-weighted interpolation.
     power_parameter : float, optional
         Power of inverse weighted interpolation function.
+    method : str, optional
+        The algorithm used to find the closest points:
+
+        - ``'kdtree'``: a spatial index (``scipy.spatial.cKDTree``) is built
+          with the measured points and queried for the ``ncp`` closest points
+          of each node, with a cost of `O((N+M) log N)`. If SciPy is not
+          available ``'slabs'`` is used instead
+        - ``'slabs'``: the original algorithm, where the points are sorted
+          and divided in ``num_sub`` sub-sets along column ``col`` and a
+          dense distance matrix is computed for each sub-set
+
+    num_sub : int, optional
+        The number of sub-sets used during the interpolation. The points
+        are divided in sub-sets to increase the algorithm's efficiency.
+        Only used when ``method='slabs'``, where ``10`` is assumed if not
+        given.
+    col : int, optional
+        The index of the column to be used in order to divide the data
+        in sub-sets. Note that the first column index is ``0``. Only used
+        when ``method='slabs'``, where the last coordinate column is assumed
+        if not given.
+    chunk_size : int, optional
+        Maximum number of mesh points queried at once when
+        ``method='kdtree'``, bounding the memory used by the algorithm.
 
     Returns
     -------
-    ans : numpy.ndarray
-        A 1-D array with the interpolated values. The size of this array
-        is ``mesh.shape[0]``.
+    indices : numpy.ndarray, shape (M, ncp)
+        The indices of the closest points in ``coords`` for each node.
+    weights : numpy.ndarray, shape (M, ncp)
+        The normalized weights of each closest point, summing up to one for
+        each node. A node coinciding with a measured point takes the whole
+        weight from this point.
 
     """
-    if mesh.shape[1] != data.shape[1]-1:
-        raise ValueError('Invalid input: mesh.shape[1] != data.shape[1]')
+    if mesh.shape[1] != coords.shape[1]:
+        raise ValueError('Invalid input: mesh.shape[1] != coords.shape[1]')
 
-    log('Interpolating... ')
+    if method not in ('kdtree', 'slabs'):
+        raise ValueError('Valid values for "method" are "kdtree" or "slabs"')
+
+    ncp = min(int(ncp), coords.shape[0])
+
+    if method == 'kdtree':
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            warn('scipy.spatial could not be imported, using method="slabs"',
+                 level=1)
+            method = 'slabs'
+
+    if method == 'kdtree':
+        indices, dist_cp = _closest_points_kdtree(coords, mesh, ncp,
+                                                  chunk_size)
+    else:
+        if num_sub is None:
+            num_sub = 10
+        if col is None:
+            col = mesh.shape[1] - 1
+        indices, dist_cp = _closest_points_slabs(coords, mesh, ncp,
+                                                 num_sub, col)
+
+    # nodes coinciding with a measured point take its value
+    coincident = dist_cp[:, 0] == 0
+    dist_cp[coincident] = 1.
+    # weight calculation
+    weights = 1./(dist_cp**power_parameter)
+    weights[coincident] = 0.
+    weights[coincident, 0] = 1.
+    weights /= np.sum(weights, axis=1)[:, None]
+
+    return indices, weights
+
+
+def apply_inv_weights(indices, weights, values):
+    r"""Interpolates values using precomputed indices and weights
+
+    Parameters
+    ----------
+    indices : numpy.ndarray, shape (M, ncp)
+        The indices of the closest points, as returned by
+        :func:`.calc_inv_weights`.
+    weights : numpy.ndarray, shape (M, ncp)
+        The normalized weights, as returned by :func:`.calc_inv_weights`.
+    values : numpy.ndarray, shape (N,) or (N, k)
+        The values at the measured points. Many columns can be interpolated
+        at once.
+
+    Returns
+    -------
+    ans : numpy.ndarray, shape (M,) or (M, k)
+        The interpolated values.
+
+    """
+    values = np.asarray(values)
+    if values.ndim == 1:
+        return np.sum(values[indices]*weights, axis=1)
+    return np.einsum('ij,ijk->ik', weights, values[indices])
+
+
+def _closest_points_kdtree(coords, mesh, ncp, chunk_size):
+    from scipy.spatial import cKDTree
+
+    log('Searching closest points using a KD-tree... ')
+    mesh_size = mesh.shape[0]
+    chunk_size = max(int(chunk_size), 1)
+
+    tree = cKDTree(coords)
+
+    indices = np.zeros((mesh_size, ncp), dtype=np.intp)
+    dist_cp = np.zeros((mesh_size, ncp), dtype=FLOAT)
+    for i_inf in range(0, mesh_size, chunk_size):
+        i_sup = min(i_inf + chunk_size, mesh_size)
+        log('\t processed {0:7d} out of {1:7d} entries'.format(
+              i_sup, mesh_size))
+        dist, asort = tree.query(mesh[i_inf:i_sup], k=ncp)
+        dist_cp[i_inf:i_sup] = dist.reshape(-1, ncp)**2
+        indices[i_inf:i_sup] = asort.reshape(-1, ncp)
+
+    return indices, dist_cp
+
+
+def _closest_points_slabs(coords, mesh, ncp, num_sub, col):
+    log('Searching closest points... ')
     num_sub = int(num_sub)
     mesh_size = mesh.shape[0]
 
@@ -84,20 +177,18 @@ def inv_weighted(data, mesh, num_sub, col, ncp=5, power_parameter=2):
         if sec_size**2*10 <= mem_entries:
             warn('New num_sub: {0}'.format(int(mesh_size/float(sec_size))))
             break
-
-    mesh_seq = np.arange(mesh.shape[0])
+    sec_size = max(sec_size, 1)
 
     mesh_argsort = np.argsort(mesh[:, col])
-    mesh_seq = mesh_seq[mesh_argsort]
-    back_argsort = np.argsort(mesh_seq)
-
     mesh = np.asarray(mesh[mesh_argsort], order='F')
 
     length = mesh[:, col].max() - mesh[:, col].min()
 
-    data = np.asarray(data[np.argsort(data[:, col])], order='F')
+    data_argsort = np.argsort(coords[:, col])
+    coords = np.asarray(coords[data_argsort], order='F')
 
-    ans = np.zeros(mesh.shape[0], dtype=mesh.dtype)
+    indices = np.zeros((mesh_size, ncp), dtype=np.intp)
+    dist_cp = np.zeros((mesh_size, ncp), dtype=FLOAT)
 
     # max_num_limits defines how many times the log will print
     # "processed ... out of ... entries"
@@ -115,7 +206,7 @@ def inv_weighted(data, mesh, num_sub, col, ncp=5, power_parameter=2):
             log('\t processed {0:7d} out of {1:7d} entries'.format(
                   min(i_sup, mesh_size), mesh_size))
         sub_mesh = mesh[i_inf : i_sup]
-        if not np.any(sub_mesh):
+        if sub_mesh.shape[0] == 0:
             continue
         inf = sub_mesh[:, col].min()
         sup = sub_mesh[:, col].max()
@@ -125,40 +216,94 @@ def inv_weighted(data, mesh, num_sub, col, ncp=5, power_parameter=2):
             tol = 0.06
 
         while True:
-            cond1 = data[:, col] >= inf - tol*length
-            cond2 = data[:, col] <= sup + tol*length
-            cond = np.all(np.array((cond1, cond2)), axis=0)
-            sub_data = data[cond]
-            if not np.any(sub_data):
+            cond1 = coords[:, col] >= inf - tol*length
+            cond2 = coords[:, col] <= sup + tol*length
+            sub_index = np.nonzero(cond1 & cond2)[0]
+            if sub_index.shape[0] < ncp:
                 tol += 0.01
             else:
                 break
+        sub_data = coords[sub_index]
 
         dist = np.subtract.outer(sub_mesh[:, 0], sub_data[:, 0])**2
         for j in range(1, sub_mesh.shape[1]):
             dist += np.subtract.outer(sub_mesh[:, j], sub_data[:, j])**2
-        asort = np.argsort(dist, axis=1)
-        lenn = sub_mesh.shape[0]
-        lenp = sub_data.shape[0]
-        asort_mesh = asort + np.meshgrid(np.arange(lenn)*lenp,
-                                         np.arange(lenp))[0].transpose()
+        asort = np.argsort(dist, axis=1)[:, :ncp]
+        rows = np.arange(sub_mesh.shape[0])[:, None]
         # getting the distance of the closest points
-        dist_cp = np.take(dist, asort_mesh[:, :ncp])
-        # avoiding division by zero
-        dist_cp[(dist_cp==0)] == 1.e-12
-        # fetching the imperfection of the sub-data
-        imp = sub_data[:, -1]
-        # taking only the imperfection of the closest points
-        imp_cp = np.take(imp, asort[:, :ncp])
-        # weight calculation
-        total_weight = np.sum(1./(dist_cp**power_parameter), axis=1)
-        weight = 1./(dist_cp**power_parameter)
-        # computing the new imp
-        imp_new = np.sum(imp_cp*weight, axis=1)/total_weight
-        # updating the answer array
-        ans[i_inf : i_sup] = imp_new
-
-    ans = ans[back_argsort]
+        dist_cp[i_inf : i_sup] = dist[rows, asort]
+        # mapping back to the indices of the input points
+        indices[i_inf : i_sup] = data_argsort[sub_index[asort]]
+
+    back_argsort = np.argsort(mesh_argsort)
+
+    return indices[back_argsort], dist_cp[back_argsort]
+
+
+def inv_weighted(data, mesh, num_sub=None, col=None, ncp=5,
+        power_parameter=2, method='kdtree', chunk_size=100000):
+    r"""Interpolates the values taken at one group of points into
+    another using an inverse-weighted algorithm
+
+    In the inverse-weighted algorithm a number of `n_{CP}` measured points
+    of the input parameter ``data`` that are closest to a given node in
+    the input parameter ``mesh`` are found and the imperfection value of
+    this node (represented by the normal displacement `{w_0}_{node}`) is
+    calculated as follows:
+
+    .. math::
+        {w_0}_{node} = \frac{\sum_{i}^{n_{CP}}{{w_0}_i\frac{1}{w_i}}}
+                            {\sum_{i}^{n_{CP}}{\frac{1}{w_i}}}
+
+    where `w_i` is the inverse weight of each measured point, calculated as:
+
+    .. math::
+        w_i = \left[(x_{node}-x_i)^2+(y_{node}-y_i)^2+(z_{node}-z_i)^2
+              \right]^p
+
+    with `p` being a power parameter that when increased will increase the
+    relative influence of a closest point.
+
+    The closest points and weights are computed by
+    :func:`.calc_inv_weights`, which can be called directly when many value
+    columns must be interpolated for the same points.
+
+    Parameters
+    ----------
+    data : numpy.ndarray, shape (N, ndim+1)
+        The data or an array containing the imperfection file. The values
+        to be interpolated must be in the last column.
+    mesh : numpy.ndarray, shape (M, ndim)
+        The new coordinates where the values will be interpolated to.
+    num_sub : int, optional
+        See :func:`.calc_inv_weights`.
+    col : int, optional
+        See :func:`.calc_inv_weights`.
+    ncp : int, optional
+        Number of closest points used in the inverse-weighted interpolation.
+    power_parameter : float, optional
+        Power of inverse weighted interpolation function.
+    method : str, optional
+        The algorithm used to find the closest points, ``'kdtree'`` or
+        ``'slabs'`` (see :func:`.calc_inv_weights`).
+    chunk_size : int, optional
+        See :func:`.calc_inv_weights`.
+
+    Returns
+    -------
+    ans : numpy.ndarray
+        A 1-D array with the interpolated values. The size of this array
+        is ``mesh.shape[0]``.
+
+    """
+    if mesh.shape[1] != data.shape[1]-1:
+        raise ValueError('Invalid input: mesh.shape[1] != data.shape[1]')
+
+    log('Interpolating... ')
+    indices, weights = calc_inv_weights(data[:, :-1], mesh, ncp=ncp,
+            power_parameter=power_parameter, method=method, num_sub=num_sub,
+            col=col, chunk_size=chunk_size)
+    ans = apply_inv_weights(indices, weights, data[:, -1])
 
     log('Interpolation completed!')
 
@@ -274,7 +419,8 @@ def interp(x, xp, fp, left=None, right=None, period=None):
 
 def interp_theta_z_imp(data, mesh, alphadeg, H_measured, H_model, R_bottom,
         stretch_H=False, z_offset_bot=None, rotatedeg=0., num_sub=10, ncp=5,
-        power_parameter=2, ignore_bot_h=None, ignore_top_h=None, T=None):
+        power_parameter=2, ignore_bot_h=None, ignore_top_h=None, T=None,
+        method='kdtree'):
     r"""Interpolates a data set in the `\theta, z, imp` format
 
     This function uses the inverse-weighted algorithm (:func:`.inv_weighted`).
@@ -327,6 +473,9 @@ def interp_theta_z_imp(data, mesh, alphadeg, H_measured, H_model, R_bottom,
     T : None or np.ndarray, optional
         A transformation matrix (cf. :func:`.transf_matrix`) required when the
         mesh is not in the :ref:`default coordinate system <figure_conecyl>`.
+    method : str, optional
+        The algorithm used to find the closest points (cf.
+        :func:`.inv_weighted`).
 
     Returns
     -------
@@ -376,7 +525,7 @@ def interp_theta_z_imp(data, mesh, alphadeg, H_measured, H_model, R_bottom,
         mesh = np.dot(T, tmp).T
         del tmp
     ans = inv_weighted(data3D, mesh, col=2, ncp=ncp, num_sub=num_sub,
-            power_parameter=power_parameter)
+            power_parameter=power_parameter, method=method)
 
     z_mesh = mesh[:, 2]
     if ignore_bot_h is not None:
@@ -411,5 +560,6 @@ if __name__=='__main__':
                   [4., 4.],
                   [5., 5.]])
 
-    print(inv_weighted(a, b, num_sub=1, col=1, ncp=10))
+    print(inv_weighted(a, b, ncp=10))
+    print(inv_weighted(a, b, num_sub=1, col=1, ncp=10, method='slabs'))
 
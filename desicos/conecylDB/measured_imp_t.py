@@ -5,6 +5,8 @@ import numpy as np
 
 from desicos.abaqus.utils import vec_calc_elem_cg, index_within_linspace
 from desicos.constants import FLOAT
+from desicos.conecylDB import binary_store
+from desicos.conecylDB.interpolate import calc_inv_weights, apply_inv_weights
 
 def read_file(file_name,
               R_best_fit,
@@ -19,7 +21,7 @@ def read_file(file_name,
             print('WARNING! Because of the stretch_H option,')
             print('         consider setting z_offset_bot to None')
     # reading the imperfection file
-    mps = np.loadtxt(file_name, dtype=FLOAT)
+    mps = binary_store.load(file_name, dtype=FLOAT)
     t_set = set(mps[:, 3])
     # measuring model dimensions
     z_min = mps[:, 2].min()
@@ -72,7 +74,8 @@ def calc_elems_t(imperfection_file_name,
                  z_offset_bot,
                  num_closest_points,
                  power_parameter,
-                 num_sec_z):
+                 num_sec_z,
+                 method='kdtree'):
     # reading imperfection file
     m, mps, t_set_norm = read_file(file_name     = imperfection_file_name,
                                    R_best_fit    = R_best_fit,
@@ -95,64 +98,12 @@ def calc_elems_t(imperfection_file_name,
     mps[:, 0] *= R_local
     mps[:, 1] *= R_local
     mps[:, 3] *= t_model
-    num_sec_z = int(num_sec_z)
-    mem_limit = 1024*1024*1024*8*2    # 2 GB
-    mem_entries = int(mem_limit / 64) # if float64 is used
-    sec_size = int(nodes.shape[0]/num_sec_z)
-    #TODO better memory control...
-    if sec_size**2*10 > mem_entries:
-        while True:
-            num_sec_z +=1
-            sec_size = int(nodes.shape[0]/num_sec_z)
-            if sec_size**2*10 <= mem_entries:
-                print('WARNING - new sec_size %d' % sec_size)
-                break
-    ncp = num_closest_points
-    nodes = nodes[np.argsort(nodes[:, 2])]
-    mps = mps[np.argsort(mps[:, 2])]
+    indices, weights = calc_inv_weights(mps[:, :3], nodes[:, :3],
+            ncp=num_closest_points, power_parameter=power_parameter,
+            method=method, num_sub=num_sec_z, col=2)
     elems_t = np.zeros((nodes.shape[0], 2), dtype=nodes.dtype)
     elems_t[:, 0] = nodes[:, 3]
-    limit = int(num_sec_z/5)
-    for i in xrange(num_sec_z + 1):
-        i_inf = sec_size*i
-        i_sup = sec_size*(i+1)
-        if i % limit == 0:
-            print('\t processed % 7d out of % 7d entries' %
-                  (min(i_sup, nodes.shape[0]), nodes.shape[0]))
-        sub_nodes = nodes[i_inf : i_sup]
-        if not np.any(sub_nodes):
-            continue
-        inf_z = sub_nodes[:, 2].min()
-        sup_z = sub_nodes[:, 2].max()
-        c = 0
-        tol = 0.01
-        if i == 0 or i == num_sec_z:
-            tol = 0.05
-        while True:
-            cond1 = mps[:, 2] >= inf_z - tol*H_model
-            cond2 = mps[:, 2] <= sup_z + tol*H_model
-            cond = np.all(np.array((cond1, cond2)), axis=0)
-            sub_mps = mps[cond]
-            if not np.any(sub_mps):
-                tol += 0.01
-            else:
-                break
-        dist  = np.subtract.outer(sub_nodes[:, 0], sub_mps[:, 0])**2
-        dist += np.subtract.outer(sub_nodes[:, 1], sub_mps[:, 1])**2
-        dist += np.subtract.outer(sub_nodes[:, 2], sub_mps[:, 2])**2
-        a = np.argsort(dist, axis=1)
-        lenn = sub_nodes.shape[0]
-        lenp = sub_mps.shape[0]
-        a2 = a + np.meshgrid(np.arange(lenn)*lenp,
-                             np.arange(lenp))[0].transpose()
-        dist_ncp = np.take(dist, a2[:, :ncp])
-        dist_ncp[dist_ncp==0] == 1.e-9
-        thicks = sub_mps[:, 3]
-        thicks_ncp = np.take(thicks, a[:, :ncp])
-        total_weight = np.sum(1./dist_ncp**power_parameter, axis=1)
-        weight = 1./(dist_ncp**power_parameter)
-        elems_t[i_inf:i_sup, 1] = (
-                        np.sum(thicks_ncp*weight, axis=1)/total_weight)
+    elems_t[:, 1] = apply_inv_weights(indices, weights, mps[:, 3])
     elems_t = elems_t[np.argsort(elems_t[:, 1])]
     print('New thicknesses calculated!')
 
@@ -8,11 +8,13 @@ This module includes functions to read and write imperfection files.
 
 """
 import os
+from itertools import islice
 
 import numpy as np
 
 from desicos.constants import *
 from desicos.logger import *
+from desicos.conecylDB import binary_store
 from desicos.conecylDB.fit_data import best_fit_cylinder
 
 def read_theta_z_imp(path,
@@ -73,7 +75,7 @@ def read_theta_z_imp(path,
         mps = path
     else:
         log('Reading imperfection file: {0} ...'.format(path))
-        mps = np.loadtxt(path, dtype=FLOAT)
+        mps = binary_store.load(path, dtype=FLOAT)
 
     # measuring model dimensions
     z_min = mps[:, 1].min()
@@ -176,7 +178,7 @@ def read_xyz(path,
     if isinstance(path, np.ndarray):
         mps = path
     else:
-        mps = np.loadtxt(path, dtype=FLOAT)
+        mps = binary_store.load(path, dtype=FLOAT)
     r = np.sqrt(mps[:, 0]**2 + mps[:, 1]**2)
     # measuring model dimensions
     if R_best_fit is None:
@@ -210,7 +212,7 @@ def read_xyz(path,
     log('offset_z       : {0}'.format(offset_z))
     r_TOL_min = (R * (1-r_TOL/100.))
     r_TOL_max = (R * (1+r_TOL/100.))
-    cond = np.all(np.array((r > r_TOL_max,
+    cond = np.any(np.array((r > r_TOL_max,
                             r < r_TOL_min)), axis=0)
     skept = mps[cond]
     log('Skipping {0} points'.format(len(skept)))
@@ -332,7 +334,7 @@ def xyz2thetazimp(path,
                     save=False, sample_size=sample_size,
                     errorRtol=errorRtol)
             R_best_fit = out['R_best_fit']
-            input_pts = np.loadtxt(path, unpack=True)
+            input_pts = binary_store.load(path).T
             pts = np.vstack((input_pts, np.ones_like(input_pts[0, :])))
             x, y, z = out['T'].dot(pts)
             zmin = z.min()
@@ -387,6 +389,254 @@ def xyz2thetazimp(path,
     else:
         return mps
 
+def iter_chunks(path, chunk_size=1000000, dtype=FLOAT):
+    r"""Reads a text file with measured data in chunks
+
+    Parameters
+    ----------
+    path : str
+        The path to the text file.
+    chunk_size : int, optional
+        The maximum number of lines read at once.
+    dtype : str, optional
+        The data type of the returned arrays.
+
+    Returns
+    -------
+    chunks : generator
+        A generator of 2-D arrays with at most ``chunk_size`` rows each.
+
+    """
+    chunk_size = max(int(chunk_size), 1)
+    with open(path) as f:
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                break
+            chunk = np.loadtxt(lines, dtype=dtype, ndmin=2)
+            if chunk.shape[0] > 0:
+                yield chunk
+
+
+def sample_chunks(chunks, sample_size, seed=None):
+    r"""Takes a uniform random sample from a sequence of chunks
+
+    Only ``sample_size`` points are kept in memory at any time, such that
+    a sample of a file much larger than the available memory can be taken
+    reading it with :func:`.iter_chunks`.
+
+    Parameters
+    ----------
+    chunks : iterable
+        An iterable of 2-D arrays with the same number of columns.
+    sample_size : int
+        The number of points to be sampled.
+    seed : int or None, optional
+        The seed of the random number generator.
+
+    Returns
+    -------
+    sample : np.ndarray
+        A 2-D array with up to ``sample_size`` rows.
+
+    """
+    sample_size = int(sample_size)
+    rnd = np.random.RandomState(seed)
+    kept = None
+    kept_keys = None
+    for chunk in chunks:
+        keys = rnd.random_sample(chunk.shape[0])
+        if kept is not None:
+            chunk = np.vstack((kept, chunk))
+            keys = np.concatenate((kept_keys, keys))
+        if chunk.shape[0] > sample_size:
+            asort = np.argsort(keys)[:sample_size]
+            chunk = chunk[asort]
+            keys = keys[asort]
+        kept = chunk
+        kept_keys = keys
+    return kept
+
+
+def xyz2thetazimp_chunked(path,
+                          alphadeg_measured,
+                          H_measured,
+                          R_expected=10.,
+                          use_best_fit=True,
+                          sample_size=200000,
+                          best_fit_output=False,
+                          errorRtol=1.e-9,
+                          z_offset_bot=None,
+                          r_TOL=1.,
+                          clip_bottom=None,
+                          clip_top=None,
+                          outpath=None,
+                          fmt='%1.6f',
+                          rotatedeg=None,
+                          chunk_size=1000000):
+    r"""Transforms an imperfection file from the format "`x` `y` `z`"
+    to the format "`\theta` `z` `imp`" reading it in chunks
+
+    Same as :func:`.xyz2thetazimp`, but the input file is never completely
+    loaded in memory. The file is read twice using :func:`.iter_chunks`:
+    first to find the `z` limits of the transformed points, then to apply
+    the transformation, the radial filter and the clipping to each chunk,
+    which is immediately appended to the output file. The peak memory is
+    therefore bounded by ``chunk_size`` and ``sample_size``.
+
+    Parameters
+    ----------
+    path : str
+        The path to the imperfection file.
+    alphadeg_measured : float
+        The semi-vertex angle of the measured sample (it is ``0.`` for a
+        cylinder).
+    H_measured : float
+        The total height of the measured test specimen, including eventual
+        resin rings at the edges.
+    R_expected : float, optional
+        See :func:`.xyz2thetazimp`.
+    use_best_fit : bool, optional
+        See :func:`.xyz2thetazimp`.
+    sample_size : int, optional
+        The number of points sampled with :func:`.sample_chunks` in order to
+        calculate the best fit.
+    best_fit_output : bool, optional
+        If the output from the best fit routines should be also returned.
+    errorRtol : float, optional
+        The error tolerance for the best-fit radius to stop the iterations.
+    z_offset_bot : float, optional
+        The offset that should be used from the bottom of the measured points
+        to the bottom of the test specimen.
+    r_TOL : float, optional
+        The tolerance used to ignore points farer than ``r_TOL*R_best_fit``,
+        given in percent. Only used when ``use_best_fit=False``.
+    clip_bottom : float, optional
+        See :func:`.xyz2thetazimp`.
+    clip_top : float, optional
+        See :func:`.xyz2thetazimp`.
+    outpath : str, optional
+        The path to the output file. By default the name of the input file
+        with the suffix ``_theta_z_imp.txt`` is used, in the working
+        directory.
+    fmt : str or sequence of strs, optional
+        See ``np.savetxt()`` documentation for more details.
+    rotatedeg : float or None, optional
+        Rotation angle in degrees telling how much the imperfection pattern
+        should be rotated about the `X_3` (or `Z`) axis.
+    chunk_size : int, optional
+        The number of lines read at once.
+
+    Returns
+    -------
+    outpath : str
+        The path to the output file.
+
+    outpath, out : str, dict
+        If ``best_fit_output==True`` it returns ``(outpath, out)``, where
+        ``out`` is described in :func:`.best_fit_cylinder`.
+
+    """
+    out = None
+    T = None
+    if use_best_fit:
+        if alphadeg_measured != 0.:
+            raise NotImplementedError('Best fit available only for cylinders')
+        log('Sampling {0} points to find the best-fit ...'.format(
+            sample_size))
+        pts = sample_chunks(iter_chunks(path, chunk_size), sample_size)
+        out = best_fit_cylinder(pts[:, :3], R_expected=R_expected,
+                H=H_measured, save=False, errorRtol=errorRtol)
+        del pts
+        R_best_fit = out['R_best_fit']
+        T = out['T']
+    else:
+        R_best_fit = R_expected
+    r_TOL_min = R_best_fit*(1 - r_TOL/100.)
+    r_TOL_max = R_best_fit*(1 + r_TOL/100.)
+
+    def transform(chunk):
+        if T is not None:
+            pts = np.vstack((chunk[:, :3].T, np.ones_like(chunk[:, 0])))
+            x, y, z = T.dot(pts)
+            keep = np.ones(x.shape[0], dtype=bool)
+        else:
+            x, y, z = chunk[:, :3].T
+            r = np.sqrt(x**2 + y**2)
+            keep = (r >= r_TOL_min) & (r <= r_TOL_max)
+        return x, y, z, keep
+
+    log('Reading the data: first pass ...')
+    z_min = z_max = None
+    zk_min = zk_max = None
+    for chunk in iter_chunks(path, chunk_size):
+        x, y, z, keep = transform(chunk)
+        z_min = z.min() if z_min is None else min(z_min, z.min())
+        z_max = z.max() if z_max is None else max(z_max, z.max())
+        if np.any(keep):
+            zk = z[keep]
+            zk_min = zk.min() if zk_min is None else min(zk_min, zk.min())
+            zk_max = zk.max() if zk_max is None else max(zk_max, zk.max())
+    if z_min is None or zk_min is None:
+        raise ValueError('No valid points found in {0}'.format(path))
+    H_points = z_max - z_min
+    if z_offset_bot:
+        offset_z = z_offset_bot - z_min
+    else:
+        offset_z = (H_measured - H_points)/2. - z_min # centralizes the points
+    log('H_points       : {0}'.format(H_points))
+    log('offset_z       : {0}'.format(offset_z))
+
+    z_inf = None
+    z_sup = None
+    if clip_bottom:
+        z_inf = zk_min + offset_z + clip_bottom
+        log('Removing points with z <= {0:1.6f}'.format(z_inf))
+    if clip_top:
+        z_sup = zk_max + offset_z - clip_top
+        log('Removing points with z >= {0:1.6f}'.format(z_sup))
+
+    if outpath is None:
+        outpath = ('.'.join(os.path.basename(path).split('.')[:-1]) +
+                   '_theta_z_imp.txt')
+    log('Reading the data: second pass ...')
+    num_in = 0
+    num_out = 0
+    imp_min = imp_max = None
+    with open(outpath, 'wb') as f:
+        for chunk in iter_chunks(path, chunk_size):
+            num_in += chunk.shape[0]
+            x, y, z, keep = transform(chunk)
+            z = z + offset_z
+            if z_inf is not None:
+                keep &= (z > z_inf)
+            if z_sup is not None:
+                keep &= (z < z_sup)
+            x = x[keep]
+            y = y[keep]
+            z = z[keep]
+            if x.shape[0] == 0:
+                continue
+            theta = np.arctan2(y, x)
+            if rotatedeg is not None:
+                theta += np.deg2rad(rotatedeg)
+            imp = np.sqrt(x**2 + y**2) - R_best_fit
+            imp_min = imp.min() if imp_min is None else min(imp_min,
+                                                            imp.min())
+            imp_max = imp.max() if imp_max is None else max(imp_max,
+                                                            imp.max())
+            np.savetxt(f, np.vstack((theta, z, imp)).T, fmt=fmt)
+            num_out += x.shape[0]
+    log('Total of {0} points excluded.'.format(num_in - num_out), level=1)
+    log('Minimum imperfection: {0}'.format(imp_min))
+    log('Maximum imperfection: {0}'.format(imp_max))
+
+    if best_fit_output:
+        return outpath, out
+    else:
+        return outpath
+
+
 def xyzthick2thetazthick(path,
                          alphadeg_measured,
                          H_measured,
@@ -398,7 +648,8 @@ def xyzthick2thetazthick(path,
                          r_TOL=1.,
                          save=True,
                          fmt='%1.6f',
-                         rotatedeg=None):
+                         rotatedeg=None,
+                         best_fit_output=False):
     r"""Transforms an imperfection file from the format: "`x` `y` `z` `thick`"
     to the format "`\theta` `z` `thick`".
 
@@ -453,6 +704,11 @@ def xyzthick2thetazthick(path,
     rotatedeg : float or None, optional
         Rotation angle in degrees telling how much the imperfection pattern
         should be rotated about the `X_3` (or `Z`) axis.
+    best_fit_output : bool, optional
+        If the output from the best fit routines should be also returned. In
+        case ``True`` the output of this function will be a tuple with
+        ``(mps, out)``. For a description of ``out`` see
+        :func:`.best_fit_cylinder`.
 
     Returns
     -------
@@ -460,8 +716,12 @@ def xyzthick2thetazthick(path,
         A 2-D array with `\theta`, `z`, `imp` in the first, second
         and third columns, respectively.
 
+    mps, out : np.ndarray, dict
+        If ``best_fit_output==True`` it returns ``(mps, out)`` as described
+        above.
+
     """
-    inputa = np.loadtxt(path)
+    inputa = binary_store.load(path)
     if inputa.shape[1] != 4:
         raise ValueError('Input file does not have the format: "x y z thick"')
 
@@ -474,7 +734,7 @@ def xyzthick2thetazthick(path,
             out = best_fit_cylinder(xyz, R_expected=R_expected, H=H_measured,
                     save=False, sample_size=sample_size)
             R_best_fit = out['R_best_fit']
-            input_pts = np.loadtxt(path, unpack=True)[:, :3]
+            input_pts = xyz.T
             pts = np.vstack((input_pts, np.ones_like(input_pts[0, :])))
             x, y, z = out['T'].dot(pts)
             z -= z.min()
@@ -503,4 +763,7 @@ def xyzthick2thetazthick(path,
                    '_theta_z_thick.txt')
         np.savetxt(outpath, mps, fmt=fmt)
 
-    return mps
+    if best_fit_output:
+        return mps, out
+    else:
+        return mps
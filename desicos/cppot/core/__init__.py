@@ -11,5 +11,8 @@ Cone Virtual Material Model (:mod:`desicos.cppot.core`)
 .. automodule:: desicos.cppot.core.ply_model
     :members:
 
+.. automodule:: desicos.cppot.core.sweep
+    :members:
+
 """
 pass
@@ -526,6 +526,39 @@ class Polygon2D(tuple):
         # Odd number of crossings -> point is inside
         return (crossings % 2) == 1
 
+    def contains_points(self, x, y):
+        """Determine for many points if they are inside the polygon
+
+        Vectorized version of :meth:`contains_point`, using the same
+        algorithm.
+
+        Parameters
+        ----------
+        x : numpy array
+            X-coordinates of the points to test
+        y : numpy array
+            Y-coordinates of the points to test
+
+        Returns
+        -------
+        inside_polygon : numpy array
+            Boolean array, ``True`` for the points inside the polygon
+
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        crossings = np.zeros(x.shape, dtype=int)
+        for i in range(len(self)):
+            x1 = self[i-1].x - x
+            y1 = self[i-1].y - y
+            x2 = self[i].x - x
+            y2 = self[i].y - y
+            cross = ((y1 > 0) & (y2 <= 0)) | ((y1 < 0) & (y2 >= 0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cross &= x1 + y1*(x2 - x1)/(y1 - y2) >= 0
+            crossings += cross
+        return (crossings % 2) == 1
+
     def get_closed_line(self, num_points=1):
         """Get a closed line that can be used to plot this polygon.
 
@@ -9,6 +9,8 @@ Classes to create a virtual model of the ply pieces on an actual cone.
 
 """
 
+from bisect import bisect_right
+
 import numpy as np
 
 from desicos.constants import TOL
@@ -76,6 +78,8 @@ class PlyPieceModel(object):
         self.base_piece = None
         self.ply_pieces = []
         self._useful_polygon_cache = dict() # Cache for _useful_polygon
+        self._phi_breaks = None # Angular index, see _build_angular_index
+        self._phi_segments = None
 
     def construct_single_ply_piece(self, fraction=1.0):
         """Construct a single ply piece.
@@ -150,6 +154,47 @@ class PlyPieceModel(object):
             else:
                 current_phi += delta_phi
         assert not rest_piece_todo
+        self._build_angular_index()
+
+    def _build_angular_index(self):
+        # Build a sorted interval index over the angular limits of the ply
+        # pieces. The range [-pi, pi] is divided in segments at all the
+        # (wrapped) limits, and for each segment the pieces overlapping it
+        # are stored, keeping the order of self.ply_pieces
+        eps = 1e-9
+        intervals = []
+        for i, pp in enumerate(self.ply_pieces):
+            width = pp.phi_limit_max - pp.phi_limit_min
+            if width >= 2*np.pi:
+                intervals.append((-np.pi, np.pi, i))
+                continue
+            lo = wrap_to_pi(pp.phi_limit_min)
+            hi = lo + width
+            if hi <= np.pi:
+                intervals.append((lo, hi, i))
+            else:
+                intervals.append((lo, np.pi, i))
+                intervals.append((-np.pi, hi - 2*np.pi, i))
+        breaks = set([-np.pi, np.pi])
+        for lo, hi, i in intervals:
+            breaks.update((lo, hi))
+        breaks = sorted(breaks)
+        segments = []
+        for b0, b1 in zip(breaks[:-1], breaks[1:]):
+            segments.append(sorted(set(i for lo, hi, i in intervals
+                                       if lo - eps <= b1 and hi + eps >= b0)))
+        self._phi_breaks = breaks
+        self._phi_segments = segments
+
+    def _candidate_pieces(self, phi):
+        # Ply pieces that may contain a point at angle phi, in O(log P)
+        if getattr(self, '_phi_breaks', None) is None:
+            self._build_angular_index()
+        if not self._phi_segments:
+            return []
+        i = bisect_right(self._phi_breaks, phi) - 1
+        i = min(max(i, 0), len(self._phi_segments) - 1)
+        return [self.ply_pieces[j] for j in self._phi_segments[i]]
 
     def local_orientation(self, eta, zeta):
         """Determine the local fiber orientation at a given point. If the
@@ -174,11 +219,59 @@ class PlyPieceModel(object):
         """
         point = Point2D(eta, zeta)
         phi = point.angle()
-        for pp in self.ply_pieces:
+        for pp in self._candidate_pieces(phi):
             if pp.contains_point(point, phi):
                 return self.fiber_angle + pp.angle_deviation(point)
         return np.nan
 
+    def local_orientations(self, eta, zeta):
+        """Determine the local fiber orientation at many points at once.
+
+        Array-based version of :meth:`local_orientation`, giving the same
+        results. The points are sorted by their angle phi, such that each
+        ply piece is only tested against the points within its angular
+        limits ``phi_limit_min`` ... ``phi_limit_max``.
+
+        Parameters
+        ----------
+        eta : numpy array
+            Horizontal coordinates of the points, in the coordinate system of
+            the unfolded cone.
+        zeta : numpy array
+            Vertical coordinates of the points, in the coordinate system of
+            the unfolded cone.
+
+        Returns
+        -------
+        local_angles : numpy array
+            Local fiber angle at each given point, in degrees. NaN for the
+            points that are not inside any ply piece.
+
+        """
+        eta = np.asarray(eta, dtype=float)
+        zeta = np.asarray(zeta, dtype=float)
+        shape = eta.shape
+        eta = eta.ravel()
+        zeta = zeta.ravel()
+        phi = np.arctan2(zeta, eta)
+        order = np.argsort(phi)
+        phi_sorted = phi[order]
+        out = np.empty(phi.shape)
+        out.fill(np.nan)
+        todo = np.ones(phi.shape, dtype=bool)
+        for pp in self.ply_pieces:
+            cand = order[_angular_slice(phi_sorted, pp.phi_limit_min,
+                                        pp.phi_limit_max)]
+            cand = cand[todo[cand]]
+            if cand.shape[0] == 0:
+                continue
+            inside = pp.contains_points(eta[cand], zeta[cand], phi[cand])
+            hit = cand[inside]
+            out[hit] = self.fiber_angle + np.degrees(
+                    wrap_to_pi(pp.phi_nom - phi[hit]))
+            todo[hit] = False
+        return out.reshape(shape)
+
     def all_local_orientations(self, eta, zeta):
         """Determine the local fiber orientations of all plies at a point.
 
@@ -202,7 +295,8 @@ class PlyPieceModel(object):
         point = Point2D(eta, zeta)
         phi = point.angle()
         return len([self.fiber_angle + pp.angle_deviation(point)
-                for pp in self.ply_pieces if pp.contains_point(point, phi)])
+                for pp in self._candidate_pieces(phi)
+                if pp.contains_point(point, phi)])
 
     def local_num_pieces(self, eta, zeta):
         """Determine the local number of overlapping pieces at a given point.
@@ -718,3 +812,50 @@ class PlyPiece(object):
         if phi is not None and not angle_in_range(phi, self.phi_limit_min, self.phi_limit_max):
             return False
         return self.polygon.contains_point(point)
+
+    def contains_points(self, eta, zeta, phi=None):
+        """Check for many points if they are contained in this ply piece
+
+        Parameters
+        ----------
+        eta : numpy array
+            Horizontal coordinates of the points, in the coordinate system of
+            the unfolded cone.
+        zeta : numpy array
+            Vertical coordinates of the points, in the coordinate system of
+            the unfolded cone.
+        phi : numpy array, optional
+            Angles corresponding to the points.
+
+        Returns
+        -------
+        contains_points : numpy array
+            Boolean array, see :meth:`contains_point`.
+
+        """
+        if phi is None:
+            phi = np.arctan2(zeta, eta)
+        inside = angle_in_range(phi, self.phi_limit_min, self.phi_limit_max)
+        if inside.any():
+            inside[inside] = self.polygon.contains_points(eta[inside],
+                                                          zeta[inside])
+        return inside
+
+
+def _angular_slice(phi_sorted, phi_min, phi_max):
+    # Indices of the sorted angles (range [-pi, pi]) that may be within
+    # phi_min...phi_max, considering the (mod 2pi)-issues. A small margin is
+    # used, the exact check is done by angle_in_range
+    eps = 1e-9
+    n = phi_sorted.shape[0]
+    if phi_max - phi_min >= 2*np.pi - 2*eps:
+        return np.arange(n)
+    lo = wrap_to_pi(phi_min) - eps
+    hi = lo + (phi_max - phi_min) + 2*eps
+    i0 = np.searchsorted(phi_sorted, lo, side='left')
+    if hi <= np.pi:
+        i1 = np.searchsorted(phi_sorted, hi, side='right')
+        return np.arange(i0, i1)
+    i1 = np.searchsorted(phi_sorted, hi - 2*np.pi, side='right')
+    return np.concatenate((np.arange(i0, n), np.arange(0, min(i1, i0))))
+
@@ -0,0 +1,324 @@
+r"""
+===================================================
+Design Sweep (:mod:`desicos.cppot.core.sweep`)
+===================================================
+
+.. currentmodule:: desicos.cppot.core.sweep
+
+Evaluates the ply piece models of a grid of fiber angles, starting
+positions, maximum widths and width variations, as done by the CPPOT
+calculator, without depending on the GUI.
+
+The ratios of each configuration only depend on the base ply piece, such
+that the complete ply (:meth:`.PlyPieceModel.rebuild`) is not constructed.
+The grid is divided in chunks that are evaluated by a pool of worker
+processes, and the results are collected in a :class:`.ResultStore` in the
+order of the grid. The results are also kept in a cache, such that a sweep
+overlapping a previous one with the same cone geometry and ply piece shape
+only evaluates the new configurations.
+
+"""
+from __future__ import absolute_import
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from desicos.logger import warn
+from desicos.constants import FLOAT
+from desicos.cppot.core.ply_model import TrapezPlyPieceModel, \
+    Trapez2PlyPieceModel, RectPlyPieceModel
+
+
+RESULT_FIELDS = ('angle', 'start', 'width', 'var', 'Phi1', 'Phi2', 'Phi3',
+                 'Phi4', 'num_pieces', 'R_DoC', 'R_Aeff', 'R_cont',
+                 'R_SumAeff', 'R_total')
+
+Result = namedtuple('Result', RESULT_FIELDS)
+
+MODEL_CLASSES = {1: TrapezPlyPieceModel,
+                 2: Trapez2PlyPieceModel,
+                 3: RectPlyPieceModel}
+
+_cache = {}
+
+
+class ResultStore(object):
+    """Columnar store of the sweep results
+
+    The results are kept in a single array with one column for each name in
+    ``RESULT_FIELDS``. The methods :meth:`add`, :meth:`get` and :meth:`clear`
+    have the same behavior as in ``ResultHandle`` of the CPPOT GUI.
+
+    """
+    def __init__(self, capacity=1024):
+        self.data = np.zeros((capacity, len(RESULT_FIELDS)), dtype=FLOAT)
+        self.size = 0
+        self._results = None
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, num):
+        capacity = self.data.shape[0]
+        if self.size + num <= capacity:
+            return
+        capacity = max(2*capacity, self.size + num)
+        data = np.zeros((capacity, len(RESULT_FIELDS)), dtype=FLOAT)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+    def add(self, *args, **kwargs):
+        self.extend([Result(*args, **kwargs)])
+
+    def extend(self, rows):
+        """Appends many results, each one ordered as ``RESULT_FIELDS``"""
+        rows = np.asarray(rows, dtype=FLOAT).reshape(-1, len(RESULT_FIELDS))
+        self._reserve(rows.shape[0])
+        self.data[self.size:self.size + rows.shape[0]] = rows
+        self.size += rows.shape[0]
+        self._results = None
+
+    def column(self, name):
+        """Returns the values of one field of all the results as an array"""
+        return self.data[:self.size, RESULT_FIELDS.index(name)]
+
+    def get(self):
+        """Returns the results as a list of ``Result`` named tuples"""
+        if self._results is None:
+            self._results = [Result(*row)
+                             for row in self.data[:self.size].tolist()]
+        return self._results
+
+    def clear(self):
+        self.size = 0
+        self._results = None
+
+
+def build_model(cg, shape, angle, start, width, var, rebuild=True):
+    """Builds the ply piece model of one configuration
+
+    Parameters
+    ----------
+    cg : :class:`.ConeGeometry`
+        The cone geometry.
+    shape : int
+        The ply piece shape, ``1`` for :class:`.TrapezPlyPieceModel`, ``2``
+        for :class:`.Trapez2PlyPieceModel` and ``3`` for
+        :class:`.RectPlyPieceModel`.
+    angle, start, width, var : float
+        The fiber angle, starting position, maximum width and width
+        variation (eccentricity) of the ply pieces.
+    rebuild : bool, optional
+        If ``False`` only the base ply piece is constructed, which is
+        enough to evaluate the ratios of the configuration.
+
+    Returns
+    -------
+    model : :class:`.PlyPieceModel`
+        The ply piece model.
+
+    """
+    if not shape in MODEL_CLASSES:
+        raise ValueError('Invalid ply piece shape: {0}'.format(shape))
+    model = MODEL_CLASSES[shape](cg, angle, start, width, 0.0, var)
+    if rebuild:
+        model.rebuild()
+    else:
+        model.base_piece = model.construct_single_ply_piece()
+    return model
+
+
+def evaluate(cg, shape, angle, start, width, var):
+    """Evaluates the ratios of one configuration
+
+    Parameters
+    ----------
+    cg, shape, angle, start, width, var
+        See :func:`.build_model`.
+
+    Returns
+    -------
+    result : tuple
+        The values ordered as ``RESULT_FIELDS``.
+
+    """
+    try:
+        model = build_model(cg, shape, angle, start, width, var,
+                            rebuild=False)
+        Phi = model.corner_orientations()
+        num_pieces = model.num_pieces()
+        A_piece = model.ply_piece_area()
+        A_ply = A_piece * num_pieces
+
+        R_DoC = A_ply / cg.cone_area
+        Aeff = model.effective_area()[0]
+        R_Aeff = Aeff / A_piece
+        R_cont = model.ratio_continuous_fibers()
+    except ValueError as e:
+        raise ValueError('{0} (angle={1}, start={2}, width={3}, var={4})'
+                         .format(e, angle, start, width, var))
+    R_total = R_DoC * R_Aeff * R_cont
+    R_SumAeff = R_DoC * R_Aeff
+    return (angle, start, width, var, Phi[0], Phi[1], Phi[2], Phi[3],
+            num_pieces, R_DoC, R_Aeff, R_cont, R_SumAeff, R_total)
+
+
+def _evaluate_chunk(args):
+    cg, shape, points = args
+    return [evaluate(cg, shape, *point) for point in points]
+
+
+def grid(data_handle):
+    """Returns the configurations of a sweep
+
+    The starting positions of each fiber angle are limited to the values
+    where the origin line of the ply piece still intersects the circle
+    ``s1``.
+
+    Parameters
+    ----------
+    data_handle : object
+        An object with the ``angle``, ``start``, ``width`` and ``var``
+        parameters, each one with the methods ``steps()`` and
+        ``num_steps()`` and the attribute ``max_value``, and with the cone
+        geometry ``cg``, as the ``DataHandle`` of the CPPOT GUI.
+
+    Returns
+    -------
+    points : list
+        The ``(angle, start, width, var)`` tuples, ordered as in the nested
+        loops of the original calculator.
+
+    """
+    start = data_handle.start
+    start_max = start.max_value
+    widths = data_handle.width.steps()
+    variations = data_handle.var.steps()
+    points = []
+    try:
+        for angle in data_handle.angle.steps():
+            angle_rad = math.radians(angle)
+            s_start_max = start_max
+            if angle_rad != 0:
+                s_start_limit = data_handle.cg.s1 / math.sin(abs(angle_rad))
+                s_start_max = min(s_start_max, s_start_limit)
+            start.max_value = s_start_max
+            for s in start.steps():
+                for width in widths:
+                    for var in variations:
+                        points.append((angle, s, width, var))
+    finally:
+        start.max_value = start_max
+    return points
+
+
+def _cg_key(cg):
+    return (cg.H, cg.rbot, cg.alpharad, cg.extra_height)
+
+
+def iter_sweep(data_handle, store=None, processes=None, chunksize=200,
+               use_cache=True):
+    """Runs a sweep, periodically yielding the progress
+
+    The GUI consumes this generator to update its progress bar between the
+    chunks of results.
+
+    Parameters
+    ----------
+    data_handle : object
+        See :func:`.grid`. The ply piece shape is given by its ``shape``
+        attribute.
+    store : :class:`.ResultStore` or None, optional
+        Where the results are appended. A new store is created if ``None``.
+    processes : int or None, optional
+        The number of worker processes. All the CPUs are used if ``None``
+        and the configurations are evaluated in this process if ``1``.
+    chunksize : int, optional
+        The number of configurations sent at once to each worker.
+    use_cache : bool, optional
+        If the results of previous sweeps should be reused.
+
+    Yields
+    ------
+    num_done, num_calc, store : int, int, :class:`.ResultStore`
+        The number of evaluated configurations, the total number of
+        configurations and the store with the results evaluated so far.
+
+    """
+    if store is None:
+        store = ResultStore()
+    cg = data_handle.cg
+    shape = data_handle.shape
+    points = grid(data_handle)
+    num_calc = len(points)
+    key = (shape, _cg_key(cg))
+    cache = _cache.setdefault(key, {}) if use_cache else {}
+    todo = [p for p in points if not p in cache]
+    chunks = [(cg, shape, todo[i:i+chunksize])
+              for i in range(0, len(todo), chunksize)]
+
+    pool = None
+    if processes != 1 and len(chunks) > 1:
+        try:
+            from multiprocessing import Pool
+            pool = Pool(processes)
+        except (ImportError, OSError):
+            warn('Worker processes could not be started, '
+                 'evaluating the configurations sequentially', level=1)
+    if pool is None:
+        results = (_evaluate_chunk(chunk) for chunk in chunks)
+    else:
+        results = pool.imap(_evaluate_chunk, chunks)
+
+    pos = 0
+    try:
+        for rows in results:
+            for row in rows:
+                cache[row[:4]] = row
+            # the results are stored in the order of the grid, as soon as
+            # all the previous configurations are available
+            ready = []
+            while pos < num_calc and points[pos] in cache:
+                ready.append(cache[points[pos]])
+                pos += 1
+            store.extend(ready)
+            yield pos, num_calc, store
+        if pos < num_calc or num_calc == 0:
+            store.extend([cache[p] for p in points[pos:]])
+            pos = num_calc
+            yield pos, num_calc, store
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def sweep(data_handle, store=None, processes=None, chunksize=200,
+          use_cache=True, callback=None):
+    """Runs a sweep
+
+    Parameters
+    ----------
+    data_handle, store, processes, chunksize, use_cache
+        See :func:`.iter_sweep`.
+    callback : callable or None, optional
+        Called as ``callback(num_done, num_calc)`` after each chunk of
+        results.
+
+    Returns
+    -------
+    store : :class:`.ResultStore`
+        The results of all the configurations, ordered as in :func:`.grid`.
+
+    """
+    for num_done, num_calc, store in iter_sweep(data_handle, store,
+            processes=processes, chunksize=chunksize, use_cache=use_cache):
+        if callback is not None:
+            callback(num_done, num_calc)
+    return store
+
+
+def clear_cache():
+    """Clears the results kept from the previous sweeps"""
+    _cache.clear()
@@ -2,10 +2,10 @@
 
 import math
 import copy
-from collections import namedtuple
 
 from desicos.cppot.core.geom import ConeGeometry
 from desicos.constants import TOL
+from desicos.cppot.core.sweep import Result, ResultStore
 
 
 class DataParameter(object):
@@ -91,20 +91,6 @@ class DataHandle(object):
         return num_calc
 
 
-Result = namedtuple('Result', ['angle', 'start', 'width', 'var', 'Phi1',
-                               'Phi2', 'Phi3', 'Phi4', 'num_pieces', 'R_DoC',
-                               'R_Aeff' , 'R_cont', 'R_SumAeff', 'R_total'])
-
-class ResultHandle(object):
-    """TODO Document"""
-    def __init__(self):
-        self.results = []
-
-    def add(self, *args, **kwargs):
-        self.results.append(Result(*args, **kwargs))
-
-    def get(self):
-        return self.results
-
-    def clear(self):
-        self.results = []
+class ResultHandle(ResultStore):
+    """Results of the CPPOT calculator, see :class:`.ResultStore`"""
+    pass
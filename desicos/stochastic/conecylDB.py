@@ -2,21 +2,66 @@ import json
 import logging
 import copy
 import os
+from collections import OrderedDict
 import numpy as np
 
+class ImperfectionCache(object):
+	"""	Least recently used cache of the imperfection arrays, bounded by
+		their total size in bytes. The arrays are returned read-only
+	"""
+	def __init__(self,maxBytes=512*1024*1024):
+		self.maxBytes=maxBytes
+		self.data=OrderedDict()
+		self.nBytes=0
+
+	def clear(self):
+		self.data=OrderedDict()
+		self.nBytes=0
+
+	def load(self,fname,loader):
+		st=os.stat(fname)
+		key=(os.path.abspath(fname),st.st_size,st.st_mtime)
+		if key in self.data:
+			arr=self.data.pop(key)
+			self.data[key]=arr
+			return arr
+		arr=loader(fname)
+		arr.flags.writeable=False
+		self.data[key]=arr
+		self.nBytes+=arr.nbytes
+		while self.nBytes > self.maxBytes and len(self.data) > 1:
+			oldKey,oldArr=self.data.popitem(last=False)
+			self.nBytes-=oldArr.nbytes
+		return arr
+
+imperfectionCache=ImperfectionCache()
+
+def _writeJSON(fname,data):
+	tmpFile=fname+'.tmp'
+	fp=open(tmpFile,'w')
+	fp.writelines(json.dumps(data,indent=4))
+	fp.close()
+	if os.path.exists(fname):
+		os.remove(fname)
+	os.rename(tmpFile,fname)
+
 class ConeCylDB(object):
+	"""	The entries are indexed in conecylDB_index.json, next to the
+		configuration file, with the modification time and configuration
+		of each entry file. Only the entry files modified since the index
+		was written are parsed, and the entry objects are created on
+		first access
+	"""
 	def __init__(self,configFile='conecylDB.json'):
 		self.entries={}
 		self.paths={}
+		self.index={}
 		self.path=''
 		self.configFile=''
 		try:
 			fp=open(configFile,'r')
-			fd=''
-			for line in fp:
-				fd+=line
+			jd=json.load(fp)
 			fp.close()
-			jd=json.loads(fd)
 			self.version=jd['conecylDB']
 			self.files=jd['files']
 			self.configFile=configFile
@@ -29,6 +74,40 @@ class ConeCylDB(object):
 		except:
 			logging.warning('Can`t populate')
 
+	def _getIndexFile(self):
+		return os.path.splitext(self.configFile)[0]+'_index.json'
+
+	def _getEntryFile(self,name):
+		path=os.path.dirname(os.path.abspath(self.configFile))
+		return path+'/'+self.files[name]
+
+	def _indexEntry(self,name):
+		curFile=self._getEntryFile(name)
+		try:
+			mtime=os.stat(curFile).st_mtime
+		except OSError:
+			logging.warning(str(curFile)+' invalid')
+			self.index.pop(name,None)
+			return False
+		if name in self.index and self.index[name]['mtime'] == mtime:
+			return False
+		try:
+			fp=open(curFile,'r')
+			config=json.load(fp)
+			fp.close()
+		except:
+			logging.warning(str(curFile)+' invalid')
+			config={}
+		self.index[name]={'mtime':mtime,'config':config}
+		if name in self.entries:
+			self.entries[name].setConfig(config,curFile)
+		return True
+
+	def saveIndex(self):
+		try:
+			_writeJSON(self._getIndexFile(),self.index)
+		except:
+			logging.warning('Can not write to file: '+str(self._getIndexFile()))
 
 	def update(self):
 		try:
@@ -38,36 +117,114 @@ class ConeCylDB(object):
 		except:
 			logging.warning('Can not write to file: '+str(self.configFile))
 			return
-	
+		changed=False
+		for f in self.files.keys():
+			changed=self._indexEntry(f) or changed
+		if changed:
+			self.saveIndex()
+
+	def commit(self,names):
+		"""	Writes the configuration files of the entries in names and
+			then conecylDB.json, in one transaction: all files are first
+			written to temporary files, and only if all of them could be
+			written they replace the existing ones. The imperfection files
+			saved with update=False are renamed first, such that no
+			configuration file points to a missing file
+		"""
+		tmpFiles=[]
+		try:
+			for name in names:
+				entry=self.entries[name]
+				tmpFiles.append((entry.configFile+'.tmp',entry.configFile,
+								 entry.config))
+			tmpFiles.append((self.configFile+'.tmp',self.configFile,
+							 {'conecylDB':self.version, 'files':self.files}))
+			for tmpFile,outFile,config in tmpFiles:
+				fp=open(str(tmpFile),'w')
+				fp.writelines(json.dumps(config,indent=4))
+				fp.close()
+		except:
+			logging.warning('Can not write to conecylDB: '+str(self.configFile))
+			for tmpFile,outFile,config in tmpFiles:
+				if os.path.exists(tmpFile):
+					os.remove(tmpFile)
+			self.discard(names)
+			return False
+		for name in names:
+			self.entries[name].commitImperfections()
+		for tmpFile,outFile,config in tmpFiles:
+			if os.path.exists(outFile):
+				os.remove(outFile)
+			os.rename(tmpFile,outFile)
+		for name in names:
+			self.index.pop(name,None)
+			self._indexEntry(name)
+		self.saveIndex()
+		return True
+
+	def discard(self,names):
+		"""	Removes the entries in names that were not committed, and the
+			temporary imperfection files saved for them
+		"""
+		for name in names:
+			entry=self.entries.get(name)
+			if entry is None:
+				continue
+			entry.discardImperfections()
+			if not name in self.index:
+				del self.entries[name]
+				self.files.pop(name,None)
 
 	def populate(self):
+		if not self.index:
+			try:
+				fp=open(self._getIndexFile(),'r')
+				self.index=json.load(fp)
+				fp.close()
+			except:
+				self.index={}
+		changed=False
+		for f in list(self.index.keys()):
+			if f not in self.files:
+				del self.index[f]
+				changed=True
 		for f in self.files.keys():
-			path=os.path.dirname(os.path.abspath(self.configFile))
-			curFile=path+'/'+self.files[f]
-			self.entries[f]=ConeCylDBEntry(f)
-			self.entries[f].setConfigFromFile(curFile)
+			changed=self._indexEntry(f) or changed
 			self.paths[f]=os.path.dirname(os.path.abspath(self.files[f]))
-
-	def copy(self,oldName,newName):
-		self.entries[newName]=copy.copy(self.entries[oldName])
+		if changed:
+			self.saveIndex()
+
+	def copy(self,oldName,newName,update=True):
+		"""	With update=False nothing is written to disk until commit()
+		"""
+		self.entries[newName]=copy.copy(self.getEntry(oldName))
+		self.entries[newName].config=copy.deepcopy(self.getEntry(oldName).config)
 		self.entries[newName].name=newName
+		self.entries[newName].pendingFiles=[]
 		self.entries[newName].config['name']=newName
 		oldConfigFile=self.entries[newName].configFile
 		oldBasename=os.path.basename(oldConfigFile)
 		newConfigFile=oldConfigFile.replace(oldBasename,newName+'.json')
 		self.entries[newName].configFile=str(newConfigFile)
-		self.entries[newName].update()
 		self.files[newName]=os.path.relpath(newConfigFile,self.path)
-		self.update()
+		if update:
+			self.entries[newName].update()
+			self.update()
 
 	def getEntry(self,key):
-		if key in self.entries.keys():
+		if key in self.entries:
 			return self.entries[key]
+		elif key in self.index:
+			entry=ConeCylDBEntry(key)
+			entry.setConfig(copy.deepcopy(self.index[key]['config']),
+							self._getEntryFile(key))
+			self.entries[key]=entry
+			return entry
 		else:
 			return None
 
 	def getEntryList(self):
-		return self.entries.keys()
+		return list(set(self.index.keys()) | set(self.entries.keys()))
 
 
 class ConeCylDBEntry(object):
@@ -77,6 +234,9 @@ class ConeCylDBEntry(object):
 		self.config={}
 		self.configFile=''
 		self.abspath=''
+		# (temporary name, final name) of the imperfection files saved
+		# with update=False, renamed by commitImperfections()
+		self.pendingFiles=[]
 
 	def update(self):
 		try:
@@ -99,17 +259,17 @@ class ConeCylDBEntry(object):
 		self.config[key]=val
 
 		
+	def setConfig(self,config,configFile):
+		self.config=config
+		self.configFile=configFile
+		self.abspath=os.path.dirname(os.path.abspath(configFile))
+
 	def setConfigFromFile(self,configFile):
 		try:
 			fp=open(configFile,'r')
-			fd=''
-			for line in fp:
-				fd+=line
+			jd=json.load(fp)
 			fp.close()
-			jd=json.loads(fd)
-			self.config=jd
-			self.configFile=configFile
-			self.abspath=os.path.dirname(os.path.abspath(configFile))
+			self.setConfig(jd,configFile)
 		except:
 			logging.warning(str(configFile)+' invalid')
 			return
@@ -123,60 +283,79 @@ class ConeCylDBEntry(object):
 	def getGeometry(self):
 		return (self.getProperty('H'),self.getProperty('R'),self.getProperty('alpha'))
 
-	def getGeometricImperfection(self):
-		inType=type(self.getProperty('imp_geom')) 
-		if not inType in [unicode, str]:
-			return self.getProperty('imp_geom')
-		else:
-			return np.loadtxt(self.abspath+'/'+self.getProperty('imp_geom'))
-		
-	
-	def getThicknessImperfection(self):
-		inType=type(self.getProperty('imp_thick')) 
+	def getImperfectionFile(self,key):
+		fname=self.getProperty(key)
+		if type(fname) in [unicode, str]:
+			return self.abspath+'/'+fname
+		return None
+
+	def _loadImperfection(self,key):
+		inType=type(self.getProperty(key))
 		if not inType in [unicode, str]:
-			return self.getProperty('imp_thick')
+			return self.getProperty(key)
+		fname=self.abspath+'/'+self.getProperty(key)
+		if fname.endswith('.npy'):
+			return imperfectionCache.load(fname,np.load)
 		else:
-			return np.loadtxt(self.abspath+'/'+self.getProperty('imp_thick'))
-			
-	def setGeometricImperfection(self,data,name=None):
-		if type(data) in [str,unicode]:
-			self.setProperty('imp_geom',data)
+			return imperfectionCache.load(fname,np.loadtxt)
+
+	def _saveImperfection(self,key,data,binary,pending=False):
+		outPath=self.abspath+'/'+self.name
+		if not os.path.exists(outPath):
+			os.mkdir(outPath)
+		if binary:
+			ext='.npy'
 		else:
-			outPath=self.abspath+'/'+self.name
-			if not os.path.exists(outPath):
-				os.mkdir(outPath)
-			outFile=outPath+'/'+self.name+'_imp_geom.txt'
-			np.savetxt(outFile,data)
-			self.setProperty('imp_geom',self.name+'/'+self.name+'_imp_geom.txt')
-		self.update()
-		
-			
-	def setThicknessImperfection(self,data,name=None):
-		if type(data) in [str,unicode]:
-			self.setProperty('imp_thick',data)
+			ext='.txt'
+		outName=self.name+'_'+key+ext
+		outFile=outPath+'/'+outName
+		if pending:
+			outFile+='.tmp'
+			self.pendingFiles=self.pendingFiles+[(outFile,outPath+'/'+outName)]
+		if binary:
+			# a file object, such that np.save() does not add .npy
+			fp=open(outFile,'wb')
+			np.save(fp,data)
+			fp.close()
 		else:
-			outPath=self.abspath+'/'+self.name
-			if not os.path.exists(outPath):
-				os.mkdir(outPath)
-			outFile=outPath+'/'+self.name+'_imp_thick.txt'
 			np.savetxt(outFile,data)
-			self.setProperty('imp_geom',self.name+'/'+self.name+'_imp_thick.txt')
-		self.update()
-	
-
-
-
-
-
-
-
-
-
-
-
-
+		self.setProperty(key,self.name+'/'+outName)
+
+	def commitImperfections(self):
+		for tmpFile,outFile in self.pendingFiles:
+			if os.path.exists(outFile):
+				os.remove(outFile)
+			os.rename(tmpFile,outFile)
+		self.pendingFiles=[]
+
+	def discardImperfections(self):
+		for tmpFile,outFile in self.pendingFiles:
+			if os.path.exists(tmpFile):
+				os.remove(tmpFile)
+			try:
+				os.rmdir(os.path.dirname(tmpFile))
+			except OSError:
+				pass
+		self.pendingFiles=[]
 
+	def getGeometricImperfection(self):
+		return self._loadImperfection('imp_geom')
 
+	def getThicknessImperfection(self):
+		return self._loadImperfection('imp_thick')
 
+	def setGeometricImperfection(self,data,name=None,binary=False,update=True):
+		if type(data) in [str,unicode]:
+			self.setProperty('imp_geom',data)
+		else:
+			self._saveImperfection('imp_geom',data,binary,pending=not update)
+		if update:
+			self.update()
 
-	
+	def setThicknessImperfection(self,data,name=None,binary=False,update=True):
+		if type(data) in [str,unicode]:
+			self.setProperty('imp_thick',data)
+		else:
+			self._saveImperfection('imp_thick',data,binary,pending=not update)
+		if update:
+			self.update()
@@ -24,6 +24,31 @@ def getImperfectionArray(tht,z,IM,fx,fy):
     X,Y=np.meshgrid(fx,fy)
     return griddata( (tht,z),IM,(X,Y),method='linear')
 
+def getImperfectionArrayKDTree(tht,z,IM,fx,fy,ncp=4):
+    """    Same as getImperfectionArray, using an inverse distance weighting
+        of the ncp closest points instead of a Delaunay triangulation.
+        Grid rows outside the measured z range are NaN, as they would be
+        outside the convex hull of the linear interpolation
+    """
+    from scipy.spatial import cKDTree
+    X,Y=np.meshgrid(fx,fy)
+    # theta and z normalized such that both directions have the same weight
+    sx=(fx[-1]-fx[0]) or 1.0
+    sy=(fy[-1]-fy[0]) or 1.0
+    tree=cKDTree(np.vstack((tht/sx,z/sy)).T)
+    pts=np.vstack((X.ravel()/sx,Y.ravel()/sy)).T
+    dist,ind=tree.query(pts,k=ncp)
+    if ncp == 1:
+        dist,ind=dist[:,None],ind[:,None]
+    with np.errstate(divide='ignore'):
+        w=1.0/dist**2
+    exact=np.isinf(w).any(axis=1)
+    w[exact]=np.isinf(w[exact])
+    res=(w*IM[ind]).sum(axis=1)/w.sum(axis=1)
+    yi=Y.ravel()
+    res[(yi<z.min()) | (yi>z.max())]=np.nan
+    return res.reshape(X.shape)
+
 
 def getImperfectionArray3D(data,nx,ny,H,RB,RT=None):
     if RT is None:
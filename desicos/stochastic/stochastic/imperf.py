@@ -30,9 +30,14 @@ class Samples(object):
         self.fxRange=(0.0,0.1)
         self.fyRange=(0.0,0.1)
         self.indata=[]
-        self.data=[]
         self.outdata=[]
         self.nSamples=0
+        # zero padding of the FFT, relative to the next power of 2
+        self.padFactor=16
+        # if False the inputs are not kept in memory, only the accumulated
+        # mean, variance and power spectrum
+        self.keepInputs=True
+        self._accFil=None
         #self.fil=('hamming',(0.53836,-0.46164,0.53836,-0.46164) )#  ('trapezoid',(0.1,0.1))
         self.fil=('none',())
         self.strFacts=[StructurePattern()]
@@ -44,7 +49,16 @@ class Samples(object):
         return self.fil[0]
 
     def getInputsCount(self):
-        return len(self.indata)
+        return self.nSamples
+
+    def setPadFactor(self,val):
+        self.padFactor=int(val)
+
+    def setKeepInputs(self,val):
+        if self.nSamples > 0 and bool(val) != self.keepInputs:
+            logging.warning('setKeepInputs must be called before addData!')
+            return
+        self.keepInputs=bool(val)
 
     def getFilter(self):
         return self.winFilter
@@ -76,26 +90,61 @@ class Samples(object):
             Data must lie on same regular grid as first data, you input.
             If not, this method will not add such input into buffer for
             futher processing
+            The mean, variance and power spectrum are accumulated here one
+            input at a time, such that with keepInputs=False the inputs
+            do not need to be kept in memory.
         """
-        self.nSamples+=1
-        if self.nSamples == 1:
-            self.indata.append(data)
+        if self.nSamples == 0:
             (self.ny,self.nx)=data.shape
             self.ny=int(data.shape[0])
             self.x=x
             self.y=y
             self.lx=self.x[-1:][0]
             self.ly=self.y[-1:][0]
-
-
+            self._resetAccumulators(data)
         else:
-            if data.shape == self.indata[0].shape and x.all() == self.x.all() and y.all() == self.y.all():
-                self.indata.append(data)
-            else:
+            if not (data.shape == (self.ny,self.nx) and x.all() == self.x.all() and y.all() == self.y.all()):
                 logging.warning('Inconsistent data input!')
                 logging.warning("Check data shape and X,Y sampling!")
+                return
+        self.nSamples+=1
+        if self.keepInputs:
+            self.indata.append(data)
+        self._accumulate(data)
 
+    def _getFFTShape(self):
+        nFFT1 = self.padFactor*2**nextpow2(self.nx)
+        nFFT2 = self.padFactor*2**nextpow2(self.ny)
+        return nFFT1,nFFT2
 
+    def _getWindow(self):
+        FilterWindows2D.setInputArray(self.y,self.x)
+        return FilterWindows2D.filters[self.fil[0]]( *self.fil[1]  )
+
+    def _resetAccumulators(self,ref):
+        # the inputs are accumulated relative to the first one, which
+        # avoids the cancellation in sum(d**2)/n - (sum(d)/n)**2
+        self._ref=np.array(ref,dtype=float)
+        self._accFil=(self.fil,self.padFactor)
+        self._win=self._getWindow()
+        nFFT1,nFFT2=self._getFFTShape()
+        self._n=0
+        self._sum=np.zeros(self._ref.shape)
+        self._sumSq=np.zeros(self._ref.shape)
+        self._sumPow=np.zeros((nFFT1//2,nFFT2//2))
+
+    def _windowedPower(self,d):
+        nFFT1,nFFT2=self._getFFTShape()
+        z=np.fft.rfft2(d*self._win,s=[nFFT1,nFFT2])
+        z=z[0:nFFT1//2,0:nFFT2//2]
+        return z.real**2+z.imag**2
+
+    def _accumulate(self,data):
+        d=data-self._ref
+        self._n+=1
+        self._sum+=d
+        self._sumSq+=d**2
+        self._sumPow+=self._windowedPower(d)
     def cutFrequences(self):
         fxMaxPres=0.0
         fyMaxPres=0.0
@@ -136,41 +185,35 @@ class Samples(object):
 
 
     def compute(self):
-        if len(self.indata) < 2:
+        if self.nSamples < 2:
             logging.warning("insufficient input count!")
             return
-        FilterWindows2D.setInputArray(self.y,self.x)
-        self.winFilter=FilterWindows2D.filters[self.fil[0]]( *self.fil[1]  )
-        self.aveFunc=np.zeros(self.indata[0].shape)
-        self.eW=np.zeros(self.indata[0].shape)
-
-        for data in self.indata:
-            self.aveFunc+=data/self.nSamples
-
-        for i in range(len(self.indata)):
-            self.data.append(self.indata[i]-self.aveFunc)
-            self.eW+= (self.data[i]**2.0)/self.nSamples
-
-        for i in range(len(self.data)):
-            self.data[i]=self.data[i]*self.winFilter
+        if self._accFil != (self.fil,self.padFactor):
+            if self.keepInputs:
+                # filter or padding changed, the inputs are streamed again
+                self._resetAccumulators(self.indata[0])
+                for data in self.indata:
+                    self._accumulate(data)
+            else:
+                logging.warning('Filter and padding cannot be changed after'
+                                ' adding data with keepInputs=False!')
+                (self.fil,self.padFactor)=self._accFil
+        self.winFilter=self._win
+        n=self._n
+        mean=self._sum/n
+        self.aveFunc=self._ref+mean
+        self.eW=np.maximum(self._sumSq/n-mean**2,0.)
 
-        nFFT1 = 16*2**nextpow2(self.nx)
-        nFFT2 = 16*2**nextpow2(self.ny)
+        nFFT1,nFFT2=self._getFFTShape()
 
-        a1 = nFFT1/2
-        a2 = nFFT2/2
-        a2Mod = nFFT2/8/2
+        a1 = nFFT1//2
+        a2 = nFFT2//2
 
         self.a1=a1
         self.a2=a2
-        self.sh=np.zeros((a1,a2))
-
-        for data in self.data:
-            z=np.fft.fft2(data,s=[nFFT1,nFFT2])
-#            z=scipy.fftpack.fft2(data,shape=[nFFT1,nFFT2])
-            trans= (np.abs(z)**2) / (nFFT1*nFFT2)
-            self.sh+=trans[0:a1,0:a2]/self.nSamples
-            self.trans=trans
+        # sum|F(w*(d_i-m))|**2 = sum|F(w*d_i)|**2 - n*|F(w*m)|**2
+        self.sh=(self._sumPow-n*self._windowedPower(mean))/(n*nFFT1*nFFT2)
+        self.sh=np.maximum(self.sh,0.)
 
         dfx=self.lx/(self.nx-1)
         dfy=self.ly/(self.ny-1)
@@ -202,47 +245,65 @@ class Samples(object):
 
 
 
-    def getNewSample(self):
-        x=self.x
-        y=self.y
-        eW=self.eW
-        bruch=self.bruch
-        fxIn=self.fxIn
-        fyIn=self.fyIn
-        res=np.zeros((self.ny,self.nx))
-        phi1=np.zeros(self.shMod.shape)
-        phi2=np.zeros(self.shMod.shape)
-        sqrt2=np.sqrt(2.)
-#        bruch=np.loadtxt('stochastic/bruch',delimiter=',')
-
-        for i in range(1,self.shMod.shape[0]):
-            for j in range(1,self.shMod.shape[1]):
-                phi1[i][j]=2*np.pi*np.random.rand()
-                phi2[i][j]=2*np.pi*np.random.rand()
-#        phi1=np.loadtxt('stochastic/phi1',delimiter=',')
-#        phi2=np.loadtxt('stochastic/phi2',delimiter=',')
-
-        dfx=fxIn[1].copy()
-        dfy=fyIn[1].copy()
-
-        for iy in range(0,self.ny):
-            for ix in range(0,self.nx):
-                for n1 in range(1,self.shMod.shape[0]):
-                    for n2 in range(1,self.shMod.shape[1]):
-                        A1=np.sqrt(2.0*eW[iy][ix]*bruch[n1][n2]*dfx*dfy)
-
-                        res[iy][ix]+=sqrt2*(A1*np.cos(fxIn[n1]*x[ix]+fyIn[n2]*y[iy]+phi1[n1][n2])+ \
-                                        A1*np.cos(fxIn[n1]*x[ix]-fyIn[n2]*y[iy]+phi2[n1][n2]))
-        res+=self.aveFunc
-        self._tmp_res=res.copy()
-        self._tmp_pat=np.zeros(self._tmp_res.shape)
-        for strFact in self.strFacts:
-            strFact.connectOutputArray(res)
-            pat=strFact.getPattern()
-
-            res+=pat
-            self._tmp_pat+=pat
-
-        return res
-
+    def _getRandomState(self,seed):
+        if seed is None:
+            return np.random
+        if isinstance(seed,(int,np.integer)):
+            return np.random.RandomState(seed)
+        # np.random.RandomState or np.random.Generator instance
+        return seed
 
+    def _getNewSampleRaw(self,rs):
+        """    Spectral representation of one new sample, without the mean
+            function and the structure patterns
+        """
+        n1,n2=self.shMod.shape
+        # drawn in the same order as the phase angles of the original
+        # nested loops: phi1[1][1], phi2[1][1], phi1[1][2], ...
+        phi=2*np.pi*rs.uniform(0.,1.,size=(n1-1,n2-1,2))
+        dfx=self.fxIn[1]
+        dfy=self.fyIn[1]
+        # A1=sqrt(eW)*B, with eW factored out of the sum over frequencies
+        B=np.sqrt(2.0*self.bruch[1:,1:]*dfx*dfy)
+        C1=B*np.exp(1j*phi[:,:,0])
+        C2=B*np.exp(1j*phi[:,:,1])
+        Ex=np.exp(1j*np.outer(self.x,self.fxIn[1:]))
+        Ey=np.exp(1j*np.outer(self.y,self.fyIn[1:]))
+        # sum over n2 of both cosine terms for each y and n1
+        M=np.dot(Ey,C1.T)+np.dot(Ey.conj(),C2.T)
+        res=np.dot(M,Ex.T).real
+        return np.sqrt(2.)*np.sqrt(self.eW)*res
+
+    def getNewSample(self,seed=None,count=None):
+        """    Generates new stochastic samples.
+
+            seed: None to use the global numpy random state, an int, or
+            a np.random.RandomState/np.random.Generator instance, used to
+            draw the random phase angles.
+            count: None to return a single (ny,nx) sample, or the number
+            of samples K to return as a (K,ny,nx) array.
+            With the same random state, the k-th sample of a batch is
+            the same as the one of the k-th consecutive call.
+        """
+        rs=self._getRandomState(seed)
+        if count is None:
+            nOut=1
+        else:
+            nOut=int(count)
+        out=np.zeros((nOut,self.ny,self.nx))
+        for k in range(nOut):
+            res=out[k]
+            res+=self._getNewSampleRaw(rs)
+            res+=self.aveFunc
+            self._tmp_res=res.copy()
+            self._tmp_pat=np.zeros(self._tmp_res.shape)
+            for strFact in self.strFacts:
+                strFact.connectOutputArray(res)
+                pat=strFact.getPattern()
+
+                res+=pat
+                self._tmp_pat+=pat
+
+        if count is None:
+            return out[0]
+        return out
@@ -4,6 +4,7 @@ import numpy.ma as ma
 import copy
 import time
 import sys
+import os
 #sys.path.append( '/home/pavel/Documents/desicos/abaqus-conecyl-python_DEV')
 from  st_utils.coords import *
 from imperf import Samples
@@ -17,6 +18,9 @@ class SamplesCC(Samples):
         self.scalingFactor=1.0
         self.samplingRadial=256
         self.samplingAxial=128
+        # 'linear': Delaunay triangulation, 'kdtree': closest points
+        self.griddingMethod='linear'
+        self.useGridCache=True
         if conecylDBFile is not None:
             self.ccdb=ConeCylDB(conecylDBFile)
         else:
@@ -30,6 +34,12 @@ class SamplesCC(Samples):
     def setAxialSampling(self,val):
         self.samplingAxial=val
 
+    def setGriddingMethod(self,method):
+        if method not in ('linear','kdtree'):
+            logging.warning('Unknown gridding method: '+str(method))
+            return
+        self.griddingMethod=method
+
     def setOutputName(self,name):
         self.outName=name
 
@@ -58,6 +68,19 @@ class SamplesCC(Samples):
             return
 
 
+        if self.imp_type == 'ms':
+            prop='imp_geom'
+        if self.imp_type == 'thick':
+            prop='imp_thick'
+        (H,R,alpha)=IMP.getGeometry()
+        srcFile=IMP.getImperfectionFile(prop)
+        if (srcFile is not None and self.useGridCache
+            and os.path.isfile(srcFile)):
+            if self._importFromGridCache(srcFile,H,R,alpha):
+                return
+        else:
+            srcFile=None
+
         if self.imp_type == 'ms':
             b=IMP.getGeometricImperfection()
         if self.imp_type == 'thick':
@@ -65,11 +88,48 @@ class SamplesCC(Samples):
         if b is None:
             logging.warning(str(imp_name)+" with imperfection "+str(imp_type)+" is not in IMPERFECTION database!")
             return
-        (H,R,alpha)=IMP.getGeometry()
-        self.importFromXYZ(b,H,R,alpha)
+        self.importFromXYZ(b,H,R,alpha,srcFile)
 
+    def _getGridCacheKey(self,srcFile,H,RB,alpha):
+        st=os.stat(srcFile)
+        return repr((self.griddingMethod,self.imp_type,self.samplingRadial,
+                     self.samplingAxial,float(H),float(RB),float(alpha),
+                     st.st_size,st.st_mtime))
 
-    def importFromXYZ(self,b,H,RB,alpha):
+    def _getGridCacheFile(self,srcFile):
+        return os.path.splitext(srcFile)[0]+'_grid.npz'
+
+    def _importFromGridCache(self,srcFile,H,RB,alpha):
+        cacheFile=self._getGridCacheFile(srcFile)
+        if not os.path.isfile(cacheFile):
+            return False
+        try:
+            tmp=np.load(cacheFile)
+            key=str(tmp['key'])
+            IMPERF,ft,fz=tmp['IMPERF'],tmp['ft'],tmp['fz']
+            tmp.close()
+        except:
+            logging.warning('Invalid grid cache: '+str(cacheFile))
+            return False
+        if key != self._getGridCacheKey(srcFile,H,RB,alpha):
+            return False
+        logging.info('Using grid cache: '+str(cacheFile))
+        self.setGeometry(RB,H,alpha)
+        self.addData(IMPERF,ft,fz)
+        return True
+
+    def _saveGridCache(self,srcFile,H,RB,alpha,IMPERF,ft,fz):
+        cacheFile=self._getGridCacheFile(srcFile)
+        try:
+            np.savez(cacheFile,key=self._getGridCacheKey(srcFile,H,RB,alpha),
+                     IMPERF=IMPERF,ft=ft,fz=fz)
+        except:
+            logging.warning('Can not write grid cache: '+str(cacheFile))
+
+    def importFromXYZ(self,b,H,RB,alpha,srcFile=None):
+        """    Grids the scattered points of b on the (theta, z) grid.
+            If srcFile is given the gridded data is cached next to it
+        """
         RT=RB-H *( np.tan(alpha ) )
         x,y,z=b[:,0],b[:,1],b[:,2]
         r,tht,z=rec2cyl(x,y,z)
@@ -80,8 +140,8 @@ class SamplesCC(Samples):
         else:
             imp=getGeomImperfection(r,z,rPerf)
 
-        tm1=ma.masked_less(tht,0.1*np.pi).mask
-        tm2=ma.masked_greater(tht,1.9*np.pi).mask
+        tm1=tht < 0.1*np.pi
+        tm2=tht > 1.9*np.pi
 
         tht=np.hstack((tht, np.pi*2.0+tht[tm1],  0.0+(-1.0)*tht[tm2]))
         r=np.hstack((r,r[tm1],r[tm2] ))
@@ -90,26 +150,25 @@ class SamplesCC(Samples):
 
         ft=np.linspace(0,2.0*np.pi,self.samplingRadial)
         fz=np.linspace(0,H,self.samplingAxial)
-        IMPERF=getImperfectionArray(tht,z,imp,ft,fz)
+        if self.griddingMethod == 'kdtree':
+            IMPERF=getImperfectionArrayKDTree(tht,z,imp,ft,fz)
+        else:
+            IMPERF=getImperfectionArray(tht,z,imp,ft,fz)
 
-        mf=[]
-        for row in IMPERF[0:len(IMPERF)]:
-            mf.append( np.isnan(np.sum(row))  )
-        row1=mf.index(False)
-        mr=[]
-        for i in reversed(mf):
-            mr.append(i)
-        row2= len(mf)-1-mr.index(False)
+        mf=np.isnan(IMPERF).any(axis=1)
+        valid=np.flatnonzero(~mf)
+        row1=valid[0]
+        row2=valid[-1]
 
         row1+=1
         row2-=2
         dr1=row1
-        rows1=range(0,row1)
-        rows1sym=range(row1,row1+dr1)[::-1]
+        rows1=np.arange(0,row1)
+        rows1sym=np.arange(row1,row1+dr1)[::-1]
 
         dr2=len(mf)-1-row2
-        rows2=range(len(mf)-1,row2,-1)
-        rows2sym=range(row2-dr2,row2)[::-1]
+        rows2=np.arange(len(mf)-1,row2,-1)
+        rows2sym=np.arange(row2-dr2,row2)[::-1]
 
         IMPERF[rows1]=IMPERF[rows1sym].copy()
         IMPERF[rows2]=IMPERF[rows2sym].copy()
@@ -118,10 +177,14 @@ class SamplesCC(Samples):
         #IMPERF[0:row1]=IMPERF[row1]
         #IMPERF[row2::]=IMPERF[row2]
 
+        if srcFile is not None:
+            self._saveGridCache(srcFile,H,RB,alpha,IMPERF,ft,fz)
         self.addData(IMPERF,ft,fz)
 
-    def getNewSampleXYZ(self):
-        thtZ=self.getNewSample()
+    def getNewSampleXYZ(self,seed=None):
+        return self.sampleToXYZ(self.getNewSample(seed=seed))
+
+    def sampleToXYZ(self,thtZ):
         tht=np.squeeze(np.tile(self.x,(1,len(self.y) )))
         z=np.repeat(self.y,len(self.x))
         r=self._getRperf(z)
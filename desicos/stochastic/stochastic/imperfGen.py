@@ -5,6 +5,33 @@ import logging
 import json
 #import time
 import copy
+import multiprocessing
+
+_batchSamples={}
+
+def _initBatchWorker(samples):
+    _batchSamples.clear()
+    _batchSamples.update(samples)
+
+def _generateBatchSample(args):
+    """    Generates the sample number i of a batch, for each imperfection
+        type. Each sample uses its own random streams obtained from
+        (seed,i,...), such that the results do not depend on the number
+        of processes
+    """
+    seed,i=args
+    out={}
+    # the structure patterns use the global random state, which is
+    # restored for the caller when running in this process
+    state=np.random.get_state()
+    try:
+        for k,key in enumerate(sorted(_batchSamples.keys())):
+            np.random.seed([seed,i,2*k+1])
+            rs=np.random.RandomState([seed,i,2*k])
+            out[key]=_batchSamples[key].getNewSampleXYZ(seed=rs)
+    finally:
+        np.random.set_state(state)
+    return out
 
 class ImperfFactory(object):
     def __init__(self,conecylDBFile):
@@ -80,12 +107,11 @@ class ImperfFactory(object):
 
     def applyMaterialPattern(self,name):
         factory=self.sm.getStructure(name)
-        for key in factory.db.keys():
-            fl=factory.getLayer(key)
-            if self.solveTII:
-                self.sThick.addSurfacePatternFactory(fl)
-            if self.solveMSI:
-                self.sMidS.addSurfacePatternFactory(fl)
+        # all the layers are evaluated in one getPattern() call
+        if self.solveTII:
+            self.sThick.addSurfacePatternFactory(factory)
+        if self.solveMSI:
+            self.sMidS.addSurfacePatternFactory(factory)
 
     def compute(self):
         if self.solveTII:
@@ -145,6 +171,75 @@ class ImperfFactory(object):
             self._putNewToCCDB(l)
             self.outputs.append(l)
 
+    def iterBatch(self,n,nProcs=None,seed=None):
+        """    Generates n samples of each imperfection type on a pool of
+            nProcs processes (all CPUs if None, in this process if 1)
+            Yields one dictionary {'ms':xyz,'thick':xyzt} for each sample
+        """
+        samples={}
+        if self.solveMSI:
+            self.sMidS.compute()
+            samples['ms']=self.sMidS
+        if self.solveTII:
+            self.sThick.compute()
+            samples['thick']=self.sThick
+        if seed is None:
+            seed=np.random.randint(0,2**31-1)
+        tasks=[(seed,i) for i in range(n)]
+        if nProcs == 1:
+            _initBatchWorker(samples)
+            for task in tasks:
+                yield _generateBatchSample(task)
+            return
+        pool=multiprocessing.Pool(nProcs,_initBatchWorker,(samples,))
+        try:
+            for out in pool.imap(_generateBatchSample,tasks):
+                yield out
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def putBatchToCCDB(self,names,nProcs=None,seed=None,binary=True):
+        """    Generates one sample of each imperfection type for each name
+            in names and adds them to the conecylDB, updating the
+            database files only once at the end
+        """
+        names=[str(name) for name in names]
+        if self.solveMSI:
+            sRef=self.sMidS
+        else:
+            sRef=self.sThick
+        ccdb=sRef.ccdb
+        # the imperfection files are saved to temporary names, renamed
+        # by commit() or removed if the batch fails
+        try:
+            for name,out in zip(names,self.iterBatch(len(names),nProcs,
+                                                     seed)):
+                logging.info('Adding : '+name+' to CCDB')
+                ccdb.copy(sRef.cc0.name,name,update=False)
+                newCE=ccdb.getEntry(name)
+                newCE.setGeometry(sRef.H,sRef.RB,sRef.alpha)
+                if 'ms' in out:
+                    newCE.setGeometricImperfection(out['ms'],binary=binary,
+                                                   update=False)
+                if 'thick' in out:
+                    newCE.setThicknessImperfection(out['thick'],
+                                                   binary=binary,
+                                                   update=False)
+        except:
+            ccdb.discard(names)
+            raise
+        if ccdb.commit(names):
+            self.outputs.extend(names)
+        # both samples must see the new entries
+        self.sMidS.ccdb=ccdb
+        self.sThick.ccdb=ccdb
+
+    def putAutogenBatchToCCDB(self,base,n,nProcs=None,seed=None,binary=True):
+        stamp=time.strftime("%d_%B_%Y_%H_%M_%S_UTC",time.gmtime())
+        names=[base+'_'+stamp+'_'+str(i) for i in range(n)]
+        self.putBatchToCCDB(names,nProcs,seed,binary)
+
     def putAutogenToCCDB(self,base,n):
         for i in range(0,n):
             aname=str(base+'_'+time.strftime("%d_%B_%Y_%H_%M_%S_UTC",time.gmtime()))
@@ -110,15 +110,20 @@ class StructurePattern(object):
 
 
 
+    def _getBlocks(self,npat,nBlk,A):
+        # the first half of each one of the nBlk blocks is set to A
+        blkSize=npat//nBlk
+        pat=np.zeros(npat)
+        if blkSize > 0:
+            i=np.arange(nBlk*blkSize)
+            pat[i[(i % blkSize) < blkSize//2]]=A
+        return pat
+
     def _getPatternTBlk(self,nBlkT):
         ntpat=800
         tpat=np.zeros((2,ntpat))
         tpat[0]=np.linspace(0,2.0*np.pi,tpat.shape[1])
-        nBlk=nBlkT
-        blkSize=ntpat/nBlk
-        for i in range(0,nBlk):
-            pos=i*blkSize
-            tpat[1][pos:pos+blkSize/2]=self.AT
+        tpat[1]=self._getBlocks(ntpat,nBlkT,self.AT)
 
         tpi=np.hstack((tpat,tpat,tpat))
         tpi[0,0:tpat.shape[1]]=tpat[0]-2*np.pi
@@ -130,11 +135,7 @@ class StructurePattern(object):
         nzpat=600
         zpat=np.zeros((2,nzpat))
         zpat[0]=np.linspace(0,H,zpat.shape[1])
-        nBlk=nBlkZ
-        blkSize=nzpat/nBlk
-        for i in range(0,nBlk):
-            pos=i*blkSize
-            zpat[1][pos:pos+blkSize/2]=self.AZ
+        zpat[1]=self._getBlocks(nzpat,nBlkZ,self.AZ)
 
         zpi=np.hstack((zpat,zpat,zpat))
 
@@ -154,32 +155,24 @@ class StructurePattern(object):
         kz=np.linspace(0,np.tan(self.KZ)*self.H,self.nt)
         kt=np.linspace(0,self.KT,self.nz)
 
-        imt=np.zeros((self.nz,self.nt))
-        imz=np.zeros((self.nz,self.nt))
+        # all the skewed rows and columns are interpolated at once
+        ofs=np.mod(kz,self.H)
+        zi=ofs[np.newaxis,:]+z[:,np.newaxis]
+        imz=np.interp(zi.ravel(), zpi[0], zpi[1]).reshape(zi.shape)
 
-        for j in range(0,self.nt):
-            ofs=np.mod(kz[j],self.H)
-            zi=np.linspace(ofs,ofs+self.H,self.nz)
-            imz[:,j]=np.interp(zi, zpi[0], zpi[1])
+        ofs=np.mod(kt,2.0*np.pi)
+        ti=ofs[:,np.newaxis]+t[np.newaxis,:]
+        imt=np.interp(ti.ravel(), tpi[0], tpi[1]).reshape(ti.shape)
 
-        for i in range(0,self.nz):
-            ofs=np.mod(kt[i],2.0*np.pi)
-            ti=np.linspace(ofs,ofs+2.0*np.pi,self.nt)
-            imt[i,:]=np.interp(ti, tpi[0], tpi[1])
         if mode == 'add':
             im=imz+imt
         if mode == 'mul':
             im=imz*imt
         if mode == 'grt':
-            im=imt
-            for i in range(0,imz.shape[0]):
-                for j in range(0,imz.shape[1]):
-                    if im[i][j] <= 0.0:
-                        if imz[i][j] < im[i][j]:
-                            im[i][j]= imz[i][j]
-                    if im[i][j] >= 0.0:
-                        if imz[i][j] > im[i][j]:
-                            im[i][j]= imz[i][j]
+            # keeps the value with the largest magnitude, with the sign of
+            # imt, or the one of imz where imt is zero
+            im=np.where((imt <= 0.0) & (imz < imt),imz,imt)
+            im=np.where((im >= 0.0) & (imz > im),imz,im)
         return im*self.scalingFactor
 
 class StructureWithLayers(object):
@@ -196,6 +189,23 @@ class StructureWithLayers(object):
     def getLayer(self,key):
         return self.db[key]
 
+    def setGeometry(self,R,H,a):
+        for key in self.db.keys():
+            self.db[key].setGeometry(R,H,a)
+
+    def connectOutputArray(self,ar):
+        for key in self.db.keys():
+            self.db[key].connectOutputArray(ar)
+
+    def getPattern(self,mode='add'):
+        """    Sum of the patterns of all layers, such that the structure can
+            be used as a single pattern factory
+        """
+        im=0.0
+        for key in self.db.keys():
+            im=im+self.db[key].getPattern(mode)
+        return im
+
 class StructureManager(object):
     def __init__(self):
         self.db={}